@@ -1,39 +1,24 @@
 import os
+import hashlib
+import threading
+from concurrent.futures import Future, TimeoutError as FuturesTimeoutError
+import functools
 import time
 import streamlit as st
-from google import genai
-from google.genai import types
-from dotenv import load_dotenv
 
-load_dotenv(override=True)
+import telemetry
+from rate_limiter import get_shared_limiter, retry_after_hint, backoff_delay
 
-class AIEngine:
-    def __init__(self):
-        # Try Streamlit secrets first (cloud), then fall back to .env (local)
-        try:
-            self.api_key = st.secrets.get("GOOGLE_API_KEY", None)
-        except Exception:
-            self.api_key = None
-        
-        if not self.api_key:
-            self.api_key = os.getenv("GOOGLE_API_KEY")
-        
-        if not self.api_key:
-            raise ValueError("GOOGLE_API_KEY not found in secrets or .env file")
-        
-        self.client = genai.Client(api_key=self.api_key)
-        # Using gemini-2.0-flash which is available and supports grounding
-        self.model_name = "gemini-2.0-flash"
+CANCELLED_MESSAGE = "Chyba: Generovanie analýzy bolo zrušené."
 
-    def analyze_ticker(self, ticker_symbol, max_retries=3):
-        """
-        Generates a financial analysis report using Gemini with Google Search Grounding.
-        Includes retry logic with exponential backoff.
-        """
-        
-        prompt = f"""
+# The fixed instructions, identical for every ticker. They go to Gemini as the system
+# instruction and the request itself is only TICKER_PROMPT. They are not stored as explicit
+# cached content: at about 1k tokens they are below Gemini's minimum for that (4096 tokens
+# on gemini-2.0-flash). Models with implicit caching serve the repeated prefix from their
+# cache on their own, which shows up as cached_tokens in the telemetry.
+SYSTEM_INSTRUCTION = """
         Si skúsený finančný analytik špecializujúci sa na fundamentálnu analýzu spoločností. Tvojou úlohou je vytvoriť 
-        profesionálnu, detailnú analýzu spoločnosti {ticker_symbol} pre investorov a zainteresovaných čitateľov.
+        profesionálnu, detailnú analýzu spoločnosti, ktorej ticker dostaneš v požiadavke, pre investorov a zainteresovaných čitateľov.
         
         Použij svoje nástroje (Google Search) na nájdenie najnovších a overených informácií, vrátane:
         1. Posledného dostupného Earnings Call prepisu (Transcript) - čo hovoril CEO/CFO?
@@ -96,38 +81,194 @@ class AIEngine:
         Na záver pridaj disclaimer: "Táto analýza nie je finančná rada. Investovanie nesie riziko straty."
         """
 
+# The only part of the prompt that changes between requests
+TICKER_PROMPT = "Vytvor analýzu spoločnosti {ticker_symbol}."
+
+# Identifies the prompt version; reports generated by a different prompt are never reused
+PROMPT_HASH = hashlib.sha256((SYSTEM_INSTRUCTION + TICKER_PROMPT).encode("utf-8")).hexdigest()[:16]
+
+# How long a saved report can be served instead of calling Gemini again
+REPORT_MAX_AGE = float(os.getenv("AI_REPORT_MAX_AGE_HOURS", "12")) * 3600
+
+# Rough upper bound of a report's output, reserved from the tokens-per-minute budget up front
+EXPECTED_OUTPUT_TOKENS = 4000
+
+# Reports currently being generated in this process, keyed like the report cache.
+# Concurrent requests for the same key wait for the first one instead of calling Gemini again.
+_inflight = {}
+_inflight_lock = threading.Lock()
+
+@functools.lru_cache(maxsize=None)
+def _load_dotenv():
+    from dotenv import load_dotenv
+    load_dotenv(override=True)
+
+def _setting(name, default=None):
+    """
+    Reads a setting from Streamlit secrets (cloud) or the environment / .env (local).
+    """
+    _load_dotenv()
+    try:
+        value = st.secrets.get(name, None)
+    except Exception:
+        value = None
+    return value if value is not None else os.getenv(name, default)
+
+def is_error_report(text):
+    """
+    analyze_ticker reports failures as text starting with "Chyba" instead of raising.
+    """
+    return not text or text.startswith("Chyba")
+
+class AIEngine:
+    def __init__(self):
+        # Try Streamlit secrets first (cloud), then fall back to .env (local)
+        self.api_key = _setting("GOOGLE_API_KEY")
+        
+        if not self.api_key:
+            raise ValueError("GOOGLE_API_KEY not found in secrets or .env file")
+        
+        self._client = None
+        self._client_lock = threading.Lock()
+        # Using gemini-2.0-flash which is available and supports grounding
+        self.model_name = "gemini-2.0-flash"
+
+        # One limiter for all sessions in the process, sized to our Gemini quota
+        tokens_per_minute = int(_setting("GEMINI_TPM", "1000000"))
+        self.rate_limiter = get_shared_limiter(
+            requests_per_minute=int(_setting("GEMINI_RPM", "15")),
+            tokens_per_minute=tokens_per_minute or None
+        )
+
+    @property
+    def client(self):
+        """
+        The genai.Client, created (and google.genai imported) on first use.
+        """
+        if self._client is None:
+            with self._client_lock:
+                if self._client is None:
+                    from google import genai
+                    self._client = genai.Client(api_key=self.api_key)
+        return self._client
+
+    @client.setter
+    def client(self, value):
+        self._client = value
+
+    def analyze_ticker(self, ticker_symbol, max_retries=3, cancel_event=None):
+        """
+        Generates a financial analysis report using Gemini with Google Search Grounding.
+        Includes retry logic with jittered exponential backoff through the shared rate limiter.
+        If cancel_event (threading.Event) gets set, no further attempts are made and
+        waiting in the limiter queue is interrupted.
+        Blocking variant of analyze_ticker_stream: returns the full text or an error message.
+        """
+        outcome = {}
+        report = "".join(self.analyze_ticker_stream(ticker_symbol, max_retries, cancel_event, outcome))
+        return outcome["error"] or report
+
+    def analyze_ticker_stream(self, ticker_symbol, max_retries=3, cancel_event=None, outcome=None, on_wait=None):
+        """
+        Streaming variant of analyze_ticker: yields text chunks as Gemini produces them.
+        Retries (rate limits) are only possible until the first chunk has been yielded.
+        Failures are yielded as text like in analyze_ticker; if 'outcome' (dict) is given,
+        outcome["error"] is set to the error message, or None on success.
+        Every attempt first queues in the shared rate limiter; on_wait(position, waited_seconds)
+        is called while queued (see RateLimiter.acquire).
+        """
+        if outcome is None:
+            outcome = {}
+        outcome["error"] = None
+        
+        from google.genai import types
+
+        prompt = TICKER_PROMPT.format(ticker_symbol=ticker_symbol)
+        # The system instruction is sent, and counts towards the tokens-per-minute quota, every time
+        estimated_tokens = (len(SYSTEM_INSTRUCTION) + len(prompt)) // 4 + EXPECTED_OUTPUT_TOKENS
+
         last_error = None
+        streamed_any = False
         
         for attempt in range(max_retries):
+            # Queue for quota instead of sleeping; also honors a pause set by a 429 elsewhere
+            waited = self.rate_limiter.acquire(tokens=estimated_tokens, cancel_event=cancel_event, on_wait=on_wait)
+            if waited is None:
+                outcome["error"] = CANCELLED_MESSAGE
+                yield CANCELLED_MESSAGE
+                return
+            telemetry.add_span("ai.rate_limit_wait", waited, attempt=attempt)
+
+            usage = None
+            config = types.GenerateContentConfig(system_instruction=SYSTEM_INSTRUCTION,
+                                                 response_mime_type="text/plain")
+            attempt_started = time.perf_counter()
             try:
                 # Temporarily disabled Google Search grounding to test basic API
-                response = self.client.models.generate_content(
+                stream = self.client.models.generate_content_stream(
                     model=self.model_name,
                     contents=prompt,
-                    config=types.GenerateContentConfig(
-                        response_mime_type="text/plain"
-                    )
+                    config=config
                 )
                 
-                if not response or not response.text:
-                    return "Chyba: AI nevrátila žiadny text. Skúste to prosím znova."
-                    
-                return response.text
+                for chunk in stream:
+                    if cancel_event is not None and cancel_event.is_set():
+                        outcome["error"] = CANCELLED_MESSAGE
+                        return
+                    if chunk and chunk.usage_metadata:
+                        usage = chunk.usage_metadata
+                    if chunk and chunk.text:
+                        if not streamed_any:
+                            telemetry.add_span("ai.first_token", time.perf_counter() - attempt_started, attempt=attempt)
+                        streamed_any = True
+                        yield chunk.text
+
+                # Includes the time the consumer spent rendering chunks, i.e. what the user waits
+                cached_tokens = (getattr(usage, "cached_content_token_count", None) or 0) if usage else 0
+                telemetry.add_span("ai.stream", time.perf_counter() - attempt_started, attempt=attempt,
+                                   prompt_tokens=(usage.prompt_token_count or 0) if usage else None,
+                                   cached_tokens=cached_tokens)
+                self.rate_limiter.record_usage(estimated_tokens, usage.total_token_count if usage else None)
+                if usage:
+                    # prompt_tokens includes the cached ones
+                    telemetry.count("ai.prompt_tokens", usage.prompt_token_count or 0)
+                    telemetry.count("ai.cached_tokens", cached_tokens)
+                    telemetry.count("ai.output_tokens", usage.candidates_token_count or 0)
+                    telemetry.count("ai.total_tokens", usage.total_token_count or 0)
+                
+                if not streamed_any:
+                    outcome["error"] = "Chyba: AI nevrátila žiadny text. Skúste to prosím znova."
+                    yield outcome["error"]
+                return
                 
             except Exception as e:
                 last_error = str(e)
+                telemetry.add_span("ai.failed_attempt", time.perf_counter() - attempt_started, attempt=attempt)
+
+                # Part of the report is already out - it cannot be retried transparently
+                if streamed_any:
+                    break
+
+                # Nothing was generated, so the reserved tokens go back to the bucket
+                self.rate_limiter.record_usage(estimated_tokens, 0)
                 
                 # Check if it's a rate limit error (429)
                 if "429" in last_error or "rate" in last_error.lower() or "quota" in last_error.lower():
+                    # Pause the shared queue for everyone: the server's retry hint if given,
+                    # otherwise jittered exponential backoff (~10s, 20s, 40s)
+                    self.rate_limiter.penalize(retry_after_hint(e) or backoff_delay(attempt))
+                    telemetry.count("ai.rate_limited")
                     if attempt < max_retries - 1:
-                        # Wait with exponential backoff: 10s, 20s, 40s
-                        wait_time = 10 * (2 ** attempt)
-                        time.sleep(wait_time)
+                        telemetry.count("ai.retries")
                         continue
                 
                 # For other errors, don't retry
                 break
         
+        outcome["error"] = self._error_message(last_error, max_retries)
+        yield ("\n\n" if streamed_any else "") + outcome["error"]
+
+    def _error_message(self, last_error, max_retries):
         # Return detailed error for debugging
         if "404" in last_error:
             return f"Chyba: Model {self.model_name} nebol nájdený alebo nie je podporovaný."
@@ -138,3 +279,100 @@ class AIEngine:
         
         return f"Chyba pri generovaní analýzy: {last_error}"
 
+    def rate_limit_stats(self):
+        """
+        Queue depth and wait times of the shared Gemini rate limiter.
+        """
+        return self.rate_limiter.stats()
+
+    def report_meta(self):
+        """
+        Identifies how a report was generated; stored with the analysis so it can be reused.
+        """
+        return {"model_name": self.model_name, "prompt_hash": PROMPT_HASH}
+
+    def get_report(self, ticker_symbol, history_engine, max_age=REPORT_MAX_AGE, force_refresh=False, cancel_event=None):
+        """
+        Returns (report, source_id). A report for the same ticker, model and prompt saved in
+        History within max_age is reused (source_id is its history id); otherwise Gemini is called
+        and source_id is None. Concurrent calls for the same key share a single upstream request.
+        force_refresh skips the History lookup but still joins a request that is already running.
+        On failure the report is just the error message.
+        """
+        outcome = {}
+        report = "".join(self.get_report_stream(
+            ticker_symbol, history_engine, max_age, force_refresh, cancel_event, outcome
+        ))
+        return outcome["error"] or report, outcome["source"]
+
+    def get_report_stream(self, ticker_symbol, history_engine, max_age=REPORT_MAX_AGE, force_refresh=False,
+                          cancel_event=None, outcome=None, on_wait=None):
+        """
+        Streaming variant of get_report. Yields the report in chunks; a cached report or the
+        result of a request started by another session arrives as a single chunk.
+        If 'outcome' (dict) is given, it receives "source" (history id or None) and "error"
+        (error message or None) once the generator is exhausted.
+        Closing the generator early (or cancel_event) stops the upstream request; sessions that were
+        waiting for it then generate the report themselves.
+        on_wait is passed to the rate limiter (see analyze_ticker_stream).
+        """
+        if outcome is None:
+            outcome = {}
+        outcome.update(source=None, error=None)
+        key = (ticker_symbol.upper(), self.model_name, PROMPT_HASH)
+
+        if not force_refresh:
+            cached = history_engine.find_report(key[0], self.model_name, PROMPT_HASH, max_age)
+            if cached:
+                outcome["source"] = cached[0]
+                telemetry.count("ai.report_cache_hits")
+                yield cached[1]
+                return
+
+        while True:
+            with _inflight_lock:
+                future = _inflight.get(key)
+                leader = future is None
+                if leader:
+                    future = Future()
+                    _inflight[key] = future
+            if leader:
+                break
+
+            # Another session is generating this report right now - wait for its result
+            telemetry.count("ai.coalesced")
+            while not future.done():
+                if cancel_event is not None and cancel_event.is_set():
+                    outcome["error"] = CANCELLED_MESSAGE
+                    yield CANCELLED_MESSAGE
+                    return
+                try:
+                    future.result(timeout=0.5)
+                except FuturesTimeoutError:
+                    continue
+            result = future.result()
+            if result is not None:
+                report, outcome["error"] = result
+                yield report
+                return
+            # The leader stopped without a report (its user cancelled): generate it here instead
+            telemetry.count("ai.coalesced_takeover")
+
+        parts = []
+        stream_outcome = {}
+        try:
+            for chunk in self.analyze_ticker_stream(
+                ticker_symbol, cancel_event=cancel_event, outcome=stream_outcome, on_wait=on_wait
+            ):
+                parts.append(chunk)
+                yield chunk
+            outcome["error"] = stream_outcome["error"]
+            if outcome["error"] != CANCELLED_MESSAGE:
+                future.set_result((outcome["error"] or "".join(parts), outcome["error"]))
+        finally:
+            with _inflight_lock:
+                _inflight.pop(key, None)
+            if not future.done():
+                # Cancelled, the consumer stopped early or the request raised. None tells the
+                # waiting sessions to take over instead of inheriting this session's cancellation.
+                future.set_result(None)
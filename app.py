@@ -1,13 +1,20 @@
 import streamlit as st
-import pandas as pd
 import importlib
 
-from data_engine import DataEngine
-from ai_engine import AIEngine
-from history_engine import HistoryEngine
+from engines import get_engines, get_job_queue, is_dev_mode, is_admin_mode
+from data_engine import BENCHMARK_SYMBOL
+from jobs import ACTIVE_STATUSES
+from batch import parse_watchlist
+import telemetry
 import ui_components as ui
-importlib.reload(ui)
-import time
+if is_dev_mode():
+    # Pick up edits to the UI components without restarting the server
+    importlib.reload(ui)
+
+# Tickers per sidebar history page, and older analyses per "Viac" click
+HISTORY_PAGE_SIZE = 20
+# How long a peer comparison is reused before its data is fetched again (quotes change)
+PEERS_TTL = 15 * 60
 
 # Page Config
 st.set_page_config(
@@ -16,11 +23,10 @@ st.set_page_config(
     layout="wide"
 )
 
-# Initialize Engines (no caching to pick up code changes immediately)
-data_engine = DataEngine()
-ai_engine = AIEngine()
-history_engine = HistoryEngine()
-
+# Initialize Engines (shared across reruns and sessions; AUTO_ANALYST_DEV=1 rebuilds them on every rerun)
+data_engine, ai_engine, history_engine = get_engines()
+job_queue = get_job_queue()
+batch_runner = job_queue.batch_runner
 
 # Apply Custom Premium Blue Styles
 ui.apply_custom_styles()
@@ -28,65 +34,336 @@ ui.apply_custom_styles()
 # State Management
 if 'current_analysis' not in st.session_state:
     st.session_state.current_analysis = None
+if 'loaded_analyses' not in st.session_state:
+    # Past analyses opened in this session, by history id (their DataFrames load lazily)
+    st.session_state.loaded_analyses = {}
+if 'batch_summary' not in st.session_state:
+    st.session_state.batch_summary = None
+if 'peer_tickers' not in st.session_state:
+    st.session_state.peer_tickers = None
+if 'history_page' not in st.session_state:
+    # Sidebar history paging: current page of tickers, filter it was computed for, and
+    # tickers whose older analyses are shown (value = number of pages shown)
+    st.session_state.history_page = 0
+    st.session_state.history_filter_applied = ""
+    st.session_state.history_expanded = {}
+
+@st.cache_data(ttl=PEERS_TTL, show_spinner=False)
+def load_peer_comparison(peer_tickers, _data_engine):
+    """
+    Peer comparison for a sorted tuple of tickers, shared by all sessions. Reruns with the same
+    peer set skip the bulk fetch until the TTL runs out.
+    """
+    from peers import compare_peers
+
+    peer_data = _data_engine.get_bulk_data(list(peer_tickers))
+    # Year-over-year trends from the local fundamentals store (filled by the fetch above)
+    growth = {
+        label: _data_engine.fundamentals.growth(list(peer_tickers), item)
+        for label, item in (("Rast tržieb (YoY)", "revenue"), ("Rast RPO (YoY)", "deferred_revenue"))
+    }
+    return compare_peers(peer_data["tickers"]), growth
+
+def open_saved_analysis(history_id):
+    """Shows a saved analysis, reusing what this session already opened."""
+    loaded = st.session_state.loaded_analyses.get(history_id)
+    if loaded is None:
+        loaded = history_engine.load_analysis(history_id)
+        if loaded:
+            st.session_state.loaded_analyses[history_id] = loaded
+            # Keep the session cache small: drop the oldest opened analysis
+            if len(st.session_state.loaded_analyses) > 20:
+                st.session_state.loaded_analyses.pop(next(iter(st.session_state.loaded_analyses)))
+    if loaded:
+        st.session_state.current_analysis = loaded
 
 # Sidebar - History and Input
 with st.sidebar:
     st.markdown("### 🔍 Nová Analýza")
     ticker_input = st.text_input("Zadaj Ticker (napr. TSLA)", value="").upper()
+    force_refresh = st.checkbox("Vygenerovať nový AI report", value=False, help="Inak sa použije report z histórie, ak nie je starší ako nastavené okno.")
     analyze_btn = st.button("🚀 Spustiť Analýzu")
+
+    with st.expander("📋 Dávková analýza (Watchlist)"):
+        watchlist_input = st.text_area("Tickery (oddelené čiarkou alebo po riadkoch)", value="")
+        batch_btn = st.button("▶️ Spustiť dávku")
+
+        resume_id = None
+        unfinished_batches = batch_runner.list_batches(unfinished_only=True)
+        if unfinished_batches:
+            resume_choice = st.selectbox(
+                "Nedokončené dávky",
+                unfinished_batches,
+                format_func=lambda b: f"{b['batch_id'][:15]} ({len(b['done'])}/{len(b['tickers'])})"
+            )
+            if st.button("🔁 Pokračovať v dávke"):
+                resume_id = resume_choice["batch_id"]
+
+    with st.expander("👥 Porovnanie s konkurenciou"):
+        peers_input = st.text_area("Tickery skupiny (oddelené čiarkou alebo po riadkoch)", value="", key="peers_input")
+        if st.button("📊 Porovnať"):
+            st.session_state.peer_tickers = parse_watchlist(peers_input) or None
     
+    limiter_stats = ai_engine.rate_limit_stats()
+    if limiter_stats["queue_depth"] or limiter_stats["paused_for"]:
+        st.caption(
+            f"Gemini fronta: {limiter_stats['queue_depth']} čaká, "
+            f"pauza {limiter_stats['paused_for']:.0f} s, priem. čakanie {limiter_stats['avg_wait']:.1f} s"
+        )
+
+    running_jobs = job_queue.active_jobs()
+    if running_jobs:
+        st.caption("Prebiehajúce analýzy: " + ", ".join(
+            f"{j['ticker'] or 'dávka'} ({'beží' if j['status'] == 'running' else 'vo fronte'})" for j in running_jobs
+        ))
+
     st.divider()
-    st.markdown("### 🕒 História")
-    history_list = history_engine.get_history_list()
-    
-    if not history_list:
-        st.info("Zatiaľ žiadna história.")
+    with st.expander("🔎 Hľadať v reportoch"):
+        search_query = st.text_input("Text reportu", value="", key="search_query")
+        search_ticker = st.text_input("Ticker", value="", key="search_ticker").upper()
+        search_verdict = st.selectbox("Verdikt", ["Všetky", "Buy", "Hold", "Sell"], key="search_verdict")
+        search_dates = st.date_input("Obdobie", value=(), key="search_dates")
+
+    search_active = bool(search_query.strip() or search_ticker or search_verdict != "Všetky" or search_dates)
+    if search_active:
+        st.markdown("### 🔎 Výsledky hľadania")
+        date_from = search_dates[0] if len(search_dates) > 0 else None
+        date_to = search_dates[1] if len(search_dates) > 1 else date_from
+        try:
+            hits = history_engine.search_reports(
+                search_query, ticker=search_ticker or None, date_from=date_from, date_to=date_to,
+                verdict=None if search_verdict == "Všetky" else search_verdict
+            )
+        except RuntimeError as e:
+            st.error(str(e))
+            hits = []
+        if not hits:
+            st.info("Nič sa nenašlo.")
+        for hit in hits:
+            verdict = f" · {hit['verdict']}" if hit['verdict'] else ""
+            if st.button(f"📄 {hit['ticker']} ({hit['date_display']}){verdict}", key=f"hit_{hit['id']}"):
+                open_saved_analysis(hit['id'])
+            if hit['snippet']:
+                st.caption(hit['snippet'])
     else:
-        for item in history_list:
-            if st.button(f"📄 {item['ticker']} ({item['date_display']})", key=item['id']):
-                # Load from history
-                loaded = history_engine.load_analysis(item['id'])
-                if loaded:
-                    st.session_state.current_analysis = loaded
-                    # Reconstruct history DF if present
-                    if 'data' in loaded and 'history' in loaded['data']:
-                        hist_data = loaded['data']['history']
-                        if isinstance(hist_data, list):
-                            df = pd.DataFrame(hist_data)
-                            if 'Date' in df.columns:
-                                df['Date'] = pd.to_datetime(df['Date'])
-                                df.set_index('Date', inplace=True)
-                            st.session_state.current_analysis['data']['history'] = df
+        st.markdown("### 🕒 História")
+        # Only one page of tickers (their latest analysis) is rendered; older analyses of a
+        # ticker are listed on demand, also page by page
+        ticker_filter = st.text_input("Filtrovať ticker", value="", key="history_filter").upper()
+        if st.session_state.history_filter_applied != ticker_filter:
+            st.session_state.history_filter_applied = ticker_filter
+            st.session_state.history_page = 0
+        page = history_engine.get_ticker_groups(
+            offset=st.session_state.history_page * HISTORY_PAGE_SIZE, limit=HISTORY_PAGE_SIZE,
+            prefix=ticker_filter or None
+        )
+
+        if page["total"] and not page["groups"]:
+            # The page is past the end (analyses were removed): go to the last one
+            st.session_state.history_page = (page["total"] - 1) // HISTORY_PAGE_SIZE
+            st.rerun()
+        if not page["total"]:
+            st.info("Zatiaľ žiadna história." if not ticker_filter else "Žiadny ticker nezodpovedá filtru.")
+        for group in page["groups"]:
+            latest = group["latest"]
+            if st.button(f"📄 {group['ticker']} ({latest['date_display']})", key=latest['id']):
+                open_saved_analysis(latest['id'])
+            if group["count"] < 2:
+                continue
+            expanded = st.session_state.history_expanded.get(group["ticker"])
+            if expanded is None:
+                if st.button(f"↳ staršie ({group['count'] - 1})", key=f"older_{group['ticker']}"):
+                    st.session_state.history_expanded[group["ticker"]] = 1
+                    st.rerun()
+                continue
+            older = history_engine.get_history_list(
+                group["ticker"], offset=1, limit=expanded * HISTORY_PAGE_SIZE
+            )
+            for item in older:
+                if st.button(f"↳ {item['date_display']}", key=item['id']):
+                    open_saved_analysis(item['id'])
+            more_col, hide_col = st.columns(2)
+            if len(older) < group["count"] - 1 and more_col.button("Viac", key=f"more_{group['ticker']}"):
+                st.session_state.history_expanded[group["ticker"]] = expanded + 1
+                st.rerun()
+            if hide_col.button("Skryť", key=f"hide_{group['ticker']}"):
+                del st.session_state.history_expanded[group["ticker"]]
+                st.rerun()
+
+        pages = -(-page["total"] // HISTORY_PAGE_SIZE)
+        if pages > 1:
+            prev_col, label_col, next_col = st.columns([1, 2, 1])
+            if prev_col.button("◀", key="history_prev", disabled=st.session_state.history_page == 0):
+                st.session_state.history_page -= 1
+                st.rerun()
+            label_col.caption(f"Strana {st.session_state.history_page + 1} / {pages}")
+            if next_col.button("▶", key="history_next", disabled=st.session_state.history_page >= pages - 1):
+                st.session_state.history_page += 1
+                st.rerun()
 
 
 # Main Logic
 ui.render_header()
 
+if batch_btn and watchlist_input:
+    tickers = parse_watchlist(watchlist_input)
+    if tickers:
+        resume_id = batch_runner.create_batch(tickers)["batch_id"]
+
+if resume_id:
+    # The batch runs on the job queue; the page keeps its job id in the URL and polls it
+    st.query_params["batch"] = job_queue.submit_batch(resume_id)["job_id"]
+
+
+@st.fragment(run_every=1.0)
+def render_batch_job(job_id):
+    job = job_queue.get(job_id)
+    if job is None or job["status"] not in ACTIVE_STATUSES:
+        # Finished (or gone): the whole page reruns and shows the summary
+        st.rerun()
+
+    progress = job["progress"]
+    text = f"Dávka: {progress['done']}/{progress['total']}"
+    if job["status"] == "queued":
+        text += " — čaká vo fronte"
+    elif progress["last"]:
+        text += f" — posledný {'✅' if progress['last_ok'] else '❌'} {progress['last']}"
+    st.progress(progress["done"] / progress["total"], text=text)
+
+
+batch_job_id = st.query_params.get("batch")
+batch_job = job_queue.get(batch_job_id) if batch_job_id else None
+if batch_job_id and batch_job is None:
+    del st.query_params["batch"]
+elif batch_job and batch_job["status"] == "done":
+    del st.query_params["batch"]
+    st.session_state.batch_summary = batch_job["batch"]
+elif batch_job and batch_job["status"] == "failed":
+    st.error(f"Chyba pri dávke {batch_job['batch_id'][:15]}: {batch_job['error']}")
+    if st.button("Zavrieť", key="dismiss_batch"):
+        del st.query_params["batch"]
+        st.rerun()
+elif batch_job:
+    render_batch_job(batch_job_id)
+
+if st.session_state.batch_summary:
+    summary = st.session_state.batch_summary
+    st.success(f"Dávka {summary['batch_id'][:15]}: {len(summary['done'])}/{len(summary['tickers'])} analýz uložených.")
+    if summary["failed"]:
+        with st.expander(f"❌ Chyby ({len(summary['failed'])})"):
+            for failed_ticker, error in summary["failed"].items():
+                st.write(f"**{failed_ticker}**: {error}")
+    st.session_state.batch_summary = None
+
+if st.session_state.peer_tickers:
+    st.markdown("### 👥 Porovnanie s konkurenciou")
+    with st.spinner(f"Načítavam dáta pre {len(st.session_state.peer_tickers)} tickerov..."):
+        comparison, peer_growth = load_peer_comparison(tuple(sorted(st.session_state.peer_tickers)), data_engine)
+    ui.render_peer_comparison(comparison, growth=peer_growth)
+    if st.button("Zavrieť porovnanie"):
+        st.session_state.peer_tickers = None
+        st.rerun()
+    st.divider()
+
 if analyze_btn and ticker_input:
-    with st.spinner(f"Analyzujem {ticker_input}..."):
-        # 1. Fetch Data
-        hard_data = data_engine.get_ticker_data(ticker_input)
-        
-        if "error" in hard_data:
-            st.error(f"Chyba pri získavaní dát: {hard_data['error']}")
-        else:
-            # 2. Call AI
-            ai_report = ai_engine.analyze_ticker(ticker_input)
-            
-            # 3. Save to History (Deep copy to avoid modifying original during save)
-            saved_id = history_engine.save_analysis(ticker_input, hard_data, ai_report)
-            
-            # Update session state to display
-            st.session_state.current_analysis = {
-                "ticker": ticker_input,
-                "data": hard_data,
-                "ai_report": ai_report
-            }
-            st.success(f"Analýza pre {ticker_input} bola úspešne dokončená a uložená.")
-            st.rerun()
+    # The analysis runs on the background job pool; the page only keeps the job id (in the
+    # URL, so a refresh reconnects to it) and polls the job until it is saved to History
+    job = job_queue.submit(ticker_input, force_refresh=force_refresh)
+    st.query_params["job"] = job["job_id"]
+
+
+@st.fragment(run_every=1.0)
+def render_running_job(job_id):
+    job = job_queue.get(job_id)
+    if job is None or job["status"] not in ACTIVE_STATUSES:
+        # Finished (or gone): the whole page reruns and shows the result
+        st.rerun()
+
+    st.markdown(f"<h1 style='margin-bottom:0;'>{job['ticker']}</h1>", unsafe_allow_html=True)
+    if job["status"] == "queued":
+        st.info(f"⏳ Analýza {job['ticker']} čaká vo fronte na voľného workera...")
+    elif job["waiting"]:
+        st.info(
+            f"⏳ Čakám na voľnú kapacitu Gemini: {job['waiting']['position']}. v poradí, "
+            f"{job['waiting']['waited']:.0f} s"
+        )
+    elif not job["report"]:
+        st.info(f"Analyzujem {job['ticker']}...")
+    if job["report"]:
+        st.markdown(job["report"] + " ▌")
+
+
+@st.fragment
+def render_technicals(data, ticker):
+    # A fragment, so switching the chart range reruns only this part
+    if not st.toggle("📈 Technické indikátory a graf", key="show_technicals"):
+        return
+    history = data.get('history')
+    if history is None or history.empty:
+        st.info("Cenová história nie je k dispozícii.")
+        return
 
-# Render Analysis if available
-if st.session_state.current_analysis:
+    from indicators import compute_indicators
+
+    # The benchmark comes from DataEngine's cache; indicators are cached by data version
+    indicators = compute_indicators(history, benchmark=data_engine.get_benchmark_history())
+    row = indicators.iloc[0]
+
+    def pct(value):
+        return f"{value * 100:+.1f}%" if value == value else "N/A"
+
+    st.write("")
+    t1, t2, t3, t4 = st.columns(4)
+    with t1: ui.metric_card("Výnos 1M", pct(row['return_1m']))
+    with t2: ui.metric_card("Výnos 1R", pct(row['return_1y']))
+    with t3: ui.metric_card("Volatilita (ann.)", pct(row['volatility']).lstrip("+"))
+    with t4: ui.metric_card("Max Drawdown", pct(row['max_drawdown']))
+
+    st.write("")
+    t5, t6, t7, t8 = st.columns(4)
+    with t5: ui.metric_card("RSI 14", f"{row['rsi']:.0f}" if row['rsi'] == row['rsi'] else "N/A")
+    with t6: ui.metric_card("Cena vs MA 50", pct(row['vs_ma_50']))
+    with t7: ui.metric_card("Cena vs MA 200", pct(row['vs_ma_200']))
+    with t8: ui.metric_card(f"Beta 1R vs {BENCHMARK_SYMBOL}", f"{row['beta']:.2f}" if row['beta'] == row['beta'] else "N/A")
+
+    # Price/volume chart, downsampled on the server to about one point per pixel
+    from charts import CHART_RANGES, DEFAULT_RANGE, chart_series, price_volume_figure, range_history
+
+    st.write("")
+    range_key = st.radio(
+        "Obdobie grafu", list(CHART_RANGES), index=list(CHART_RANGES).index(DEFAULT_RANGE),
+        horizontal=True, key="chart_range", label_visibility="collapsed"
+    )
+    try:
+        chart_history = range_history(history, range_key, data_engine.price_store, ticker)
+    except Exception as e:
+        st.warning(f"Dlhšia história nie je dostupná ({e}), zobrazujem 1 rok.")
+        chart_history = history
+    series = chart_series(chart_history, ticker, range_key)
+    if not series.empty:
+        st.plotly_chart(price_volume_figure(series, data.get('currency', 'USD')), use_container_width=True)
+
+
+active_job_id = st.query_params.get("job")
+active_job = job_queue.get(active_job_id) if active_job_id else None
+if active_job_id and active_job is None:
+    del st.query_params["job"]
+elif active_job and active_job["status"] == "done":
+    del st.query_params["job"]
+    open_saved_analysis(active_job["result_id"])
+    st.success(f"Analýza pre {active_job['ticker']} bola úspešne dokončená a uložená.")
+    if active_job["report_source"]:
+        st.toast(f"AI report prevzatý z histórie ({active_job['report_source']}).")
+elif active_job and active_job["status"] == "failed":
+    st.error(f"Chyba pri analýze {active_job['ticker']}: {active_job['error']}")
+    if st.button("Zavrieť", key="dismiss_job"):
+        del st.query_params["job"]
+        st.rerun()
+
+# Render Analysis if available (a running job takes its place until it finishes)
+if active_job and active_job["status"] in ACTIVE_STATUSES:
+    render_running_job(active_job["job_id"])
+elif st.session_state.current_analysis:
     analysis = st.session_state.current_analysis
     ticker = analysis['ticker']
     data = analysis['data']
@@ -104,8 +381,9 @@ if st.session_state.current_analysis:
         st.markdown(f"<h2 style='margin-top:0; color:#8c8c8c;'>{name}</h2>", unsafe_allow_html=True)
         st.markdown(f"<span style='font-size: 28px; font-weight: bold;'>${price:,.2f}</span> <span style='color: {color}; font-size: 20px;'>({change:+.2f}%)</span>", unsafe_allow_html=True)
 
-    # Tabs
-    tab_analysis, tab_data = st.tabs(["🧠 AI Analýza", "📊 Finančné Metriky"])
+    # Tabs (the performance tab only in admin mode)
+    tab_names = ["🧠 AI Analýza", "📊 Finančné Metriky"] + (["⏱️ Výkon"] if is_admin_mode() else [])
+    tab_analysis, tab_data, *tab_perf = st.tabs(tab_names)
 
     with tab_analysis:
         st.markdown(report)
@@ -150,9 +428,19 @@ if st.session_state.current_analysis:
         with m11: st.empty()
         with m12: st.empty()
 
+        # Row 4-5: Technical indicators and the price chart, only on request: they need the
+        # full price history (loaded lazily from History) and the benchmark
+        render_technicals(data, ticker)
+
         # Legend
         ui.render_legend()
 
+    if tab_perf:
+        with tab_perf[0]:
+            ui.render_perf_panel(analysis.get('perf'), telemetry.aggregates(), telemetry.prometheus_text())
+            st.caption(f"Cache dát: {data_engine.cache_stats()['totals']}")
+            st.caption(f"Gemini limiter: {ai_engine.rate_limit_stats()}")
+
 
 
 else:
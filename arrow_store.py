@@ -0,0 +1,100 @@
+"""
+Pieces shared by the local Arrow file stores (PriceStore, FundamentalsStore): per-key locks,
+atomic file writes, an in-memory cache of decoded files and the process-wide default store.
+"""
+import os
+import threading
+from collections import OrderedDict
+
+
+class KeyedLocks:
+    """
+    One threading.Lock per key, created on first use. Only serializes threads of this process;
+    writes stay safe across processes because they go through temp_path + os.replace.
+    """
+
+    def __init__(self):
+        self._locks = {}
+        self._guard = threading.Lock()
+
+    def get(self, key):
+        with self._guard:
+            return self._locks.setdefault(key, threading.Lock())
+
+
+def temp_path(path):
+    """
+    A temp file name next to 'path', unique per process and thread, so concurrent writers
+    never share one.
+    """
+    return f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+
+
+def write_frame(frame, path):
+    """
+    Writes 'frame' (its index becomes the first column) as an uncompressed Arrow file.
+    Goes through a temp file and a rename, so readers never see a half-written file.
+    """
+    import pyarrow.feather as feather
+
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = temp_path(path)
+    feather.write_feather(frame.reset_index(), tmp_path, compression="uncompressed")
+    os.replace(tmp_path, path)
+
+
+class FrameCache:
+    """
+    Decoded Arrow files kept in memory, most recently used first. An entry is only used while
+    the file's mtime is unchanged, so a file rewritten by another process is read again.
+    """
+
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        # path -> (mtime_ns, DataFrame)
+        self._frames = OrderedDict()
+        self._lock = threading.Lock()
+
+    def read(self, path):
+        """
+        The file at 'path' as a DataFrame indexed by its first column, or None if it doesn't exist.
+        """
+        import pyarrow.feather as feather
+
+        try:
+            mtime = os.stat(path).st_mtime_ns
+        except FileNotFoundError:
+            return None
+
+        with self._lock:
+            cached = self._frames.get(path)
+            if cached is not None and cached[0] == mtime:
+                self._frames.move_to_end(path)
+                return cached[1]
+
+        frame = feather.read_table(path, memory_map=True).to_pandas()
+        frame = frame.set_index(frame.columns[0])
+        with self._lock:
+            self._frames[path] = (mtime, frame)
+            self._frames.move_to_end(path)
+            while len(self._frames) > self.max_entries:
+                self._frames.popitem(last=False)
+        return frame
+
+
+class ProcessDefault:
+    """
+    A value created by 'factory' on first use and then shared by the whole process
+    (e.g. the default store that every engine uses).
+    """
+
+    def __init__(self, factory):
+        self._factory = factory
+        self._value = None
+        self._lock = threading.Lock()
+
+    def get(self):
+        with self._lock:
+            if self._value is None:
+                self._value = self._factory()
+            return self._value
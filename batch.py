@@ -0,0 +1,246 @@
+"""
+Batch (watchlist) analysis.
+
+Runs many tickers through DataEngine -> AIEngine -> HistoryEngine with separate
+concurrency limits for yfinance and Gemini. Every finished ticker is saved to
+History immediately and recorded in a state file, so a crashed batch can be
+resumed without redoing finished tickers.
+
+CLI usage:
+    python batch.py AAPL MSFT NVDA
+    python batch.py --file watchlist.txt --data-workers 8 --ai-workers 2
+    python batch.py --resume <batch_id>
+    python batch.py --list
+"""
+import argparse
+import json
+import os
+import queue
+import re
+import threading
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from ai_engine import is_error_report
+
+logger = logging.getLogger(__name__)
+
+BATCH_DIRNAME = ".batches"
+
+
+def parse_watchlist(text):
+    """
+    Splits a watchlist (commas, whitespace or newlines) into unique upper-case tickers,
+    keeping the original order.
+    """
+    tickers = []
+    for token in re.split(r"[\s,;]+", text or ""):
+        token = token.strip().upper()
+        if token and token not in tickers:
+            tickers.append(token)
+    return tickers
+
+
+class BatchRunner:
+    def __init__(self, data_engine, ai_engine, history_engine, data_workers=4, ai_workers=2):
+        self.data_engine = data_engine
+        self.ai_engine = ai_engine
+        self.history_engine = history_engine
+        self.data_workers = data_workers
+        self.ai_workers = ai_workers
+        self.state_dir = os.path.join(history_engine.history_dir, BATCH_DIRNAME)
+        if not os.path.exists(self.state_dir):
+            os.makedirs(self.state_dir)
+
+    # --- State -----------------------------------------------------------
+
+    def _state_path(self, batch_id):
+        return os.path.join(self.state_dir, f"{batch_id}.json")
+
+    def _write_state(self, state):
+        """
+        Writes the batch state via a temp file + rename, so a crash mid-write
+        never leaves a truncated state file behind.
+        """
+        path = self._state_path(state["batch_id"])
+        # Unique per process and thread, so concurrent writers never share a temp file
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(state, f, ensure_ascii=False, indent=4)
+        os.replace(tmp_path, path)
+
+    def load_state(self, batch_id):
+        path = self._state_path(batch_id)
+        if not os.path.exists(path):
+            return None
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def create_batch(self, tickers):
+        """
+        Registers a new batch and returns its state.
+        """
+        batch_id = datetime.now().strftime("%Y%m%d_%H%M%S_%f")
+        state = {
+            "batch_id": batch_id,
+            "created": batch_id[:15],
+            "tickers": list(tickers),
+            "done": {},
+            "failed": {}
+        }
+        self._write_state(state)
+        return state
+
+    def list_batches(self, unfinished_only=False):
+        """
+        Returns saved batch states, newest first.
+        """
+        batches = []
+        for name in os.listdir(self.state_dir):
+            if not name.endswith(".json"):
+                continue
+            try:
+                state = self.load_state(name[:-5])
+            except Exception as e:
+                logger.warning(f"Unreadable batch state {name}: {e}")
+                continue
+            if unfinished_only and len(state["done"]) == len(state["tickers"]):
+                continue
+            batches.append(state)
+        return sorted(batches, key=lambda s: s["batch_id"], reverse=True)
+
+    # --- Execution -------------------------------------------------------
+
+    def run(self, batch_id, on_progress=None):
+        """
+        Runs (or resumes) a batch. Tickers already in 'done' are skipped; failed ones are retried.
+        Stage 1 (yfinance) and stage 2 (Gemini + save) have their own worker pools, so a slow
+        Gemini quota never starves data fetching and vice versa.
+        on_progress(state, ticker, outcome) is called on the caller's thread after every ticker.
+        Returns the final state.
+        """
+        state = self.load_state(batch_id)
+        if state is None:
+            raise ValueError(f"Batch {batch_id} neexistuje.")
+
+        pending = [t for t in state["tickers"] if t not in state["done"]]
+        if not pending:
+            return state
+
+        results = queue.Queue()
+        ai_executor = ThreadPoolExecutor(max_workers=self.ai_workers, thread_name_prefix="batch-ai")
+        data_executor = ThreadPoolExecutor(max_workers=self.data_workers, thread_name_prefix="batch-data")
+        stop_event = threading.Event()
+
+        def ai_stage(ticker, hard_data):
+            try:
+                ai_report, source = self.ai_engine.get_report(ticker, self.history_engine, cancel_event=stop_event)
+                if is_error_report(ai_report):
+                    results.put((ticker, {"error": ai_report}))
+                    return
+                # A reused report is saved without report_meta, so its age still counts from the original
+                saved_id = self.history_engine.save_analysis(
+                    ticker, hard_data, ai_report, report_meta=None if source else self.ai_engine.report_meta()
+                )
+                results.put((ticker, {"id": saved_id}))
+            except Exception as e:
+                logger.exception(f"AI stage failed for {ticker}")
+                results.put((ticker, {"error": str(e)}))
+
+        def data_stage(ticker):
+            try:
+                hard_data = self.data_engine.get_ticker_data(ticker)
+            except Exception as e:
+                hard_data = {"error": str(e)}
+            if "error" in hard_data:
+                results.put((ticker, {"error": hard_data["error"]}))
+                return
+            ai_executor.submit(ai_stage, ticker, hard_data)
+
+        try:
+            # Price history for the whole batch in a few bulk requests; the data stage then
+            # only fetches info and statements per ticker
+            try:
+                self.data_engine.prefetch_history(pending)
+            except Exception as e:
+                logger.warning(f"Bulk history prefetch failed, falling back to per-ticker requests: {e}")
+
+            for ticker in pending:
+                data_executor.submit(data_stage, ticker)
+
+            for _ in range(len(pending)):
+                ticker, outcome = results.get()
+                if "error" in outcome:
+                    state["failed"][ticker] = outcome["error"]
+                else:
+                    state["failed"].pop(ticker, None)
+                    state["done"][ticker] = outcome["id"]
+                self._write_state(state)
+
+                if on_progress:
+                    on_progress(state, ticker, outcome)
+        finally:
+            # On an interrupted run, stop retries and drop queued work; state on disk stays resumable
+            stop_event.set()
+            data_executor.shutdown(wait=False, cancel_futures=True)
+            ai_executor.shutdown(wait=False, cancel_futures=True)
+
+        return state
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("tickers", nargs="*", help="tickers to analyze")
+    parser.add_argument("--file", help="watchlist file (one ticker per line or comma separated)")
+    parser.add_argument("--resume", metavar="BATCH_ID", help="resume a previously started batch")
+    parser.add_argument("--list", action="store_true", help="list unfinished batches and exit")
+    parser.add_argument("--data-workers", type=int, default=4, help="concurrent yfinance fetches")
+    parser.add_argument("--ai-workers", type=int, default=2, help="concurrent Gemini calls")
+    parser.add_argument("--history-dir", default="history")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+
+    from data_engine import DataEngine
+    from ai_engine import AIEngine
+    from history_engine import HistoryEngine
+
+    history_engine = HistoryEngine(args.history_dir)
+
+    if args.list:
+        runner = BatchRunner(None, None, history_engine)
+        for state in runner.list_batches(unfinished_only=True):
+            print(f"{state['batch_id']}: {len(state['done'])}/{len(state['tickers'])} hotovo, {len(state['failed'])} chýb")
+        return
+
+    runner = BatchRunner(
+        DataEngine(), AIEngine(), history_engine,
+        data_workers=args.data_workers, ai_workers=args.ai_workers
+    )
+
+    if args.resume:
+        batch_id = args.resume
+    else:
+        text = " ".join(args.tickers)
+        if args.file:
+            with open(args.file, 'r', encoding='utf-8') as f:
+                text += "\n" + f.read()
+        tickers = parse_watchlist(text)
+        if not tickers:
+            parser.error("no tickers given")
+        batch_id = runner.create_batch(tickers)["batch_id"]
+        print(f"Batch {batch_id}: {len(tickers)} tickerov")
+
+    def on_progress(state, ticker, outcome):
+        status = outcome.get("id") or f"CHYBA: {outcome['error']}"
+        print(f"[{len(state['done'])}/{len(state['tickers'])}] {ticker}: {status}", flush=True)
+
+    state = runner.run(batch_id, on_progress=on_progress)
+    print(f"Hotovo: {len(state['done'])}/{len(state['tickers'])}, chyby: {len(state['failed'])}")
+    if state["failed"]:
+        print(f"Pre opakovanie chybných tickerov: python batch.py --resume {batch_id}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,212 @@
+"""
+Offline benchmark for DataEngine.get_ticker_data and get_bulk_data.
+
+Replaces yf.Ticker (and yf.download) with stubs that sleep for a configurable time per call,
+then compares the old sequential access pattern with the parallel fan-out, and a watchlist
+fetched ticker by ticker with the bulk path. No network access is needed.
+
+Usage:
+    python benchmarks/bench_data_engine.py [--runs 5] [--scale 1.0] [--bulk 200]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import yfinance
+
+from cache import TTLCache
+from data_engine import DataEngine
+from price_store import PriceStore
+from fundamentals import STATEMENTS, FundamentalsStore
+
+# Injected latency per yfinance call, in seconds (roughly what we see in production)
+DELAYS = {
+    "info": 0.8,
+    "financials": 0.6,
+    "balance_sheet": 0.6,
+    "cashflow": 0.6,
+    "quarterly_financials": 0.6,
+    "quarterly_balance_sheet": 0.6,
+    "quarterly_cashflow": 0.6,
+    "history": 0.5,
+    # One multi-symbol yf.download request
+    "download": 1.5,
+}
+
+
+class StubTicker:
+    """Mimics the parts of yf.Ticker used by DataEngine, with injected delays."""
+
+    delays = DELAYS
+    failing = set()
+
+    def __init__(self, symbol):
+        self.ticker = symbol
+
+    def _call(self, name, value):
+        time.sleep(self.delays[name])
+        if name in self.failing:
+            raise RuntimeError(f"injected failure in {name}")
+        return value
+
+    @property
+    def info(self):
+        return self._call("info", {
+            "symbol": self.ticker,
+            "longName": f"{self.ticker} Inc.",
+            "currentPrice": 101.0,
+            "previousClose": 100.0,
+            "totalRevenue": 5e10,
+            "currency": "USD",
+        })
+
+    @property
+    def financials(self):
+        return self._call("financials", pd.DataFrame({"2024": [5e10]}, index=["Total Revenue"]))
+
+    @property
+    def balance_sheet(self):
+        return self._call("balance_sheet", pd.DataFrame({"2024": [2e9]}, index=["Deferred Revenue"]))
+
+    @property
+    def cashflow(self):
+        return self._call("cashflow", pd.DataFrame({"2024": [1.5e10]}, index=["Free Cash Flow"]))
+
+    @property
+    def quarterly_financials(self):
+        return self._call("quarterly_financials", pd.DataFrame({"2024-12-31": [1.3e10]}, index=["Total Revenue"]))
+
+    @property
+    def quarterly_balance_sheet(self):
+        return self._call("quarterly_balance_sheet", pd.DataFrame({"2024-12-31": [2e9]}, index=["Deferred Revenue"]))
+
+    @property
+    def quarterly_cashflow(self):
+        return self._call("quarterly_cashflow", pd.DataFrame({"2024-12-31": [4e9]}, index=["Free Cash Flow"]))
+
+    def history(self, period="1y", start=None, **kwargs):
+        return self._call("history", stub_bars(start))
+
+
+def stub_bars(start=None):
+    index = pd.date_range(end=pd.Timestamp.today().normalize(), periods=252, freq="B", name="Date")
+    bars = pd.DataFrame({"Close": range(252), "Dividends": 0.0, "Stock Splits": 0.0}, index=index)
+    return bars if start is None else bars[bars.index >= start]
+
+
+class StubDownload:
+    """Mimics yf.download(group_by="ticker"): one delay per call, whatever the number of symbols."""
+
+    calls = 0
+
+    def __call__(self, symbols, period=None, start=None, **kwargs):
+        StubDownload.calls += 1
+        time.sleep(StubTicker.delays["download"])
+        return pd.concat({symbol: stub_bars(start) for symbol in symbols}, axis=1)
+
+
+def sequential_fetch(symbol):
+    """The access pattern get_ticker_data used before the fan-out: one call after another."""
+    ticker = StubTicker(symbol)
+    ticker.info
+    ticker.financials
+    ticker.balance_sheet
+    ticker.cashflow
+    ticker.quarterly_financials
+    ticker.quarterly_balance_sheet
+    ticker.quarterly_cashflow
+    ticker.history(period="1y")
+
+
+def fresh_engine(**kwargs):
+    # max_entries=0 disables the component cache and empty stores force downloads,
+    # so every run really fetches
+    return DataEngine(cache=TTLCache(max_entries=0), price_store=PriceStore(tempfile.mkdtemp()),
+                      fundamentals_store=FundamentalsStore(tempfile.mkdtemp()), **kwargs)
+
+
+def timed(fn, runs):
+    samples = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - started)
+    return min(samples), sum(samples) / len(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--scale", type=float, default=1.0, help="multiplier applied to all injected delays")
+    parser.add_argument("--bulk", type=int, default=200, help="watchlist size for the bulk comparison (0 = skip)")
+    args = parser.parse_args()
+
+    StubTicker.delays = {name: delay * args.scale for name, delay in DELAYS.items()}
+    # DataEngine and PriceStore import yfinance lazily, so patching the module attributes is enough
+    yfinance.Ticker = StubTicker
+    yfinance.download = StubDownload()
+    engine = fresh_engine()
+
+    seq_best, seq_mean = timed(lambda: sequential_fetch("STUB"), args.runs)
+    par_best, par_mean = timed(lambda: fresh_engine().get_ticker_data("STUB"), args.runs)
+
+    per_ticker = {name: delay for name, delay in StubTicker.delays.items() if name != "download"}
+    print(f"sum of delays     : {sum(per_ticker.values()):.3f}s")
+    print(f"slowest call      : {max(per_ticker.values()):.3f}s")
+    print(f"sequential        : best {seq_best:.3f}s  mean {seq_mean:.3f}s")
+    print(f"parallel fan-out  : best {par_best:.3f}s  mean {par_mean:.3f}s  ({seq_mean / par_mean:.1f}x)")
+
+    # Warm cache: a repeat lookup within the TTLs skips the stub entirely
+    cached_engine = DataEngine(cache=TTLCache(), price_store=PriceStore(tempfile.mkdtemp()),
+                               fundamentals_store=FundamentalsStore(tempfile.mkdtemp()))
+    cold_best, _ = timed(lambda: cached_engine.get_ticker_data("STUB"), 1)
+    warm_best, _ = timed(lambda: cached_engine.get_ticker_data("STUB"), args.runs)
+    print(f"cache cold / warm : {cold_best:.3f}s / {warm_best * 1000:.2f}ms  {cached_engine.cache_stats()['totals']}")
+
+    # Partial results: a failing balance sheet must not lose price and history
+    StubTicker.failing = {"balance_sheet"}
+    result = engine.get_ticker_data("STUB")
+    StubTicker.failing = set()
+    assert "error" not in result, result
+    assert result["current_price"] == 101.0 and len(result["history"]) == 252
+    print(f"partial result    : ok (missing={result['missing']})")
+
+    # Per-call timeout: a hung history call is cut off at its deadline
+    engine.timeouts["history"] = 0.2 * args.scale
+    StubTicker.delays = dict(StubTicker.delays, history=5.0 * args.scale)
+    started = time.perf_counter()
+    result = engine.get_ticker_data("HUNG")
+    elapsed = time.perf_counter() - started
+    assert "error" not in result and result["history"].empty, result
+    print(f"history timeout   : returned after {elapsed:.3f}s (missing={result['missing']})")
+    StubTicker.delays = {name: delay * args.scale for name, delay in DELAYS.items()}
+
+    if args.bulk:
+        # Watchlist refresh: per-ticker calls through the fan-out vs the bulk path
+        symbols = [f"S{i:04d}" for i in range(args.bulk)]
+        single_engine = fresh_engine()
+        started = time.perf_counter()
+        for symbol in symbols:
+            single_engine.get_ticker_data(symbol)
+        single = time.perf_counter() - started
+
+        bulk_engine = fresh_engine()
+        StubDownload.calls = 0
+        started = time.perf_counter()
+        result = bulk_engine.get_bulk_data(symbols)
+        bulk = time.perf_counter() - started
+        assert all("error" not in data for data in result["tickers"].values())
+        assert result["prices"].index.names == ["Ticker", "Date"]
+        print(f"{args.bulk} tickers one by one : {single:.3f}s ({args.bulk * (len(STATEMENTS) + 2)} yfinance calls)")
+        print(f"{args.bulk} tickers bulk       : {bulk:.3f}s ({StubDownload.calls} price downloads, "
+              f"{args.bulk * (len(STATEMENTS) + 1)} info/statement calls on {bulk_engine.bulk_workers} workers, {single / bulk:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
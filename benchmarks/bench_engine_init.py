@@ -0,0 +1,50 @@
+"""
+Per-rerun engine overhead: fresh engines (dev mode) vs the shared instances (production).
+
+Every Streamlit rerun calls engines.get_engines(). In dev mode that builds a new
+DataEngine, AIEngine (genai.Client, secrets/.env lookup) and HistoryEngine (makedirs,
+SQLite schema check); in production it is a cache lookup. Runs offline: genai.Client
+makes no request on construction, so a dummy key is used if none is configured.
+
+Usage:
+    python benchmarks/bench_engine_init.py [--reruns 50]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("GOOGLE_API_KEY", "benchmark-dummy-key")
+
+import engines
+
+
+def per_rerun(fn, reruns):
+    started = time.perf_counter()
+    for _ in range(reruns):
+        fn()
+    return (time.perf_counter() - started) / reruns
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--reruns", type=int, default=50)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as history_dir:
+        # Warm up imports and the shared instance, as after the first rerun in production
+        engines.build_engines(history_dir)
+        engines._shared_engines(history_dir)
+
+        fresh = per_rerun(lambda: engines.build_engines(history_dir), args.reruns)
+        shared = per_rerun(lambda: engines._shared_engines(history_dir), args.reruns)
+
+    print(f"fresh engines (dev mode) : {fresh * 1000:8.2f} ms per rerun")
+    print(f"shared engines           : {shared * 1000:8.2f} ms per rerun")
+    print(f"saved per rerun          : {(fresh - shared) * 1000:8.2f} ms ({fresh / shared:.0f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""
+Cold-start benchmark: import time of the app modules in a fresh interpreter.
+
+Each measurement runs in a new Python process, so nothing is cached in sys.modules.
+It also records which heavy dependencies were pulled in by the imports; they should
+only load on first use, and one showing up here is a regression even if the timing is noisy.
+With --landing, the time to render the landing page once (Streamlit AppTest) is measured too.
+
+Each run appends one JSON line to the results file, so cold-start latency can be tracked over time.
+
+Usage:
+    python benchmarks/bench_import.py [--repeat 5] [--landing] [--output benchmarks/results/import_times.jsonl]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+from datetime import datetime
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+MODULES = ["engines", "pipeline", "batch", "ui_components"]
+# plotly is not listed: streamlit itself imports it for its chart theme
+HEAVY_DEPENDENCIES = ["yfinance", "google.genai", "pandas", "numpy", "pyarrow", "dotenv"]
+
+IMPORT_SNIPPET = """
+import sys, time, json
+started = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - started
+print(json.dumps({{"seconds": elapsed, "loaded": [m for m in {heavy!r} if m in sys.modules]}}))
+"""
+
+LANDING_SNIPPET = """
+import os, time, json
+os.environ.setdefault("GOOGLE_API_KEY", "benchmark-dummy-key")
+started = time.perf_counter()
+from streamlit.testing.v1 import AppTest
+at = AppTest.from_file({app!r}, default_timeout=120).run()
+elapsed = time.perf_counter() - started
+print(json.dumps({{"seconds": elapsed, "exceptions": len(at.exception)}}))
+"""
+
+
+def run_snippet(code, cwd):
+    env = dict(os.environ, PYTHONPATH=ROOT + os.pathsep + os.environ.get("PYTHONPATH", ""))
+    output = subprocess.run(
+        [sys.executable, "-c", code], cwd=cwd, env=env, capture_output=True, text=True, check=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except Exception:
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--landing", action="store_true", help="also time one landing-page render via AppTest")
+    parser.add_argument("--output", default=os.path.join(ROOT, "benchmarks", "results", "import_times.jsonl"))
+    args = parser.parse_args()
+
+    result = {"timestamp": datetime.now().isoformat(timespec="seconds"), "revision": git_revision(), "modules": {}}
+
+    with tempfile.TemporaryDirectory() as workdir:
+        for module in MODULES + [",".join(MODULES)]:
+            samples = [
+                run_snippet(IMPORT_SNIPPET.format(module=module.replace(",", ", "), heavy=HEAVY_DEPENDENCIES), workdir)
+                for _ in range(args.repeat)
+            ]
+            seconds = statistics.median(s["seconds"] for s in samples)
+            loaded = samples[0]["loaded"]
+            result["modules"][module] = {"median_seconds": seconds, "heavy_loaded": loaded}
+            print(f"import {module:<40} {seconds * 1000:8.1f} ms  heavy: {', '.join(loaded) or '-'}")
+
+        if args.landing:
+            landing = run_snippet(LANDING_SNIPPET.format(app=os.path.join(ROOT, "app.py")), workdir)
+            result["landing_page_seconds"] = landing["seconds"]
+            print(f"landing page render                            {landing['seconds'] * 1000:8.1f} ms")
+
+    os.makedirs(os.path.dirname(args.output), exist_ok=True)
+    with open(args.output, 'a', encoding='utf-8') as f:
+        f.write(json.dumps(result) + "\n")
+    print(f"Appended to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
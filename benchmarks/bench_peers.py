@@ -0,0 +1,69 @@
+"""
+Peer comparison on synthetic 'Hard Data' dicts.
+
+Times compare_peers uncached (table, ranks, sector medians, formatting) and cached
+(table build and data fingerprint only). No network access is needed.
+
+Usage:
+    python benchmarks/bench_peers.py [--tickers 50] [--runs 5]
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from cache import TTLCache
+import peers
+
+
+def synthetic_peers(count, seed=0):
+    rng = np.random.default_rng(seed)
+    sectors = ["Technology", "Energy", "Healthcare", "Financial Services"]
+    return {
+        f"T{i:04d}": {
+            "name": f"Company {i}", "sector": sectors[i % len(sectors)],
+            "market_cap": float(rng.uniform(1e8, 3e12)), "total_revenue": float(rng.uniform(1e7, 4e11)),
+            "gross_margin": float(rng.uniform(0, 0.8)), "operating_margin": float(rng.uniform(-0.2, 0.45)),
+            "pe_ratio": float(rng.uniform(5, 90)) if i % 9 else None, "forward_pe": float(rng.uniform(5, 60)),
+            "beta": float(rng.uniform(0.4, 2.2)), "eps_gaap": float(rng.uniform(-3, 15)),
+            "eps_non_gaap": float(rng.uniform(0, 15)) if i % 5 else "N/A",
+            "rpo_value": float(rng.uniform(1e8, 2e10)) if i % 2 else None,
+        }
+        for i in range(count)
+    }
+
+
+def timed(fn, runs):
+    samples = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - started)
+    return min(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tickers", type=int, default=50)
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    tickers = synthetic_peers(args.tickers)
+    # max_entries=0 disables the result cache so every run computes
+    uncached = TTLCache(max_entries=0)
+    cache = TTLCache()
+    peers.compare_peers(tickers, cache=cache)
+
+    full = timed(lambda: peers.compare_peers(tickers, cache=uncached), args.runs)
+    cached = timed(lambda: peers.compare_peers(tickers, cache=cache), args.runs)
+
+    print(f"{args.tickers} tickers, compare_peers : {full * 1000:8.2f} ms")
+    print(f"{args.tickers} tickers, cached        : {cached * 1000:8.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
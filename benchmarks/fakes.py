@@ -0,0 +1,316 @@
+"""
+Offline stand-ins for yfinance and the Gemini client, used by the benchmark suite.
+
+Fixtures live in benchmarks/fixtures/<SYMBOL>/ (written by record_fixtures.py):
+    info.json            Ticker.info
+    financials.json      Ticker.financials     (DataFrame, orient="split")
+    balance_sheet.json   Ticker.balance_sheet  (DataFrame, orient="split")
+    cashflow.json        Ticker.cashflow       (DataFrame, orient="split")
+    quarterly_*.json     the quarterly variants of the three statements
+    history.json         Ticker.history(period="5y", auto_adjust=False)
+
+install_yfinance(fixtures_dir) patches yfinance.Ticker and yfinance.download to serve them;
+DataEngine and PriceStore import yfinance lazily, so patching the module attributes is enough.
+"""
+import io
+import json
+import os
+import threading
+import time
+from types import SimpleNamespace
+
+import numpy as np
+import pandas as pd
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+# Injected latency per yfinance call, in seconds; 0 measures the code path alone
+YF_LATENCY = {
+    "info": 0.0, "financials": 0.0, "balance_sheet": 0.0, "cashflow": 0.0,
+    "quarterly_financials": 0.0, "quarterly_balance_sheet": 0.0, "quarterly_cashflow": 0.0,
+    "history": 0.0, "download": 0.0,
+}
+
+
+# --- yfinance ----------------------------------------------------------------
+
+def frame_to_json(frame):
+    return frame.to_json(orient="split", date_format="iso")
+
+
+def frame_from_json(text, part, timezone="America/New_York"):
+    """
+    Reads a fixture frame back with the types yfinance returns: price history has a
+    tz-aware DatetimeIndex, statements have one Timestamp column per period.
+    """
+    frame = pd.read_json(io.StringIO(text), orient="split", convert_dates=False)
+    if part == "history":
+        frame.index = pd.to_datetime(frame.index, utc=True, format="ISO8601").tz_convert(timezone)
+        frame.index.name = "Date"
+    else:
+        frame.columns = pd.to_datetime(frame.columns, format="ISO8601")
+    return frame
+
+
+class FixtureSet:
+    """Fixture files of one directory, parsed once and kept in memory."""
+
+    def __init__(self, fixtures_dir=FIXTURES_DIR):
+        self.fixtures_dir = fixtures_dir
+        self._cache = {}
+        self._lock = threading.RLock()
+
+    def symbols(self):
+        if not os.path.isdir(self.fixtures_dir):
+            return []
+        return sorted(
+            name for name in os.listdir(self.fixtures_dir)
+            if os.path.isfile(os.path.join(self.fixtures_dir, name, "info.json"))
+        )
+
+    def load(self, symbol, part):
+        """
+        Returns a fixture part for 'symbol'. Unknown symbols are served from the first
+        recorded one under the new name, so throughput runs can use any number of tickers.
+        """
+        symbol = symbol.upper()
+        source = symbol if os.path.isdir(os.path.join(self.fixtures_dir, symbol)) else self.symbols()[0]
+        key = (source, part)
+        with self._lock:
+            if key not in self._cache:
+                path = os.path.join(self.fixtures_dir, source, f"{part}.json")
+                with open(path, 'r', encoding='utf-8') as f:
+                    text = f.read()
+                if part == "info":
+                    self._cache[key] = json.loads(text)
+                else:
+                    timezone = self.load(source, "info").get("exchangeTimezoneName", "America/New_York")
+                    self._cache[key] = frame_from_json(text, part, timezone)
+            value = self._cache[key]
+        if part == "info":
+            return dict(value, symbol=symbol)
+        return value.copy()
+
+
+def _history_range(history, period=None, start=None):
+    if start is not None:
+        start = pd.Timestamp(start)
+        if start.tzinfo is None and history.index.tz is not None:
+            start = start.tz_localize(history.index.tz)
+        return history[history.index >= start]
+    if period in (None, "max"):
+        return history
+    from price_store import PERIOD_OFFSETS
+
+    offset = PERIOD_OFFSETS.get(period)
+    if offset is None:
+        return history
+    return history[history.index >= history.index[-1] - pd.DateOffset(**offset)]
+
+
+def install_yfinance(fixtures):
+    """
+    Replaces yfinance.Ticker and yfinance.download with fixture-backed versions.
+    """
+    import yfinance
+
+    class FixtureTicker:
+        def __init__(self, symbol):
+            self.ticker = symbol
+
+        def _part(self, name):
+            time.sleep(YF_LATENCY[name])
+            return fixtures.load(self.ticker, name)
+
+        @property
+        def info(self):
+            return self._part("info")
+
+        @property
+        def financials(self):
+            return self._part("financials")
+
+        @property
+        def balance_sheet(self):
+            return self._part("balance_sheet")
+
+        @property
+        def cashflow(self):
+            return self._part("cashflow")
+
+        @property
+        def quarterly_financials(self):
+            return self._part("quarterly_financials")
+
+        @property
+        def quarterly_balance_sheet(self):
+            return self._part("quarterly_balance_sheet")
+
+        @property
+        def quarterly_cashflow(self):
+            return self._part("quarterly_cashflow")
+
+        def history(self, period=None, start=None, **kwargs):
+            return _history_range(self._part("history"), period, start)
+
+    def download(symbols, period=None, start=None, **kwargs):
+        time.sleep(YF_LATENCY["download"])
+        frames = {}
+        for symbol in symbols:
+            history = _history_range(fixtures.load(symbol, "history"), period, start)
+            # yf.download returns tz-naive daily bars
+            history.index = history.index.tz_localize(None)
+            frames[symbol] = history
+        return pd.concat(frames, axis=1)
+
+    yfinance.Ticker = FixtureTicker
+    yfinance.download = download
+
+
+def write_synthetic_fixtures(fixtures_dir, symbols=("AAPL", "MSFT"), years=5, seed=0):
+    """
+    Fixtures with the shape of real yfinance responses but made-up numbers,
+    for machines where record_fixtures.py can't reach Yahoo.
+    """
+    rng = np.random.default_rng(seed)
+    index = pd.date_range(end=pd.Timestamp.today().normalize(), periods=252 * years, freq="B",
+                          tz="America/New_York", name="Date")
+    periods = pd.to_datetime(["2025-09-30", "2024-09-30", "2023-09-30", "2022-09-30"])
+    quarters = pd.to_datetime(["2025-09-30", "2025-06-30", "2025-03-31", "2024-12-31", "2024-09-30"])
+
+    for i, symbol in enumerate(symbols):
+        close = 100 * np.exp(np.cumsum(rng.normal(0.0004, 0.015, len(index))))
+        history = pd.DataFrame({
+            "Open": close * (1 + rng.normal(0, 0.003, len(index))),
+            "High": close * 1.01, "Low": close * 0.99, "Close": close, "Adj Close": close,
+            "Volume": rng.integers(1e6, 5e7, len(index)),
+            "Dividends": 0.0, "Stock Splits": 0.0,
+        }, index=index)
+        revenue = 1e11 * (1 + i) * np.array([1.0, 0.92, 0.85, 0.8])
+        financials = pd.DataFrame(
+            [revenue, revenue * 0.44, revenue * 0.3, revenue * 0.25],
+            index=["Total Revenue", "Gross Profit", "Operating Income", "Net Income"], columns=periods
+        )
+        balance_sheet = pd.DataFrame(
+            [revenue * 0.1, revenue * 3, revenue * 1.8],
+            index=["Deferred Revenue", "Total Assets", "Total Liabilities Net Minority Interest"], columns=periods
+        )
+        cashflow = pd.DataFrame(
+            [revenue * 0.3, -revenue * 0.04, revenue * 0.26],
+            index=["Operating Cash Flow", "Capital Expenditure", "Free Cash Flow"], columns=periods
+        )
+        quarterly_revenue = revenue[0] / 4 * np.array([1.0, 0.97, 0.95, 0.99, 0.92])
+        statements = {
+            "financials": financials,
+            "balance_sheet": balance_sheet,
+            "cashflow": cashflow,
+            "quarterly_financials": pd.DataFrame(
+                [quarterly_revenue, quarterly_revenue * 0.25],
+                index=["Total Revenue", "Net Income"], columns=quarters
+            ),
+            "quarterly_balance_sheet": pd.DataFrame(
+                [quarterly_revenue * 0.4, quarterly_revenue * 12],
+                index=["Deferred Revenue", "Total Assets"], columns=quarters
+            ),
+            "quarterly_cashflow": pd.DataFrame(
+                [quarterly_revenue * 0.3, quarterly_revenue * 0.26],
+                index=["Operating Cash Flow", "Free Cash Flow"], columns=quarters
+            ),
+        }
+        info = {
+            "symbol": symbol, "longName": f"{symbol} Inc.", "currency": "USD", "sector": "Technology",
+            "currentPrice": float(close[-1]), "previousClose": float(close[-2]), "totalRevenue": float(revenue[0]),
+            "trailingEps": 6.1, "forwardEps": 7.0, "trailingPE": 30.5, "forwardPE": 27.0,
+            "targetMeanPrice": float(close[-1] * 1.1), "grossMargins": 0.44, "operatingMargins": 0.3,
+            "beta": 1.2, "marketCap": float(close[-1] * 1.5e10),
+        }
+
+        directory = os.path.join(fixtures_dir, symbol)
+        os.makedirs(directory, exist_ok=True)
+        with open(os.path.join(directory, "info.json"), 'w', encoding='utf-8') as f:
+            json.dump(info, f, indent=2)
+        for name, frame in dict(statements, history=history).items():
+            with open(os.path.join(directory, f"{name}.json"), 'w', encoding='utf-8') as f:
+                f.write(frame_to_json(frame))
+
+
+# --- Gemini ------------------------------------------------------------------
+
+class RateLimitError(Exception):
+    """Shaped like the google-genai 429 error text, including a retry hint."""
+
+
+def _tokens(contents):
+    text = contents if isinstance(contents, str) else json.dumps(contents, default=str)
+    return len(text) // 4
+
+
+class FakeModels:
+    def __init__(self, client):
+        self._client = client
+
+    def generate_content_stream(self, model, contents, config=None):
+        return self._client._stream(model, contents, config)
+
+
+class FakeGeminiClient:
+    """
+    Stands in for genai.Client in AIEngine (assign it to engine.client).
+
+    first_token_latency  seconds before the first chunk
+    chunk_latency        seconds between chunks
+    chunks               number of text chunks per report
+    fail_first           the first N requests fail with a 429 (with a retry hint of retry_after seconds)
+    rate_limit_every     additionally, every Nth request fails with a 429 (0 = never)
+    prefill_latency      extra seconds before the first chunk per 1000 input tokens
+
+    Input tokens are counted like Gemini: prompt_token_count includes the system instruction.
+    """
+
+    def __init__(self, first_token_latency=0.5, chunk_latency=0.02, chunks=40, fail_first=0,
+                 rate_limit_every=0, retry_after=0.1, report_text=None, prefill_latency=0.0):
+        self.first_token_latency = first_token_latency
+        self.chunk_latency = chunk_latency
+        self.chunks = chunks
+        self.fail_first = fail_first
+        self.rate_limit_every = rate_limit_every
+        self.retry_after = retry_after
+        self.prefill_latency = prefill_latency
+        self.report_text = report_text or "## Fake report\n" + "Lorem ipsum dolor sit amet. " * 400
+        self.models = FakeModels(self)
+        self.requests = 0
+        self.rate_limited = 0
+        self._lock = threading.Lock()
+
+    def _prompt_tokens(self, contents, config):
+        return _tokens(contents) + _tokens(getattr(config, "system_instruction", None) or "")
+
+    def _stream(self, model, contents, config):
+        with self._lock:
+            self.requests += 1
+            number = self.requests
+        if number <= self.fail_first or (self.rate_limit_every and number % self.rate_limit_every == 0):
+            with self._lock:
+                self.rate_limited += 1
+            raise RateLimitError(f"429 RESOURCE_EXHAUSTED. Please retry in {self.retry_after}s.")
+
+        prompt_tokens = self._prompt_tokens(contents, config)
+        first_token_latency = self.first_token_latency + self.prefill_latency * prompt_tokens / 1000
+        step = -(-len(self.report_text) // self.chunks)
+        pieces = [self.report_text[i:i + step] for i in range(0, len(self.report_text), step)]
+
+        def generate():
+            time.sleep(first_token_latency)
+            for i, piece in enumerate(pieces):
+                if i:
+                    time.sleep(self.chunk_latency)
+                usage = None
+                if i == len(pieces) - 1:
+                    output_tokens = len(self.report_text) // 4
+                    usage = SimpleNamespace(
+                        prompt_token_count=prompt_tokens, candidates_token_count=output_tokens,
+                        total_token_count=prompt_tokens + output_tokens
+                    )
+                yield SimpleNamespace(text=piece, usage_metadata=usage)
+
+        return generate()
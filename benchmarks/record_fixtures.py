@@ -0,0 +1,61 @@
+"""
+Records yfinance responses into benchmarks/fixtures/ for the offline benchmark suite.
+
+Needs network access. Re-record when yfinance changes its response shapes.
+With --synthetic, writes made-up fixtures of the same shape instead (no network).
+
+Usage:
+    python benchmarks/record_fixtures.py AAPL MSFT NVDA
+    python benchmarks/record_fixtures.py --synthetic AAPL MSFT
+"""
+import argparse
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from fakes import FIXTURES_DIR, frame_to_json, write_synthetic_fixtures
+
+
+def record(symbol, fixtures_dir):
+    import yfinance as yf
+
+    ticker = yf.Ticker(symbol)
+    directory = os.path.join(fixtures_dir, symbol.upper())
+    os.makedirs(directory, exist_ok=True)
+
+    with open(os.path.join(directory, "info.json"), 'w', encoding='utf-8') as f:
+        json.dump(ticker.info, f, indent=2, default=str)
+    parts = {
+        "financials": ticker.financials,
+        "balance_sheet": ticker.balance_sheet,
+        "cashflow": ticker.cashflow,
+        "quarterly_financials": ticker.quarterly_financials,
+        "quarterly_balance_sheet": ticker.quarterly_balance_sheet,
+        "quarterly_cashflow": ticker.quarterly_cashflow,
+        "history": ticker.history(period="5y", auto_adjust=False),
+    }
+    for name, frame in parts.items():
+        with open(os.path.join(directory, f"{name}.json"), 'w', encoding='utf-8') as f:
+            f.write(frame_to_json(frame))
+    print(f"{symbol}: {len(parts['history'])} bars, {len(parts['financials'])} income statement rows")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("symbols", nargs="+")
+    parser.add_argument("--synthetic", action="store_true", help="write made-up fixtures instead of recording")
+    parser.add_argument("--output", default=FIXTURES_DIR)
+    args = parser.parse_args()
+
+    if args.synthetic:
+        write_synthetic_fixtures(args.output, [s.upper() for s in args.symbols])
+        print(f"Synthetic fixtures for {', '.join(args.symbols)} in {args.output}")
+        return
+    for symbol in args.symbols:
+        record(symbol, args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,380 @@
+"""
+Offline benchmark suite for the whole analyze path.
+
+yfinance is served from recorded fixtures (benchmarks/fixtures, see record_fixtures.py) and
+Gemini is a fake client with configurable latency and injected 429s (see fakes.py), so the
+suite needs no network and no API key. It measures:
+
+    analyze       end-to-end run_analysis latency (fresh report, report with a 429 retry,
+                  report reused from History), with the per-stage breakdown from telemetry
+                  and the input tokens per analysis
+    data          get_ticker_data throughput, one by one and from concurrent callers
+    storage       save_analysis / load_analysis time and the size written per analysis
+    history_list  get_history_list with 100, 1k and 10k saved analyses (index build, warm
+                  call, call after one new analysis), the sidebar's first page of
+                  ticker groups and search_reports over them
+
+Results are written as JSON to benchmarks/results/suite_latest.json and appended to
+suite_history.jsonl. With --compare, metrics that got worse than the baseline by more
+than --tolerance are listed and the exit code is 1, so a deploy script can stop on it.
+Metric names ending in "_per_second" are higher-is-better, all others lower-is-better.
+
+Usage:
+    python benchmarks/run_suite.py [--quick] [--compare benchmarks/results/baseline.json]
+"""
+import argparse
+import json
+import logging
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, ROOT)
+sys.path.insert(0, BENCH_DIR)
+os.environ.setdefault("GOOGLE_API_KEY", "benchmark-dummy-key")
+
+import fakes
+from cache import TTLCache
+from data_engine import DataEngine
+from ai_engine import AIEngine
+from history_engine import HistoryEngine
+from pipeline import run_analysis
+from price_store import PriceStore
+from fundamentals import FundamentalsStore
+from rate_limiter import RateLimiter
+
+RESULTS_DIR = os.path.join(BENCH_DIR, "results")
+
+# One JSON log line per analysis is useful in production, not between benchmark results
+logging.getLogger("auto_analyst.perf").setLevel(logging.WARNING)
+
+
+def summarize(samples):
+    ordered = sorted(samples)
+    return {
+        "runs": len(ordered),
+        "mean_seconds": statistics.fmean(ordered),
+        "p50_seconds": ordered[len(ordered) // 2],
+        "p95_seconds": ordered[min(len(ordered) - 1, int(round(0.95 * (len(ordered) - 1))))],
+    }
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except Exception:
+        return None
+
+
+class Workspace:
+    """Fresh engines over temporary directories, so runs never touch real data or caches."""
+
+    def __init__(self, root, gemini):
+        self.root = root
+        self.price_store = PriceStore(os.path.join(root, "prices"))
+        self.fundamentals = FundamentalsStore(os.path.join(root, "fundamentals"))
+        # max_entries=0 disables the component cache: every run really goes through yfinance
+        self.data_engine = DataEngine(cache=TTLCache(max_entries=0), price_store=self.price_store,
+                                      fundamentals_store=self.fundamentals)
+        self.ai_engine = AIEngine()
+        self.ai_engine.client = gemini
+        # A private, effectively unlimited quota: the suite measures our code, not the RPM setting
+        self.ai_engine.rate_limiter = RateLimiter(100000)
+        self.history_engine = HistoryEngine(os.path.join(root, "history"), price_store=self.price_store)
+
+
+# --- Benchmarks ----------------------------------------------------------------
+
+def bench_analyze(workdir, symbols, runs, gemini_args):
+    results = {}
+    scenarios = {
+        "fresh_report": dict(gemini_args),
+        "rate_limited_once": dict(gemini_args, fail_first=1),
+    }
+    # Warm-up: the first run pays one-off imports (google.genai types, pyarrow)
+    ws = Workspace(tempfile.mkdtemp(dir=workdir), fakes.FakeGeminiClient(first_token_latency=0, chunk_latency=0))
+    run_analysis(symbols[0], ws.data_engine, ws.ai_engine, ws.history_engine, force_refresh=True)
+
+    for name, client_args in scenarios.items():
+        samples = []
+        stages = {}
+        input_tokens = []
+        for i in range(runs):
+            gemini = fakes.FakeGeminiClient(**client_args)
+            ws = Workspace(tempfile.mkdtemp(dir=workdir), gemini)
+            started = time.perf_counter()
+            result = run_analysis(symbols[i % len(symbols)], ws.data_engine, ws.ai_engine, ws.history_engine,
+                                  force_refresh=True)
+            samples.append(time.perf_counter() - started)
+            assert "error" not in result, result
+            perf = result.get("perf") or {}
+            for span in perf.get("spans", []):
+                stages.setdefault(span["name"], []).append(span["seconds"])
+            counters = perf.get("counters", {})
+            input_tokens.append(counters.get("ai.prompt_tokens", 0) - counters.get("ai.cached_tokens", 0))
+        results[name] = dict(summarize(samples), stages={k: statistics.fmean(v) for k, v in sorted(stages.items())},
+                             uncached_input_tokens=statistics.fmean(input_tokens))
+
+    # A second analysis of the same ticker reuses the saved report
+    ws = Workspace(tempfile.mkdtemp(dir=workdir), fakes.FakeGeminiClient(**gemini_args))
+    run_analysis(symbols[0], ws.data_engine, ws.ai_engine, ws.history_engine, force_refresh=True)
+    samples = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        result = run_analysis(symbols[0], ws.data_engine, ws.ai_engine, ws.history_engine)
+        samples.append(time.perf_counter() - started)
+        assert result["report_source"], result
+    results["report_from_history"] = summarize(samples)
+    return results
+
+
+def bench_data(workdir, tickers, workers):
+    ws = Workspace(tempfile.mkdtemp(dir=workdir), None)
+    symbols = [f"B{i:04d}" for i in range(tickers)]
+
+    started = time.perf_counter()
+    for symbol in symbols:
+        assert "error" not in ws.data_engine.get_ticker_data(symbol)
+    sequential = time.perf_counter() - started
+
+    ws = Workspace(tempfile.mkdtemp(dir=workdir), None)
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        outcomes = list(pool.map(ws.data_engine.get_ticker_data, symbols))
+    concurrent = time.perf_counter() - started
+    assert all("error" not in o for o in outcomes)
+
+    return {
+        "tickers": tickers,
+        "workers": workers,
+        "sequential_tickers_per_second": tickers / sequential,
+        "concurrent_tickers_per_second": tickers / concurrent,
+    }
+
+
+def _directory_size(path):
+    return sum(os.path.getsize(os.path.join(d, f)) for d, _, files in os.walk(path) for f in files)
+
+
+def bench_storage(workdir, symbol, runs):
+    ws = Workspace(tempfile.mkdtemp(dir=workdir), None)
+    data = ws.data_engine.get_ticker_data(symbol)
+    report = fakes.FakeGeminiClient().report_text
+
+    save_samples, load_samples, access_samples, ids = [], [], [], []
+    for _ in range(runs):
+        started = time.perf_counter()
+        ids.append(ws.history_engine.save_analysis(symbol, data, report))
+        save_samples.append(time.perf_counter() - started)
+
+    for analysis_id in ids:
+        started = time.perf_counter()
+        loaded = ws.history_engine.load_analysis(analysis_id)
+        load_samples.append(time.perf_counter() - started)
+        started = time.perf_counter()
+        loaded["data"]["history"]
+        access_samples.append(time.perf_counter() - started)
+
+    history_dir = ws.history_engine.history_dir
+    json_size = os.path.getsize(os.path.join(history_dir, ids[0]))
+    frames_size = _directory_size(os.path.join(history_dir, "frames")) // len(ids) if os.path.isdir(
+        os.path.join(history_dir, "frames")) else 0
+    return {
+        "save": summarize(save_samples),
+        "load": summarize(load_samples),
+        "first_history_access": summarize(access_samples),
+        "json_bytes": json_size,
+        "frames_bytes": frames_size,
+    }
+
+
+def _populate_history(history_dir, template, count):
+    """Writes 'count' analysis files cloned from one saved payload, with distinct tickers and times."""
+    base = datetime(2020, 1, 1)
+    for i in range(count):
+        timestamp = (base + timedelta(minutes=i)).strftime("%Y%m%d_%H%M%S")
+        ticker = f"T{i % 500:03d}"
+        payload = dict(template, ticker=ticker, timestamp=timestamp)
+        with open(os.path.join(history_dir, f"{ticker}_{timestamp}.json"), 'w', encoding='utf-8') as f:
+            json.dump(payload, f, ensure_ascii=False, indent=4)
+
+
+def bench_history_list(workdir, symbol, sizes, runs):
+    ws = Workspace(tempfile.mkdtemp(dir=workdir), None)
+    data = ws.data_engine.get_ticker_data(symbol)
+    template_id = ws.history_engine.save_analysis(symbol, data, fakes.FakeGeminiClient().report_text)
+    with open(os.path.join(ws.history_engine.history_dir, template_id), 'r', encoding='utf-8') as f:
+        template = json.load(f)
+
+    results = {}
+    for size in sizes:
+        history_dir = tempfile.mkdtemp(dir=workdir)
+        _populate_history(history_dir, template, size)
+        engine = HistoryEngine(history_dir, price_store=ws.price_store)
+
+        started = time.perf_counter()
+        entries = engine.get_history_list()
+        cold = time.perf_counter() - started
+        assert len(entries) == size
+
+        warm = []
+        for _ in range(runs):
+            started = time.perf_counter()
+            engine.get_history_list()
+            warm.append(time.perf_counter() - started)
+
+        groups = []
+        for _ in range(runs):
+            started = time.perf_counter()
+            engine.get_ticker_groups(offset=0, limit=20)
+            groups.append(time.perf_counter() - started)
+
+        # Every cloned report matches the query, the worst case for ranking
+        search = []
+        for _ in range(runs):
+            started = time.perf_counter()
+            engine.search_reports("dolor amet", date_from="2020-01-01", limit=50)
+            search.append(time.perf_counter() - started)
+
+        engine.save_analysis("NEW", data, "report")
+        started = time.perf_counter()
+        assert len(engine.get_history_list()) == size + 1
+        after_save = time.perf_counter() - started
+
+        results[str(size)] = {
+            "index_build_seconds": cold,
+            "warm": summarize(warm),
+            "groups_page": summarize(groups),
+            "search": summarize(search),
+            "after_save_seconds": after_save,
+        }
+        shutil.rmtree(history_dir, ignore_errors=True)
+    return results
+
+
+# --- Report ----------------------------------------------------------------------
+
+def flatten(results, prefix=""):
+    """{"a": {"b": 1}} -> {"a.b": 1}, numbers only."""
+    flat = {}
+    for key, value in results.items():
+        name = f"{prefix}{key}"
+        if isinstance(value, dict):
+            flat.update(flatten(value, name + "."))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            flat[name] = value
+    return flat
+
+
+def compare(current, baseline, tolerance, min_delta=0.005):
+    """
+    Lists metrics that got worse by more than 'tolerance' (relative).
+    Timings that moved by less than 'min_delta' seconds are noise and never reported.
+    Byte sizes are compared like timings (lower is better).
+    """
+    regressions = []
+    ignored = ("runs", "tickers", "workers")
+    old = flatten(baseline["results"])
+    for name, value in flatten(current["results"]).items():
+        if name not in old or name.rsplit(".", 1)[-1] in ignored or not old[name]:
+            continue
+        if name.endswith("_seconds") and abs(value - old[name]) < min_delta:
+            continue
+        change = (value - old[name]) / old[name]
+        if name.endswith("_per_second"):
+            change = -change
+        if change > tolerance:
+            regressions.append((name, old[name], value, change))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--quick", action="store_true", help="fewer runs and at most 1k history entries")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--tickers", type=int, default=50, help="tickers for the get_ticker_data throughput run")
+    parser.add_argument("--workers", type=int, default=8, help="concurrent callers in the throughput run")
+    parser.add_argument("--yf-latency", type=float, default=0.05, help="injected latency per yfinance call (s)")
+    parser.add_argument("--gemini-first-token", type=float, default=0.5, help="fake Gemini time to first chunk (s)")
+    parser.add_argument("--gemini-chunk", type=float, default=0.01, help="fake Gemini delay between chunks (s)")
+    parser.add_argument("--fixtures", default=fakes.FIXTURES_DIR)
+    parser.add_argument("--output", default=os.path.join(RESULTS_DIR, "suite_latest.json"))
+    parser.add_argument("--compare", metavar="BASELINE", help="earlier report to check for regressions")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed relative slowdown (0.2 = 20%%)")
+    parser.add_argument("--min-delta", type=float, default=0.005, help="ignore timing changes below this (s)")
+    args = parser.parse_args()
+
+    runs = 2 if args.quick else args.runs
+    sizes = [100, 1000] if args.quick else [100, 1000, 10000]
+    fakes.YF_LATENCY.update({name: args.yf_latency for name in fakes.YF_LATENCY})
+    gemini_args = {"first_token_latency": args.gemini_first_token, "chunk_latency": args.gemini_chunk}
+
+    with tempfile.TemporaryDirectory() as workdir:
+        fixtures = fakes.FixtureSet(args.fixtures)
+        fixture_kind = "recorded"
+        if not fixtures.symbols():
+            # No recordings on this machine: same shapes, made-up numbers (noted in the report)
+            fixtures = fakes.FixtureSet(os.path.join(workdir, "fixtures"))
+            fakes.write_synthetic_fixtures(fixtures.fixtures_dir)
+            fixture_kind = "synthetic"
+        fakes.install_yfinance(fixtures)
+        symbols = fixtures.symbols()
+
+        report = {
+            "suite": "offline",
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "revision": git_revision(),
+            "python": platform.python_version(),
+            "fixtures": {"kind": fixture_kind, "symbols": symbols},
+            "params": {
+                "runs": runs, "tickers": args.tickers, "workers": args.workers, "yf_latency": args.yf_latency,
+                "gemini": gemini_args, "history_sizes": sizes,
+            },
+            "results": {},
+        }
+
+        steps = [
+            ("analyze", lambda: bench_analyze(workdir, symbols, runs, gemini_args)),
+            ("data", lambda: bench_data(workdir, args.tickers, args.workers)),
+            ("storage", lambda: bench_storage(workdir, symbols[0], runs)),
+            ("history_list", lambda: bench_history_list(workdir, symbols[0], sizes, runs)),
+        ]
+        for name, step in steps:
+            started = time.perf_counter()
+            report["results"][name] = step()
+            print(f"{name:<13} done in {time.perf_counter() - started:6.1f}s", flush=True)
+
+    for name, value in flatten(report["results"]).items():
+        print(f"  {name:<60} {value:,.4f}" if isinstance(value, float) else f"  {name:<60} {value:,}")
+
+    os.makedirs(os.path.dirname(args.output), exist_ok=True)
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+    with open(os.path.join(os.path.dirname(args.output), "suite_history.jsonl"), 'a', encoding='utf-8') as f:
+        f.write(json.dumps(report) + "\n")
+    print(f"Report written to {args.output}")
+
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        regressions = compare(report, baseline, args.tolerance, args.min_delta)
+        for name, old, new, change in regressions:
+            print(f"REGRESSION {name}: {old:.4f} -> {new:.4f} ({change:+.0%})")
+        if regressions:
+            sys.exit(1)
+        print(f"No regressions vs {args.compare} (tolerance {args.tolerance:.0%})")
+
+
+if __name__ == "__main__":
+    main()
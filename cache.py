@@ -0,0 +1,123 @@
+import hashlib
+import os
+import pickle
+import threading
+import time
+import logging
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+MISSING = object()
+
+
+class TTLCache:
+    """
+    Two-tier cache with a per-entry TTL.
+    Tier 1 is a bounded in-memory LRU shared by all threads; tier 2 is an optional
+    directory of pickle files that survives restarts. Keys are tuples whose first
+    element is a namespace (e.g. "info", "history"); hits and misses are counted per namespace.
+    """
+
+    def __init__(self, max_entries=512, disk_dir=None):
+        self.max_entries = max_entries
+        self.disk_dir = disk_dir
+        if self.disk_dir and not os.path.exists(self.disk_dir):
+            os.makedirs(self.disk_dir)
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._counters = {}
+
+    def _count(self, key, outcome):
+        counters = self._counters.setdefault(key[0], {"memory_hits": 0, "disk_hits": 0, "misses": 0})
+        counters[outcome] += 1
+
+    def _disk_path(self, key):
+        digest = hashlib.sha256(repr(key).encode("utf-8")).hexdigest()
+        return os.path.join(self.disk_dir, f"{digest}.pkl")
+
+    def _remember(self, key, expires_at, value):
+        # Caller holds the lock
+        self._entries[key] = (expires_at, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def get(self, key):
+        """
+        Returns the cached value or MISSING if there is no unexpired entry.
+        """
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[0] > now:
+                    self._entries.move_to_end(key)
+                    self._count(key, "memory_hits")
+                    return entry[1]
+                del self._entries[key]
+
+        if self.disk_dir:
+            path = self._disk_path(key)
+            try:
+                with open(path, 'rb') as f:
+                    expires_at, value = pickle.load(f)
+                if expires_at > now:
+                    with self._lock:
+                        self._remember(key, expires_at, value)
+                        self._count(key, "disk_hits")
+                    return value
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            except Exception as e:
+                logger.warning(f"Dropping unreadable cache entry {path}: {e}")
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+
+        with self._lock:
+            self._count(key, "misses")
+        return MISSING
+
+    def set(self, key, value, ttl):
+        expires_at = time.time() + ttl
+        with self._lock:
+            self._remember(key, expires_at, value)
+
+        if self.disk_dir:
+            path = self._disk_path(key)
+            tmp_path = f"{path}.{threading.get_ident()}.tmp"
+            try:
+                with open(tmp_path, 'wb') as f:
+                    pickle.dump((expires_at, value), f, protocol=pickle.HIGHEST_PROTOCOL)
+                os.replace(tmp_path, path)
+            except Exception as e:
+                logger.warning(f"Could not write cache entry {path}: {e}")
+
+    def invalidate(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+        if self.disk_dir:
+            try:
+                os.remove(self._disk_path(key))
+            except OSError:
+                pass
+
+    def stats(self):
+        """
+        Returns hit/miss counters per namespace plus the current in-memory size.
+        """
+        with self._lock:
+            namespaces = {name: dict(counters) for name, counters in self._counters.items()}
+            size = len(self._entries)
+
+        totals = {"memory_hits": 0, "disk_hits": 0, "misses": 0}
+        for counters in namespaces.values():
+            for name in totals:
+                totals[name] += counters[name]
+        lookups = sum(totals.values())
+        totals["hit_rate"] = (totals["memory_hits"] + totals["disk_hits"]) / lookups if lookups else 0.0
+
+        return {"entries": size, "max_entries": self.max_entries, "totals": totals, "namespaces": namespaces}
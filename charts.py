@@ -0,0 +1,154 @@
+"""
+Price/volume chart for the metrics tab.
+
+Long series (multi-year daily, intraday) are downsampled on the server before they go
+to the browser: the x range is split into one bucket per two pixels and each bucket keeps
+its lowest and highest close, so spikes and crashes survive while the point count stays
+around the chart width. Volume is summed per bucket. The downsampled series is cached per
+(ticker, range, width) and the last bar, so reruns don't redo it and new bars invalidate it.
+"""
+import os
+
+import numpy as np
+import pandas as pd
+
+from cache import TTLCache, MISSING
+from indicators import MOVING_AVERAGES, moving_average
+
+# Range selector labels -> yfinance periods
+CHART_RANGES = {
+    "1M": "1mo",
+    "3M": "3mo",
+    "6M": "6mo",
+    "1R": "1y",
+    "5R": "5y",
+    "Max": "max",
+}
+DEFAULT_RANGE = "1R"
+
+# Target chart width in pixels; Streamlit doesn't report the viewport to the server
+CHART_WIDTH = int(os.getenv("CHART_WIDTH_PX", "1200"))
+
+CHART_TTL = 24 * 3600
+default_cache = TTLCache(max_entries=128)
+
+
+def minmax_indices(values, buckets):
+    """
+    Positions of the minimum and maximum of 'values' in each of 'buckets' equal slices,
+    plus the first and last point, sorted. Returns all positions if there are fewer
+    points than 2 * buckets. Fully vectorized: the series is padded and reshaped to
+    (buckets, bucket_size) and reduced along the rows.
+    """
+    n = len(values)
+    if n <= 2 * buckets:
+        return np.arange(n)
+
+    size = -(-n // buckets)
+    padded = np.full(size * buckets, np.nan)
+    padded[:n] = values
+    rows = padded.reshape(buckets, size)
+    # Buckets past the end are all padding
+    valid = ~np.isnan(rows).all(axis=1)
+    filled_min = np.where(np.isnan(rows), np.inf, rows)
+    filled_max = np.where(np.isnan(rows), -np.inf, rows)
+    offsets = np.arange(buckets)[valid] * size
+    picks = np.concatenate([
+        offsets + filled_min[valid].argmin(axis=1),
+        offsets + filled_max[valid].argmax(axis=1),
+        [0, n - 1],
+    ])
+    return np.unique(picks[picks < n])
+
+
+def bucket_sums(values, picks):
+    """
+    Sums 'values' between consecutive picked positions, so a bar at each kept point
+    carries the volume of the bars it stands for.
+    """
+    starts = np.concatenate([[0], picks[:-1] + 1])
+    return np.add.reduceat(np.nan_to_num(values), starts)
+
+
+def range_history(history, range_key, price_store=None, ticker=None):
+    """
+    Price history for a chart range. Ranges up to a year are cut from 'history' (no request);
+    longer ones come from the price store, which downloads them once and keeps them.
+    """
+    from price_store import PERIOD_OFFSETS
+
+    period = CHART_RANGES[range_key]
+    offset = PERIOD_OFFSETS[period]
+    if history is not None and not history.empty and offset is not None:
+        start = history.index[-1] - pd.DateOffset(**offset)
+        if start >= history.index[0] or price_store is None:
+            return history[history.index >= start]
+    if price_store is None or ticker is None:
+        return history
+    return price_store.get_history(ticker, period=period)
+
+
+def chart_series(history, ticker, range_key, width=CHART_WIDTH, cache=None):
+    """
+    Downsampled close, moving averages and volume for the chart, as a DataFrame
+    indexed by date. Moving averages are computed on the full series first, so
+    downsampling doesn't distort them.
+    """
+    cache = cache if cache is not None else default_cache
+    if history is None or history.empty:
+        return pd.DataFrame()
+
+    key = ("chart", ticker, range_key, width, str(history.index[-1]), len(history))
+    cached = cache.get(key)
+    if cached is not MISSING:
+        return cached
+
+    history = history.sort_index()
+    index = history.index
+    if getattr(index, "tz", None) is not None:
+        index = index.tz_localize(None)
+    frame = pd.DataFrame({"close": history["Close"].to_numpy(dtype=float)}, index=index)
+    for window in MOVING_AVERAGES:
+        frame[f"ma_{window}"] = moving_average(frame["close"], window)
+    if "Volume" in history.columns:
+        frame["volume"] = history["Volume"].to_numpy(dtype=float)
+    frame = frame[frame["close"].notna()]
+
+    picks = minmax_indices(frame["close"].to_numpy(), max(width // 2, 1))
+    result = frame.iloc[picks].copy()
+    if "volume" in frame.columns:
+        result["volume"] = bucket_sums(frame["volume"].to_numpy(), picks)
+
+    result.attrs["source_points"] = len(frame)
+    cache.set(key, result, CHART_TTL)
+    return result
+
+
+def price_volume_figure(series, currency="USD"):
+    """
+    Plotly figure: close and moving averages on top, volume bars below, shared x axis.
+    """
+    import plotly.graph_objects as go
+    from plotly.subplots import make_subplots
+
+    has_volume = "volume" in series.columns
+    fig = make_subplots(
+        rows=2 if has_volume else 1, cols=1, shared_xaxes=True, vertical_spacing=0.03,
+        row_heights=[0.75, 0.25] if has_volume else [1.0]
+    )
+    fig.add_trace(go.Scatter(x=series.index, y=series["close"], name="Close", line=dict(width=1.6)), row=1, col=1)
+    for window in MOVING_AVERAGES:
+        column = f"ma_{window}"
+        if series[column].notna().any():
+            fig.add_trace(go.Scatter(
+                x=series.index, y=series[column], name=f"MA {window}", line=dict(width=1, dash="dot")
+            ), row=1, col=1)
+    if has_volume:
+        fig.add_trace(go.Bar(x=series.index, y=series["volume"], name="Volume", marker_color="#5c6b7a"), row=2, col=1)
+
+    fig.update_layout(
+        height=480, margin=dict(l=10, r=10, t=10, b=10), hovermode="x unified",
+        legend=dict(orientation="h", yanchor="bottom", y=1.0, x=0), showlegend=True
+    )
+    fig.update_yaxes(title_text=currency, row=1, col=1)
+    return fig
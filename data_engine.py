@@ -1,109 +1,350 @@
-import yfinance as yf
-import pandas as pd
+import os
+import time
+from functools import partial
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FuturesTimeoutError
 import logging
 
+import telemetry
+from cache import TTLCache, MISSING
+from price_store import default_price_store
+from fundamentals import STATEMENTS, default_fundamentals_store, latest_value
+
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Per-call timeouts in seconds for the individual yfinance requests
+FETCH_TIMEOUTS = {
+    "info": 20,
+    "financials": 20,
+    "balance_sheet": 20,
+    "cashflow": 20,
+    "quarterly_financials": 20,
+    "quarterly_balance_sheet": 20,
+    "quarterly_cashflow": 20,
+    "history": 30,
+}
+
+# How often a fetch still waiting for a free worker is checked for having started, in seconds
+QUEUED_POLL_INTERVAL = 0.05
+
+# How long each component stays fresh in the cache, in seconds.
+# Quotes move by the second, statements only change quarterly.
+CACHE_TTLS = {
+    "info": 60,
+    "financials": 24 * 3600,
+    "balance_sheet": 24 * 3600,
+    "cashflow": 24 * 3600,
+    "quarterly_financials": 24 * 3600,
+    "quarterly_balance_sheet": 24 * 3600,
+    "quarterly_cashflow": 24 * 3600,
+    "history": 15 * 60,
+}
+
+# Period of the price history returned with the ticker data
+HISTORY_PERIOD = "1y"
+
+# Index the indicators compare against (beta)
+BENCHMARK_SYMBOL = os.getenv("BENCHMARK_SYMBOL", "SPY")
+# After the benchmark could not be fetched, callers get an empty frame for this long
+# instead of retrying on every call
+BENCHMARK_RETRY_AFTER = 5 * 60
+
+# Shared by every DataEngine in the process; set DATA_CACHE_DIR to also keep entries on disk across restarts
+default_cache = TTLCache(max_entries=512, disk_dir=os.getenv("DATA_CACHE_DIR") or None)
+
 class DataEngine:
-    def __init__(self):
-        pass
+    def __init__(self, max_workers=8, timeouts=None, cache=None, cache_ttls=None, price_store=None, bulk_workers=8,
+                 fundamentals_store=None):
+        self.bulk_workers = bulk_workers
+        self.timeouts = dict(FETCH_TIMEOUTS, **(timeouts or {}))
+        self.price_store = price_store if price_store is not None else default_price_store()
+        self.fundamentals = fundamentals_store if fundamentals_store is not None else default_fundamentals_store()
+        self.cache = cache if cache is not None else default_cache
+        self.cache_ttls = dict(CACHE_TTLS, **(cache_ttls or {}))
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="yf-fetch")
+
+    def _fetch_components(self, ticker, names=None, executor=None):
+        """
+        Runs the yfinance requests for one ticker concurrently.
+        'names' limits which components are fetched, 'executor' overrides the engine's pool.
+        Each call gets its own deadline measured from the moment it starts running, so calls
+        queued behind other callers on a busy pool don't time out while waiting; with a free
+        pool total wall time is roughly the slowest call instead of the sum.
+        Returns (results, failed): a call that raises or times out is listed in 'failed'
+        and missing from 'results' rather than aborting the whole fetch.
+        Components still fresh in the cache are not requested at all.
+        """
+        calls = {"info": lambda: ticker.info}
+        # Normalized statements (annual and quarterly) from the local fundamentals store,
+        # downloaded at most once a day
+        for statement in STATEMENTS:
+            calls[statement] = partial(self.fundamentals.get_statement, ticker.ticker, statement, ticker=ticker)
+        # Served from the local price store, which only downloads bars it doesn't have yet
+        calls["history"] = lambda: self.price_store.get_history(ticker.ticker, period=HISTORY_PERIOD, ticker=ticker)
+        if names is not None:
+            calls = {name: call for name, call in calls.items() if name in names}
+        executor = executor or self._executor
+        symbol = ticker.ticker.upper()
+        results = {}
+        failed = {}
+
+        for name in list(calls):
+            cached = self.cache.get((name, symbol))
+            if cached is not MISSING:
+                results[name] = cached
+                del calls[name]
+                telemetry.count("data.cache_hits")
+
+        started = {}
+
+        def run(name, call):
+            started[name] = time.monotonic()
+            return telemetry.timed(f"data.{name}", call)
+
+        futures = {name: telemetry.submit(executor, run, name, call) for name, call in calls.items()}
 
+        for name, future in futures.items():
+            try:
+                results[name] = self._result(future, started, name)
+                # Empty info means an unknown ticker; don't pin that in the cache
+                if results[name] is not None and not (name == "info" and not results[name]):
+                    self.cache.set((name, symbol), results[name], self.cache_ttls[name])
+            except FuturesTimeoutError:
+                future.cancel()
+                logger.warning(f"{name} for {ticker.ticker} timed out after {self.timeouts[name]}s")
+                failed[name] = f"timeout after {self.timeouts[name]}s"
+                telemetry.count("data.timeouts")
+            except Exception as e:
+                logger.warning(f"{name} for {ticker.ticker} failed: {e}")
+                failed[name] = str(e)
+        return results, failed
+
+    def _result(self, future, started, name):
+        """
+        future.result() with the timeout of 'name' counted from when the call started
+        (started[name], set by the worker). Raises FuturesTimeoutError past the deadline.
+        """
+        timeout = self.timeouts[name]
+        # Still queued: no deadline yet
+        while name not in started and not future.done():
+            try:
+                return future.result(timeout=QUEUED_POLL_INTERVAL)
+            except FuturesTimeoutError:
+                pass
+        remaining = started.get(name, time.monotonic()) + timeout - time.monotonic()
+        return future.result(timeout=max(remaining, 0))
+
+    @telemetry.traced("data.total")
     def get_ticker_data(self, ticker_symbol):
         """
         Fetches 'Hard Data' for a given ticker symbol using yfinance.
         Returns a dictionary with formatted values.
+        The underlying requests run in parallel; if statements or history fail,
+        the rest is still returned and the failed parts are listed under 'missing'.
         """
+        # Heavy dependencies are imported on first use to keep app start-up fast
+        import yfinance as yf
+
         try:
             ticker = yf.Ticker(ticker_symbol)
-            info = ticker.info
-            
-            if not info or 'symbol' not in info and 'currentPrice' not in info:
-                return {"error": f"Ticker {ticker_symbol} nenájdený alebo nemá dostupné dáta."}
-
-            # 1. Basic Info & Price
-            current_price = info.get('currentPrice') or info.get('regularMarketPrice', 0.0)
-            previous_close = info.get('previousClose', 0.0)
-            
-            if previous_close and current_price:
-                change_percent = ((current_price - previous_close) / previous_close) * 100
-            else:
-                change_percent = 0.0
-
-            # 2. Financials
-            financials = ticker.financials
-            balance_sheet = ticker.balance_sheet
-            
-            # Revenue
-            total_revenue = info.get('totalRevenue')
-            if not total_revenue and financials is not None and not financials.empty:
-                revenue_labels = ['Total Revenue', 'TotalRevenue', 'Revenue']
-                for label in revenue_labels:
-                    if label in financials.index:
-                        total_revenue = financials.loc[label].iloc[0]
-                        break
-
-            # EPS
-            eps_gaap = info.get('trailingEps', "N/A")
-            eps_non_gaap = info.get('forwardEps', "N/A")
-
-            # 3. RPO Proxy (Deferred Revenue)
-            rpo_proxy = "N/A"
-            if balance_sheet is not None and not balance_sheet.empty:
-                rpo_proxy_labels = ['Deferred Revenue', 'DeferredRevenue', 'Contract Liabilities']
-                for label in rpo_proxy_labels:
-                    if label in balance_sheet.index:
-                        try:
-                            val = balance_sheet.loc[label].iloc[0]
-                            if pd.notnull(val):
-                                rpo_proxy = val
-                                break
-                        except Exception as e:
-                            logger.error(f"Error reading balance sheet label {label}: {e}")
-                            continue
-            
-            if isinstance(rpo_proxy, (int, float)):
-                rpo_proxy = f"${rpo_proxy / 1e9:.2f} B"
-
-            # 4. Valuation
-            pe_ratio = info.get('trailingPE')
-            forward_pe = info.get('forwardPE')
-            fair_price = info.get('targetMeanPrice', "N/A")
-            
-            # 5. Additional Metrics
-            gross_margin = info.get('grossMargins')
-            operating_margin = info.get('operatingMargins')
-            beta = info.get('beta')
-            market_cap = info.get('marketCap')
-            
-            # 6. History for Charts (1 Year)
-            history = ticker.history(period="1y")
-            
-            return {
-                "name": info.get('longName', ticker_symbol),
-                "symbol": ticker_symbol,
-                "current_price": current_price,
-                "change_percent": change_percent,
-                "total_revenue": total_revenue,
-                "eps_gaap": eps_gaap,
-                "eps_non_gaap": eps_non_gaap,
-                "rpo_proxy": rpo_proxy,
-                "pe_ratio": pe_ratio,
-                "forward_pe": forward_pe,
-                "fair_price": fair_price,
-                "gross_margin": gross_margin,
-                "operating_margin": operating_margin,
-                "beta": beta,
-                "market_cap": market_cap,
-                "history": history,
-                "currency": info.get('currency', 'USD')
-            }
+            results, failed = self._fetch_components(ticker)
+            return self._build_ticker_data(ticker_symbol, results, failed)
 
         except Exception as e:
             logger.exception(f"Unexpected error in DataEngine for {ticker_symbol}")
             return {"error": str(e)}
 
+    def _build_ticker_data(self, ticker_symbol, results, failed):
+        """
+        Turns the fetched components of one ticker into the 'Hard Data' dictionary.
+        """
+        import pandas as pd
+
+        info = results.get("info")
+
+        if "info" in failed:
+            return {"error": f"Ticker {ticker_symbol}: nepodarilo sa získať dáta ({failed['info']})."}
+        
+        if not info or 'symbol' not in info and 'currentPrice' not in info:
+            return {"error": f"Ticker {ticker_symbol} nenájdený alebo nemá dostupné dáta."}
+
+        # 1. Basic Info & Price
+        current_price = info.get('currentPrice') or info.get('regularMarketPrice', 0.0)
+        previous_close = info.get('previousClose', 0.0)
+        
+        if previous_close and current_price:
+            change_percent = ((current_price - previous_close) / previous_close) * 100
+        else:
+            change_percent = 0.0
+
+        # 2. Financials
+        financials = results.get("financials")
+        balance_sheet = results.get("balance_sheet")
+        
+        # Revenue
+        total_revenue = info.get('totalRevenue')
+        if not total_revenue:
+            total_revenue = latest_value(financials, "revenue")
+
+        # EPS
+        eps_gaap = info.get('trailingEps', "N/A")
+        eps_non_gaap = info.get('forwardEps', "N/A")
+
+        # 3. RPO Proxy (Deferred Revenue)
+        # rpo_value keeps the number for comparisons; rpo_proxy is the display string
+        rpo_value = latest_value(balance_sheet, "deferred_revenue")
+        rpo_proxy = f"${rpo_value / 1e9:.2f} B" if rpo_value is not None else "N/A"
+
+        # 4. Valuation
+        pe_ratio = info.get('trailingPE')
+        forward_pe = info.get('forwardPE')
+        fair_price = info.get('targetMeanPrice', "N/A")
+        
+        # 5. Additional Metrics
+        gross_margin = info.get('grossMargins')
+        operating_margin = info.get('operatingMargins')
+        beta = info.get('beta')
+        market_cap = info.get('marketCap')
+        
+        # 6. History for Charts (1 Year)
+        history = results.get("history")
+        if history is None:
+            history = pd.DataFrame()
+        
+        return {
+            "name": info.get('longName', ticker_symbol),
+            "symbol": ticker_symbol,
+            "current_price": current_price,
+            "change_percent": change_percent,
+            "total_revenue": total_revenue,
+            "eps_gaap": eps_gaap,
+            "eps_non_gaap": eps_non_gaap,
+            "rpo_proxy": rpo_proxy,
+            "rpo_value": rpo_value,
+            "pe_ratio": pe_ratio,
+            "forward_pe": forward_pe,
+            "fair_price": fair_price,
+            "gross_margin": gross_margin,
+            "operating_margin": operating_margin,
+            "beta": beta,
+            "market_cap": market_cap,
+            "history": history,
+            "currency": info.get('currency', 'USD'),
+            "sector": info.get('sector'),
+            "industry": info.get('industry'),
+            "missing": sorted(failed)
+        }
+
+    def prefetch_history(self, ticker_symbols):
+        """
+        Loads the price history of many tickers with bulk downloads (see PriceStore.get_histories)
+        and puts it in the cache, so later get_ticker_data calls don't request it one by one.
+        Returns (histories, errors) keyed by upper-case symbol.
+        """
+        symbols = list(dict.fromkeys(s.upper() for s in ticker_symbols))
+        histories = {}
+        for symbol in symbols:
+            cached = self.cache.get(("history", symbol))
+            if cached is not MISSING:
+                histories[symbol] = cached
+
+        missing = [s for s in symbols if s not in histories]
+        if not missing:
+            return histories, {}
+
+        frames, errors = self.price_store.get_histories(missing, period=HISTORY_PERIOD)
+        for symbol, frame in frames.items():
+            histories[symbol] = frame
+            if not frame.empty:
+                self.cache.set(("history", symbol), frame, self.cache_ttls["history"])
+        return histories, errors
+
+    def get_benchmark_history(self, symbol=BENCHMARK_SYMBOL):
+        """
+        Price history of the benchmark index (same period as the ticker data),
+        or an empty DataFrame if it can't be fetched.
+        """
+        import pandas as pd
+
+        key = ("benchmark", symbol.upper())
+        cached = self.cache.get(key)
+        if cached is not MISSING:
+            return cached
+        try:
+            histories, errors = self.prefetch_history([symbol])
+        except Exception as e:
+            logger.warning(f"Benchmark {symbol} unavailable: {e}")
+            histories, errors = {}, {}
+        if symbol.upper() in errors:
+            logger.warning(f"Benchmark {symbol} unavailable: {errors[symbol.upper()]}")
+        history = histories.get(symbol.upper(), pd.DataFrame())
+        self.cache.set(key, history, self.cache_ttls["history"] if not history.empty else BENCHMARK_RETRY_AFTER)
+        return history
+
+    def get_bulk_data(self, ticker_symbols):
+        """
+        'Hard Data' for many tickers at once (watchlists, peer sets).
+        Price history comes from a few multi-symbol downloads; info and statements are
+        fetched per ticker through a pool of bulk_workers, each call with its usual timeout.
+        Errors stay per ticker: a failing symbol gets {"error": ...} like get_ticker_data.
+        Returns {"tickers": {symbol: data}, "prices": DataFrame indexed by (Ticker, Date)}.
+        """
+        import yfinance as yf
+        import pandas as pd
+
+        symbols = list(dict.fromkeys(s.upper() for s in ticker_symbols))
+        try:
+            histories, history_errors = self.prefetch_history(symbols)
+        except Exception as e:
+            logger.exception("Bulk history download failed")
+            histories, history_errors = {}, {s: str(e) for s in symbols}
+
+        names = ("info", *STATEMENTS)
+        # Each ticker task submits its calls to a pool large enough that they never queue,
+        # so the per-call timeouts measure the call itself rather than time spent waiting
+        ticker_pool = ThreadPoolExecutor(max_workers=self.bulk_workers, thread_name_prefix="yf-bulk")
+        call_pool = ThreadPoolExecutor(max_workers=self.bulk_workers * len(names), thread_name_prefix="yf-bulk-call")
+
+        def fetch(symbol):
+            try:
+                results, failed = self._fetch_components(yf.Ticker(symbol), names=names, executor=call_pool)
+                if symbol in histories:
+                    results["history"] = histories[symbol]
+                elif symbol in history_errors:
+                    failed["history"] = history_errors[symbol]
+                return self._build_ticker_data(symbol, results, failed)
+            except Exception as e:
+                logger.exception(f"Unexpected error in DataEngine for {symbol}")
+                return {"error": str(e)}
+
+        try:
+            futures = {symbol: ticker_pool.submit(fetch, symbol) for symbol in symbols}
+            tickers = {symbol: future.result() for symbol, future in futures.items()}
+        finally:
+            ticker_pool.shutdown(wait=False, cancel_futures=True)
+            call_pool.shutdown(wait=False)
+
+        # Long format: one row per (ticker, bar). Timestamps are exchange-local wall time,
+        # since the tickers may trade in different timezones
+        panel = {}
+        for symbol, frame in histories.items():
+            if frame is not None and not frame.empty:
+                frame = frame.copy()
+                if getattr(frame.index, "tz", None) is not None:
+                    frame.index = frame.index.tz_localize(None)
+                frame.attrs = {}
+                panel[symbol] = frame
+        prices = pd.concat(panel, names=["Ticker", "Date"]) if panel else pd.DataFrame()
+
+        return {"tickers": tickers, "prices": prices}
+
+    def cache_stats(self):
+        """
+        Hit/miss counters of the component cache, per component and in total.
+        """
+        return self.cache.stats()
+
     def format_large_number(self, num):
         if num is None or isinstance(num, str):
             return "N/A" if num is None else num
@@ -116,5 +357,5 @@ class DataEngine:
                 return f"${num / 1e6:.2f} M"
             else:
                 return f"${num:,.2f}"
-        except:
+        except (TypeError, ValueError):
             return str(num)
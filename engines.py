@@ -0,0 +1,62 @@
+import os
+import streamlit as st
+
+import telemetry
+from data_engine import DataEngine
+from ai_engine import AIEngine
+from history_engine import HistoryEngine
+from jobs import JobQueue
+
+
+def is_dev_mode():
+    """
+    AUTO_ANALYST_DEV=1 restores the old behavior: fresh engines on every rerun,
+    so code changes are picked up without restarting the server.
+    """
+    return os.getenv("AUTO_ANALYST_DEV", "0") == "1"
+
+
+def is_admin_mode():
+    """
+    AUTO_ANALYST_ADMIN=1 shows the performance panel (stage timings, tokens, cache stats).
+    """
+    return os.getenv("AUTO_ANALYST_ADMIN", "0") == "1"
+
+
+def build_engines(history_dir="history"):
+    """
+    Creates a new (DataEngine, AIEngine, HistoryEngine) triple.
+    """
+    return DataEngine(), AIEngine(), HistoryEngine(history_dir)
+
+
+@st.cache_resource(show_spinner=False)
+def _shared_engines(history_dir):
+    # One instance of each engine per process, shared by all sessions and reruns.
+    # All three are thread-safe: DataEngine's pool and cache are locked, the genai.Client
+    # keeps one pooled HTTP client, and HistoryEngine opens a SQLite connection per call.
+    metrics_port = os.getenv("AUTO_ANALYST_METRICS_PORT")
+    if metrics_port:
+        # Prometheus-style scrape endpoint next to the app
+        telemetry.start_metrics_server(int(metrics_port))
+    return build_engines(history_dir)
+
+
+def get_engines(history_dir="history"):
+    """
+    Returns the engines for the current rerun: shared instances in production,
+    new ones in dev mode.
+    """
+    if is_dev_mode():
+        return build_engines(history_dir)
+    return _shared_engines(history_dir)
+
+
+@st.cache_resource(show_spinner=False)
+def get_job_queue(history_dir="history"):
+    """
+    The process-wide background job queue. Its jobs have to outlive reruns and sessions,
+    so it always runs on the shared engines, also in dev mode.
+    """
+    data_engine, ai_engine, history_engine = _shared_engines(history_dir)
+    return JobQueue(data_engine, ai_engine, history_engine)
@@ -0,0 +1,246 @@
+"""
+Normalized multi-period fundamentals.
+
+yfinance returns a statement as a frame with one row per line item (labels differ between
+companies and yfinance versions) and one column per period. The store keeps every period
+of it, normalized: rows = period end dates (oldest first), columns = canonical line items
+as float64, one Arrow file per (ticker, statement) under data/fundamentals.
+
+DataEngine reads statements through the store, so they are downloaded at most once per
+REFRESH_AFTER, and the line items it needs are looked up by canonical name. Queries over
+many tickers and periods (panel, growth) read only the local files.
+"""
+import os
+import time
+import logging
+
+from arrow_store import FrameCache, KeyedLocks, ProcessDefault, write_frame
+
+logger = logging.getLogger(__name__)
+
+# Canonical line item -> yfinance row labels, in order of preference. For each period the
+# first label with a value is used.
+INCOME_ITEMS = {
+    "revenue": ("Total Revenue", "TotalRevenue", "Revenue", "Operating Revenue"),
+    "cost_of_revenue": ("Cost Of Revenue", "Reconciled Cost Of Revenue"),
+    "gross_profit": ("Gross Profit",),
+    "research_and_development": ("Research And Development",),
+    "operating_income": ("Operating Income", "Total Operating Income As Reported"),
+    "ebitda": ("EBITDA", "Normalized EBITDA"),
+    "interest_expense": ("Interest Expense",),
+    "net_income": ("Net Income", "Net Income Common Stockholders"),
+    "eps_basic": ("Basic EPS",),
+    "eps_diluted": ("Diluted EPS",),
+}
+BALANCE_ITEMS = {
+    "total_assets": ("Total Assets",),
+    "current_assets": ("Current Assets",),
+    "cash": ("Cash And Cash Equivalents", "Cash Cash Equivalents And Short Term Investments"),
+    "total_liabilities": ("Total Liabilities Net Minority Interest", "Total Liabilities"),
+    "current_liabilities": ("Current Liabilities",),
+    "total_debt": ("Total Debt",),
+    # RPO proxy
+    "deferred_revenue": ("Deferred Revenue", "DeferredRevenue", "Contract Liabilities", "Current Deferred Revenue"),
+    "stockholders_equity": ("Stockholders Equity", "Common Stock Equity"),
+    "shares_outstanding": ("Ordinary Shares Number", "Share Issued"),
+}
+CASHFLOW_ITEMS = {
+    "operating_cash_flow": ("Operating Cash Flow", "Cash Flow From Continuing Operating Activities"),
+    "capital_expenditure": ("Capital Expenditure",),
+    "free_cash_flow": ("Free Cash Flow",),
+    "dividends_paid": ("Cash Dividends Paid", "Common Stock Dividend Paid"),
+    "share_repurchases": ("Repurchase Of Capital Stock", "Common Stock Payments"),
+}
+
+# yfinance Ticker attribute -> line items
+STATEMENTS = {
+    "financials": INCOME_ITEMS,
+    "balance_sheet": BALANCE_ITEMS,
+    "cashflow": CASHFLOW_ITEMS,
+    "quarterly_financials": INCOME_ITEMS,
+    "quarterly_balance_sheet": BALANCE_ITEMS,
+    "quarterly_cashflow": CASHFLOW_ITEMS,
+}
+FREQUENCIES = {
+    "annual": ("financials", "balance_sheet", "cashflow"),
+    "quarterly": ("quarterly_financials", "quarterly_balance_sheet", "quarterly_cashflow"),
+}
+
+# Statements only change quarterly; a stored one is used for a day before it is downloaded again
+REFRESH_AFTER = 24 * 3600
+
+# Statement files kept decoded in memory (see arrow_store.FrameCache)
+MAX_CACHED_FRAMES = 256
+
+
+def normalize_statement(raw, items):
+    """
+    A yfinance statement (line items x periods) as periods x canonical items, float64,
+    oldest period first. Periods without any value are dropped.
+    """
+    import numpy as np
+    import pandas as pd
+
+    columns = list(items)
+    if raw is None or raw.empty:
+        return pd.DataFrame(columns=columns, index=pd.DatetimeIndex([], name="period_end"), dtype=float)
+
+    periods = pd.to_datetime(raw.columns)
+    values = raw.apply(pd.to_numeric, errors="coerce").to_numpy(dtype=float)
+    positions = {label: i for i, label in reversed(list(enumerate(raw.index)))}
+    normalized = np.full((len(periods), len(columns)), np.nan)
+    for j, labels in enumerate(items.values()):
+        rows = [positions[label] for label in labels if label in positions]
+        if not rows:
+            continue
+        # (labels x periods); take the first label with a value in each period
+        block = values[rows]
+        present = ~np.isnan(block)
+        first = present.argmax(axis=0)
+        normalized[:, j] = np.where(present.any(axis=0), block[first, np.arange(block.shape[1])], np.nan)
+
+    frame = pd.DataFrame(normalized, index=pd.DatetimeIndex(periods, name="period_end"), columns=columns)
+    frame = frame[~np.isnan(normalized).all(axis=1)]
+    return frame.sort_index()
+
+
+def latest_value(frame, item):
+    """
+    The item's value in the most recent period, or None if it is missing there.
+    """
+    import numpy as np
+
+    if frame is None or frame.empty or item not in frame.columns:
+        return None
+    value = frame[item].iloc[-1]
+    return None if np.isnan(value) else float(value)
+
+
+class FundamentalsStore:
+    def __init__(self, store_dir="data/fundamentals", refresh_after=REFRESH_AFTER):
+        self.store_dir = store_dir
+        self.refresh_after = refresh_after
+        self._locks = KeyedLocks()
+        # Queries over many tickers read the same files again and again
+        self._frames = FrameCache(MAX_CACHED_FRAMES)
+
+    def _key_lock(self, symbol, statement):
+        return self._locks.get((symbol, statement))
+
+    def _path(self, symbol, statement):
+        return os.path.join(self.store_dir, f"{symbol.upper()}_{statement}.arrow")
+
+    def _read(self, symbol, statement):
+        return self._frames.read(self._path(symbol, statement))
+
+    def ingest(self, symbol, statement, raw):
+        """
+        Normalizes a downloaded yfinance statement and merges it into the stored one: yfinance
+        only returns the last 4-5 periods, so older stored periods are kept, and for a period in
+        both the downloaded values win. An empty download never replaces stored periods.
+        Returns the stored frame.
+        """
+        frame = normalize_statement(raw, STATEMENTS[statement])
+        stored = self._read(symbol, statement)
+        if stored is not None and not stored.empty:
+            if frame.empty:
+                logger.warning(f"{statement} for {symbol} came back empty, keeping the stored periods")
+                return stored
+            frame = frame.combine_first(stored).reindex(columns=list(STATEMENTS[statement]))
+        write_frame(frame, self._path(symbol, statement))
+        return frame
+
+    def get_statement(self, symbol, statement, ticker=None):
+        """
+        Normalized statement of 'symbol' ("financials", "balance_sheet", "cashflow" or their
+        quarterly_ variants), downloaded through 'ticker' (a yf.Ticker) only if it isn't stored or is older
+        than refresh_after. If the download fails, a stale stored copy is returned instead.
+        """
+        path = self._path(symbol, statement)
+        with self._key_lock(symbol.upper(), statement):
+            try:
+                age = time.time() - os.stat(path).st_mtime
+            except FileNotFoundError:
+                age = None
+            if age is not None and age < self.refresh_after:
+                return self._read(symbol, statement)
+
+            if ticker is None:
+                import yfinance as yf
+
+                ticker = yf.Ticker(symbol)
+            try:
+                raw = getattr(ticker, statement)
+            except Exception as e:
+                if age is None:
+                    raise
+                logger.warning(f"{statement} for {symbol} failed, using the stored copy: {e}")
+                return self._read(symbol, statement)
+            return self.ingest(symbol, statement, raw)
+
+    # --- Queries (local files only) -----------------------------------------
+
+    def load(self, symbol, freq="annual"):
+        """
+        All stored periods of one ticker, income statement, balance sheet and cash flow items side by side
+        (periods x items). Always has every item of 'freq' as a column: the items of a statement
+        that isn't stored (e.g. its download failed) are NaN. Empty if nothing is stored.
+        """
+        import pandas as pd
+
+        items = [item for statement in FREQUENCIES[freq] for item in STATEMENTS[statement]]
+        frames = [self._read(symbol, statement) for statement in FREQUENCIES[freq]]
+        frames = [f for f in frames if f is not None]
+        if not frames:
+            return pd.DataFrame(columns=items, index=pd.DatetimeIndex([], name="period_end"), dtype=float)
+        return pd.concat(frames, axis=1).sort_index().reindex(columns=items)
+
+    def panel(self, symbols, item, freq="annual", periods=None, align="period"):
+        """
+        One line item for many tickers: columns = tickers.
+        align="period": rows are fiscal periods counted back from each ticker's latest one
+        (0 = latest, -1 = the one before, ...), so tickers with different fiscal year ends line up.
+        align="date": rows are the period end dates.
+        'periods' keeps only the most recent N rows.
+        """
+        import pandas as pd
+
+        statement = next((name for name in FREQUENCIES[freq] if item in STATEMENTS[name]), None)
+        series = {}
+        for symbol in symbols:
+            values = self.load(symbol, freq)[item]
+            if align == "period":
+                # Ordinals come from every period the statement has, so a period missing this
+                # item leaves a gap instead of shifting the older ones onto the wrong rows
+                stored = self._read(symbol, statement)
+                values = values.reindex(values.index if stored is None else stored.index)
+                values.index = pd.RangeIndex(-len(values) + 1, 1, name="period")
+            series[symbol.upper()] = values.dropna()
+        panel = pd.DataFrame(series).sort_index()
+        return panel if periods is None else panel.iloc[-periods:]
+
+    def growth(self, symbols, item="revenue", freq="annual", lag=1):
+        """
+        Change of 'item' between each ticker's latest period and the one 'lag' periods earlier,
+        as a fraction (0.12 = +12 %). NaN where either value is missing.
+        """
+        import numpy as np
+        import pandas as pd
+
+        panel = self.panel(symbols, item, freq=freq, periods=lag + 1)
+        if len(panel) <= lag:
+            return pd.Series(np.nan, index=panel.columns, name=f"{item}_growth")
+        latest, earlier = panel.iloc[-1], panel.iloc[-1 - lag]
+        return (latest / earlier.where(earlier != 0) - 1).rename(f"{item}_growth")
+
+
+_default_store = ProcessDefault(
+    lambda: FundamentalsStore(os.getenv("FUNDAMENTALS_STORE_DIR", os.path.join("data", "fundamentals")))
+)
+
+
+def default_fundamentals_store():
+    """
+    Process-wide store in FUNDAMENTALS_STORE_DIR (default data/fundamentals).
+    """
+    return _default_store.get()
@@ -1,37 +1,505 @@
 import json
 import os
-import pandas as pd
-from datetime import datetime
+import re
+import sqlite3
+import logging
+import threading
+import time
+import unicodedata
+import uuid
+from contextlib import closing
+from datetime import datetime, timedelta
+
+import telemetry
+from price_store import default_price_store
+
+logger = logging.getLogger(__name__)
+
+INDEX_DIRNAME = ".index"
+INDEX_FILENAME = "history.db"
+
+# DataFrames are stored as uncompressed Arrow IPC (Feather v2) files so they can be memory-mapped on load
+FRAMES_DIRNAME = "frames"
+FRAME_MARKER = "__frame__"
+# Price history that lives in the PriceStore is saved as a reference to its rows instead
+SLICE_MARKER = "__price_slice__"
+
+# Writers (save_analysis, index sync) of one history directory take this lock, so several app
+# processes can share the directory; reads of an up-to-date index never take it
+LOCK_FILENAME = "write.lock"
+LOCK_TIMEOUT = 30
+# An unreadable analysis file younger than this may come from a writer that doesn't rename
+# (an older app version); it is retried on every sync instead of being skipped
+UNREADABLE_RETRY_WINDOW = 60
+
+if os.name == "nt":
+    import msvcrt
+
+    def _try_lock_file(f):
+        f.seek(0)
+        msvcrt.locking(f.fileno(), msvcrt.LK_NBLCK, 1)
+
+    def _unlock_file(f):
+        f.seek(0)
+        msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+else:
+    import fcntl
+
+    def _try_lock_file(f):
+        fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+
+    def _unlock_file(f):
+        fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+def _json_default(obj):
+    """
+    JSON fallback for values left after DataFrames are moved out:
+    numpy scalars keep their numeric value, timestamps become ISO strings, the rest str().
+    """
+    if hasattr(obj, "item"):
+        try:
+            return obj.item()
+        except (TypeError, ValueError):
+            pass
+    if hasattr(obj, "isoformat"):
+        try:
+            return obj.isoformat()
+        except ValueError:
+            pass
+    return str(obj)
+
+# Columns added after the index was first introduced; created on open if missing
+INDEX_EXTRA_COLUMNS = {
+    "model_name": "TEXT",
+    "prompt_hash": "TEXT",
+    "verdict": "TEXT",
+}
+
+# Full-text index over ai_report (SQLite FTS5); its rowid is the rowid of the analyses row.
+# remove_diacritics makes Slovak text searchable without accents ("uver" finds "úver").
+REPORTS_FTS_TABLE = "reports_fts"
+VERDICTS = ("Buy", "Hold", "Sell")
+# Verdict words the model sometimes writes in Slovak instead of English
+_VERDICT_ALIASES = {"kúpiť": "Buy", "kupovať": "Buy", "držať": "Hold", "predať": "Sell", "predávať": "Sell"}
+_VERDICT_RE = re.compile(r"\b(buy|hold|sell|kúpiť|kupovať|držať|predať|predávať)\b", re.IGNORECASE)
+
+def extract_verdict(ai_report):
+    """
+    Buy/Hold/Sell from the report's closing verdict section ("Záverečný verdikt"),
+    or None if the report has no recognizable verdict (e.g. error reports).
+    """
+    if not ai_report:
+        return None
+    heading = re.search(r"^#+.*verdikt.*$", ai_report, re.IGNORECASE | re.MULTILINE)
+    if not heading:
+        return None
+    match = _VERDICT_RE.search(ai_report, heading.end())
+    if not match:
+        return None
+    word = match.group(1).lower()
+    return _VERDICT_ALIASES.get(word, word.capitalize())
+
+def _fts_query(text):
+    """
+    Turns free text into an FTS5 query: every word must match, as a prefix.
+    Words are quoted, so FTS syntax characters typed by the user can't break the query.
+    """
+    words = re.findall(r"\w+", text or "")
+    return " ".join(f'"{w}"*' for w in words)
+
+def _fold(text):
+    """Lowercase without accents, one output character per input character."""
+    return "".join(unicodedata.normalize("NFKD", c)[0] for c in text.lower())
+
+def _snippet(text, query, width=160):
+    """
+    About 'width' characters of 'text' around the first word that starts with a query word
+    (accents ignored, like the index), with matches in **bold**.
+    """
+    words = [_fold(w) for w in re.findall(r"\w+", query or "")]
+    if not text or not words:
+        return None
+    folded = _fold(text)
+    pattern = re.compile(r"\b(?:" + "|".join(map(re.escape, words)) + r")\w*")
+    first = pattern.search(folded)
+    start = max(0, first.start() - width // 3) if first else 0
+    end = min(len(text), start + width)
+    parts, position = [], start
+    for m in pattern.finditer(folded, start, end):
+        parts += [text[position:m.start()], "**", text[m.start():min(m.end(), end)], "**"]
+        position = min(m.end(), end)
+    parts.append(text[position:end])
+    snippet = " ".join("".join(parts).split())
+    return ("…" if start > 0 else "") + snippet + ("…" if end < len(text) else "")
+
+def _list_entry(row):
+    return {
+        "id": row["id"],
+        "ticker": row["ticker"],
+        "timestamp": row["timestamp"],
+        "date_display": datetime.strptime(row["timestamp"], "%Y%m%d_%H%M%S").strftime("%Y-%m-%d %H:%M")
+    }
+
+def _timestamp_bound(value, end=False):
+    """
+    A date/datetime or 'YYYY-MM-DD' string as a bound on the index's YYYYmmdd_HHMMSS timestamps.
+    Dates are inclusive: as an upper bound they cover the whole day.
+    """
+    if value is None:
+        return None
+    if isinstance(value, str):
+        value = datetime.strptime(value, "%Y-%m-%d").date()
+    if isinstance(value, datetime):
+        return value.strftime("%Y%m%d_%H%M%S")
+    return value.strftime("%Y%m%d") + ("_999999" if end else "_000000")
+
+class LazyData(dict):
+    """
+    The 'data' part of a loaded analysis. Scalar metrics are available immediately;
+    DataFrames (and other nested values) are only read from disk when their key is
+    first accessed, then kept.
+    """
+
+    def __init__(self, raw, resolve):
+        super().__init__(raw)
+        self._resolve = resolve
+        self._pending = {k for k, v in raw.items() if isinstance(v, (dict, list))}
+
+    def __getitem__(self, key):
+        value = super().__getitem__(key)
+        if key in self._pending:
+            value = self._resolve(value, key)
+            super().__setitem__(key, value)
+            self._pending.discard(key)
+        return value
+
+    def get(self, key, default=None):
+        return self[key] if key in self else default
+
+    def values(self):
+        return [self[k] for k in self]
+
+    def items(self):
+        return [(k, self[k]) for k in self]
+
+    def is_loaded(self, key):
+        return key not in self._pending
+
+class DirectoryLock:
+    """
+    Exclusive lock across threads (threading.Lock) and processes (flock / msvcrt.locking on
+    'path'). Raises TimeoutError if it isn't acquired within 'timeout' seconds.
+    """
+
+    def __init__(self, path, timeout=LOCK_TIMEOUT):
+        self.path = path
+        self.timeout = timeout
+        self._thread_lock = threading.Lock()
+        self._file = None
+
+    def __enter__(self):
+        deadline = time.monotonic() + self.timeout
+        if not self._thread_lock.acquire(timeout=self.timeout):
+            raise TimeoutError(f"Timed out waiting for {self.path}")
+        try:
+            self._file = open(self.path, 'a+b')
+            while True:
+                try:
+                    _try_lock_file(self._file)
+                    return self
+                except OSError:
+                    # Held by another process
+                    if time.monotonic() >= deadline:
+                        raise TimeoutError(f"Timed out waiting for {self.path}")
+                    time.sleep(0.01)
+        except BaseException:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+            self._thread_lock.release()
+            raise
+
+    def __exit__(self, *exc_info):
+        try:
+            _unlock_file(self._file)
+        finally:
+            self._file.close()
+            self._file = None
+            self._thread_lock.release()
 
 class HistoryEngine:
-    def __init__(self, history_dir="history"):
+    def __init__(self, history_dir="history", price_store=None):
         self.history_dir = history_dir
+        self.price_store = price_store if price_store is not None else default_price_store()
         if not os.path.exists(self.history_dir):
             os.makedirs(self.history_dir)
 
-    def save_analysis(self, ticker, data, ai_report):
+        # The index lives in its own subdirectory so that SQLite's journal files
+        # don't touch the mtime of history_dir, which is used to detect external changes.
+        index_dir = self.index_dir = os.path.join(self.history_dir, INDEX_DIRNAME)
+        if not os.path.exists(index_dir):
+            os.makedirs(index_dir)
+        self.frames_dir = os.path.join(self.history_dir, FRAMES_DIRNAME)
+        if not os.path.exists(self.frames_dir):
+            os.makedirs(self.frames_dir)
+        self.index_path = os.path.join(index_dir, INDEX_FILENAME)
+        self._write_lock = DirectoryLock(os.path.join(index_dir, LOCK_FILENAME))
+        self._init_index()
+
+    def _connect(self):
+        conn = sqlite3.connect(self.index_path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def _init_index(self):
+        with closing(self._connect()) as conn, conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS analyses (
+                    id TEXT PRIMARY KEY,
+                    ticker TEXT,
+                    timestamp TEXT NOT NULL
+                )
+            """)
+            existing = {row["name"] for row in conn.execute("PRAGMA table_info(analyses)")}
+            for column, column_type in INDEX_EXTRA_COLUMNS.items():
+                if column not in existing:
+                    conn.execute(f"ALTER TABLE analyses ADD COLUMN {column} {column_type}")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_analyses_timestamp ON analyses (timestamp)")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_analyses_report ON analyses (ticker, model_name, prompt_hash, timestamp)")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_analyses_ticker ON analyses (ticker, timestamp)")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_analyses_verdict ON analyses (verdict, timestamp)")
+            conn.execute("CREATE TABLE IF NOT EXISTS index_meta (key TEXT PRIMARY KEY, value TEXT)")
+
+            has_fts = conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE name = ?", (REPORTS_FTS_TABLE,)
+            ).fetchone() is not None
+            self.search_available = has_fts
+            if not has_fts:
+                try:
+                    conn.execute(
+                        f"CREATE VIRTUAL TABLE {REPORTS_FTS_TABLE} USING fts5"
+                        "(ai_report, tokenize = 'unicode61 remove_diacritics 2')"
+                    )
+                    self.search_available = True
+                except sqlite3.OperationalError as e:
+                    logger.warning(f"SQLite without FTS5, report search disabled: {e}")
+
+            # Rows indexed before search existed (or while it wasn't available) have no text or
+            # verdict: re-read every file, once per change of this schema
+            search_schema = "fts5" if self.search_available else "none"
+            row = conn.execute("SELECT value FROM index_meta WHERE key = 'search_schema'").fetchone()
+            if row is None or row["value"] != search_schema:
+                conn.execute("DELETE FROM analyses")
+                conn.execute("DELETE FROM index_meta WHERE key = 'dir_mtime'")
+                conn.execute(
+                    "INSERT OR REPLACE INTO index_meta (key, value) VALUES ('search_schema', ?)",
+                    (search_schema,)
+                )
+
+    def _index_entry(self, conn, filename, payload):
+        """
+        Writes the index row for one analysis file from its parsed payload.
+        """
+        report_meta = payload.get("report_meta") or {}
+        ai_report = payload.get("ai_report") or ""
+        if self.search_available:
+            self._remove_fts(conn, [filename])
+        cursor = conn.execute(
+            "INSERT OR REPLACE INTO analyses (id, ticker, timestamp, model_name, prompt_hash, verdict) VALUES (?, ?, ?, ?, ?, ?)",
+            (filename, payload.get("ticker"), payload.get("timestamp"),
+             report_meta.get("model_name"), report_meta.get("prompt_hash"), extract_verdict(ai_report))
+        )
+        if self.search_available:
+            conn.execute(
+                f"INSERT INTO {REPORTS_FTS_TABLE} (rowid, ai_report) VALUES (?, ?)",
+                (cursor.lastrowid, ai_report)
+            )
+
+    def _remove_fts(self, conn, filenames):
+        conn.executemany(
+            f"DELETE FROM {REPORTS_FTS_TABLE} WHERE rowid = (SELECT rowid FROM analyses WHERE id = ?)",
+            [(f,) for f in filenames]
+        )
+
+    def _index_is_current(self, conn):
+        """
+        (is current, directory mtime): adding or removing a file changes the directory mtime,
+        so as long as it matches the value recorded at the last sync, the index is up to date.
+        """
+        dir_mtime = str(os.stat(self.history_dir).st_mtime_ns)
+        row = conn.execute("SELECT value FROM index_meta WHERE key = 'dir_mtime'").fetchone()
+        return bool(row and row["value"] == dir_mtime), dir_mtime
+
+    def _sync_index(self, conn):
+        """
+        Reconciles the index with the *.json files on disk.
+        An up-to-date index is only checked, without listing the directory or taking the
+        write lock. Otherwise the sync runs under the write lock, so it can't mistake a file
+        being saved by another session or process for a removed one.
+        Only files missing from the index are opened.
+        """
+        if self._index_is_current(conn)[0]:
+            return
+        with self._write_lock:
+            # Another writer may have synced while we waited
+            current, dir_mtime = self._index_is_current(conn)
+            if not current:
+                self._sync_files(conn, dir_mtime)
+            conn.commit()
+
+    def _sync_files(self, conn, dir_mtime):
+        on_disk = {
+            entry.name for entry in os.scandir(self.history_dir)
+            if entry.name.endswith(".json") and entry.is_file()
+        }
+        indexed = {r["id"] for r in conn.execute("SELECT id FROM analyses")}
+
+        removed = indexed - on_disk
+        if removed:
+            if self.search_available:
+                self._remove_fts(conn, removed)
+            conn.executemany("DELETE FROM analyses WHERE id = ?", [(f,) for f in removed])
+            self._remove_frames({f[:-len(".json")] for f in removed})
+
+        complete = True
+        for f in on_disk - indexed:
+            path = os.path.join(self.history_dir, f)
+            try:
+                with open(path, 'r', encoding='utf-8') as file:
+                    meta = json.load(file)
+                # Validate the timestamp the same way the list does
+                datetime.strptime(meta.get("timestamp"), "%Y%m%d_%H%M%S")
+            except (OSError, ValueError, TypeError, AttributeError) as e:
+                # The app only publishes complete files (write + rename), but files copied in
+                # by hand or written by an older version may still be in progress
+                try:
+                    recent = time.time() - os.stat(path).st_mtime < UNREADABLE_RETRY_WINDOW
+                except OSError:
+                    recent = False
+                if recent:
+                    logger.debug(f"History file {f} not readable yet, retrying on the next sync: {e}")
+                    complete = False
+                else:
+                    logger.warning(f"Skipping unreadable history file {f}: {e}")
+                continue
+            self._index_entry(conn, f, meta)
+
+        if complete:
+            self._set_dir_mtime(conn, dir_mtime)
+
+    def _set_dir_mtime(self, conn, dir_mtime):
+        conn.execute(
+            "INSERT OR REPLACE INTO index_meta (key, value) VALUES ('dir_mtime', ?)",
+            (dir_mtime,)
+        )
+
+    def _write_frame(self, df, name):
         """
-        Saves analysis data and AI report to a JSON file.
-        Uses a robust strategy:
-        1. Explicitly convert Pandas DataFrames to dicts (for nice structure).
-        2. Use json.dump(default=str) to handle EVERYTHING else (Timestamps, Numpy types) by converting to string.
+        Stores a DataFrame as a typed Arrow file in frames/ and returns the reference kept in the JSON.
+        The index is stored as regular columns and restored on load.
         """
+        import pyarrow.feather as feather
+
+        frame = df.reset_index()
+        if not all(isinstance(c, str) for c in frame.columns):
+            # Arrow needs string column names; keep such frames inline as before
+            return frame.to_dict(orient='records')
+
+        relative_path = f"{FRAMES_DIRNAME}/{name}.arrow"
+        feather.write_feather(frame, os.path.join(self.history_dir, relative_path), compression="uncompressed")
+        return {
+            FRAME_MARKER: relative_path,
+            "index": list(frame.columns[:df.index.nlevels]),
+            "index_names": list(df.index.names)
+        }
+
+    def _read_frame(self, ref):
+        """
+        Loads a DataFrame written by _write_frame (memory-mapped).
+        """
+        import pyarrow.feather as feather
+
+        path = os.path.join(self.history_dir, ref[FRAME_MARKER])
+        frame = feather.read_table(path, memory_map=True).to_pandas()
+        if ref.get("index"):
+            frame = frame.set_index(ref["index"])
+            frame.index.names = ref.get("index_names") or ref["index"]
+        return frame
+
+    def _remove_frames(self, stems):
+        # Frame files are named "<analysis stem>__<key path>.arrow"
+        for entry in os.scandir(self.frames_dir):
+            if entry.name.rsplit("__", 1)[0] in stems:
+                try:
+                    os.remove(entry.path)
+                except OSError as e:
+                    logger.warning(f"Could not remove orphaned frame {entry.name}: {e}")
+
+    def _restore_frames(self, obj, key=None):
+        """
+        Recursively replaces frame references with DataFrames.
+        Analyses saved before the Arrow format keep 'history' as a list of records; it is rebuilt here.
+        """
+        if isinstance(obj, dict):
+            if FRAME_MARKER in obj:
+                return self._read_frame(obj)
+            if SLICE_MARKER in obj:
+                return self.price_store.read_slice(obj[SLICE_MARKER])
+            return {k: self._restore_frames(v, k) for k, v in obj.items()}
+        if key == "history" and isinstance(obj, list):
+            import pandas as pd
+
+            df = pd.DataFrame(obj)
+            if 'Date' in df.columns:
+                try:
+                    df['Date'] = pd.to_datetime(df['Date'])
+                except (ValueError, TypeError):
+                    # Mixed UTC offsets (DST changes) only parse when normalized to UTC
+                    df['Date'] = pd.to_datetime(df['Date'], utc=True)
+                df.set_index('Date', inplace=True)
+            return df
+        if isinstance(obj, list):
+            return [self._restore_frames(i) for i in obj]
+        return obj
+
+    @telemetry.traced("history.save")
+    def save_analysis(self, ticker, data, ai_report, report_meta=None, perf=None):
+        """
+        Saves analysis data and AI report.
+        1. DataFrames are written as typed Arrow files under frames/ and referenced from the JSON;
+           price history taken from the PriceStore is only referenced by its slice.
+        2. The JSON keeps the small remainder (metadata, scalar metrics, AI report);
+           numpy scalars stay numbers, timestamps become ISO strings.
+        The new file is also registered in the index, so listing it never requires opening it.
+        The id is "<ticker>_<timestamp>_<random suffix>.json", unique even for analyses of the same
+        ticker saved in the same second. The JSON is written to a temp file and renamed into place
+        under the write lock, so readers in any process only ever see complete files.
+        report_meta ({"model_name", "prompt_hash"}) marks the report as reusable by find_report;
+        leave it out for reports that should never be served from cache (errors) and for copies of
+        a reused report, whose age has to keep counting from the original.
+        perf is the run's timing trace (see telemetry), kept for the performance panel.
+        """
+        import pandas as pd
+
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        filename = f"{ticker}_{timestamp}.json"
+        stem = f"{ticker}_{timestamp}_{uuid.uuid4().hex[:8]}"
+        filename = f"{stem}.json"
         filepath = os.path.join(self.history_dir, filename)
         
-        def prepare_dataframes(obj):
-            """Recursively finds DataFrames and converts them to dicts."""
+        def prepare_dataframes(obj, path):
+            """Recursively finds DataFrames and moves them to Arrow files."""
             if isinstance(obj, pd.DataFrame):
-                return obj.reset_index().to_dict(orient='records')
+                if obj.attrs.get("price_slice"):
+                    return {SLICE_MARKER: obj.attrs["price_slice"]}
+                return self._write_frame(obj, stem + "__" + re.sub(r"[^\w-]", "_", path))
             if isinstance(obj, dict):
-                return {k: prepare_dataframes(v) for k, v in obj.items()}
+                return {k: prepare_dataframes(v, f"{path}_{k}" if path else str(k)) for k, v in obj.items()}
             if isinstance(obj, list):
-                return [prepare_dataframes(i) for i in obj]
+                return [prepare_dataframes(v, f"{path}_{i}") for i, v in enumerate(obj)]
             return obj
 
-        # 1. First pass: Handle DataFrames nicely
-        clean_data = prepare_dataframes(data)
+        # 1. First pass: Move DataFrames out
+        clean_data = prepare_dataframes(data, "")
 
         payload = {
             "ticker": ticker,
@@ -39,46 +507,196 @@ class HistoryEngine:
             "data": clean_data,
             "ai_report": ai_report
         }
+        if report_meta:
+            payload["report_meta"] = report_meta
+        if perf:
+            payload["perf"] = perf
+
+        # 2. Final pass: Catch Timestamps, NaT, Numpy ints, etc.
+        # The temp file lives next to the index, so writing it doesn't touch history_dir's mtime
+        tmp_path = os.path.join(self.index_dir, f"{stem}.tmp")
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(payload, f, ensure_ascii=False, indent=4, default=_json_default)
+                f.flush()
+                os.fsync(f.fileno())
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
 
-        # 2. Final pass: Use default=str to catch Timestamps, NaT, Numpy ints, etc.
-        with open(filepath, 'w', encoding='utf-8') as f:
-            json.dump(payload, f, ensure_ascii=False, indent=4, default=str)
+        # 3. Publish and register in the index together, so a concurrent sync sees both or neither
+        with self._write_lock, closing(self._connect()) as conn, conn:
+            was_current = self._index_is_current(conn)[0]
+            os.replace(tmp_path, filepath)
+            self._index_entry(conn, filename, payload)
+            if was_current:
+                # The rename changed the directory mtime; record it so the next list doesn't
+                # rescan the directory for a file that is already indexed
+                self._set_dir_mtime(conn, str(os.stat(self.history_dir).st_mtime_ns))
         
         return filename
 
+    def get_history_list(self, ticker=None, offset=0, limit=None):
+        """
+        Returns saved analyses sorted by timestamp (newest first), optionally only those of
+        'ticker' and one page at a time (offset/limit).
+        Served from the index; no analysis file is opened unless it was added outside the app.
+        """
+        sql = "SELECT id, ticker, timestamp FROM analyses"
+        params = []
+        if ticker:
+            sql += " WHERE ticker = ?"
+            params.append(ticker)
+        sql += " ORDER BY timestamp DESC, id DESC"
+        if limit is not None or offset:
+            sql += " LIMIT ? OFFSET ?"
+            params += [-1 if limit is None else limit, offset]
 
+        with closing(self._connect()) as conn, conn:
+            self._sync_index(conn)
+            rows = conn.execute(sql, params).fetchall()
 
+        return [_list_entry(row) for row in rows]
 
-
-
-    def get_history_list(self):
+    def get_ticker_groups(self, offset=0, limit=None, prefix=None):
         """
-        Returns a list of saved analyses sorted by timestamp (newest first).
+        One group per ticker, most recently analyzed first, one page at a time:
+        {"total": number of tickers, "groups": [{"ticker", "count", "latest"}]}, where 'latest'
+        is the ticker's newest entry in the get_history_list format. 'prefix' filters tickers.
         """
-        files = [f for f in os.listdir(self.history_dir) if f.endswith(".json")]
-        history = []
-        for f in files:
-            path = os.path.join(self.history_dir, f)
-            try:
-                with open(path, 'r', encoding='utf-8') as file:
-                    meta = json.load(file)
-                    history.append({
-                        "id": f,
-                        "ticker": meta.get("ticker"),
-                        "timestamp": meta.get("timestamp"),
-                        "date_display": datetime.strptime(meta.get("timestamp"), "%Y%m%d_%H%M%S").strftime("%Y-%m-%d %H:%M")
-                    })
-            except:
-                continue
-        
-        return sorted(history, key=lambda x: x['timestamp'], reverse=True)
+        where, params = "", []
+        if prefix:
+            where = "WHERE ticker LIKE ? ESCAPE '\\'"
+            params.append(re.sub(r"([\\%_])", r"\\\1", prefix.upper()) + "%")
 
-    def load_analysis(self, filename):
+        with closing(self._connect()) as conn, conn:
+            self._sync_index(conn)
+            total = conn.execute(f"SELECT COUNT(DISTINCT ticker) FROM analyses {where}", params).fetchone()[0]
+            # With MAX(), SQLite takes the bare columns (id) from the row holding the maximum
+            rows = conn.execute(
+                f"""
+                SELECT ticker, id, MAX(timestamp) AS timestamp, COUNT(*) AS count
+                FROM analyses {where}
+                GROUP BY ticker
+                ORDER BY timestamp DESC, ticker
+                LIMIT ? OFFSET ?
+                """,
+                params + [-1 if limit is None else limit, offset]
+            ).fetchall()
+
+        return {
+            "total": total,
+            "groups": [{"ticker": row["ticker"], "count": row["count"], "latest": _list_entry(row)} for row in rows],
+        }
+
+    @telemetry.traced("history.search")
+    def search_reports(self, query=None, ticker=None, date_from=None, date_to=None, verdict=None, limit=50):
         """
-        Loads a specific analysis by filename.
+        Searches saved AI reports via the full-text index, without opening any analysis file.
+        query      free text; every word must occur (prefix match, accents ignored)
+        ticker     exact ticker symbol
+        date_from, date_to  inclusive bounds (date, datetime or 'YYYY-MM-DD')
+        verdict    "Buy", "Hold" or "Sell", as parsed from the report's closing verdict
+        Returns up to 'limit' hits, best match first (newest first without a query), each
+        {"id", "ticker", "timestamp", "date_display", "verdict", "snippet", "score"}.
         """
+        match = _fts_query(query)
+        if match and not self.search_available:
+            raise RuntimeError("Full-text search needs SQLite with the FTS5 extension")
+
+        conditions, params = [], []
+        if ticker:
+            conditions.append("a.ticker = ?")
+            params.append(ticker.upper())
+        if verdict:
+            conditions.append("a.verdict = ?")
+            params.append(verdict)
+        lower, upper = _timestamp_bound(date_from), _timestamp_bound(date_to, end=True)
+        if lower:
+            conditions.append("a.timestamp >= ?")
+            params.append(lower)
+        if upper:
+            conditions.append("a.timestamp <= ?")
+            params.append(upper)
+
+        if match:
+            sql = f"""
+                SELECT a.rowid, a.id, a.ticker, a.timestamp, a.verdict, bm25({REPORTS_FTS_TABLE}) AS score
+                FROM {REPORTS_FTS_TABLE} JOIN analyses a ON a.rowid = {REPORTS_FTS_TABLE}.rowid
+                WHERE {REPORTS_FTS_TABLE} MATCH ? {"".join(" AND " + c for c in conditions)}
+                ORDER BY score LIMIT ?
+            """
+            params = [match] + params
+        else:
+            sql = f"""
+                SELECT a.rowid, a.id, a.ticker, a.timestamp, a.verdict, NULL AS score
+                FROM analyses a {"WHERE " + " AND ".join(conditions) if conditions else ""}
+                ORDER BY a.timestamp DESC, a.id DESC LIMIT ?
+            """
+
+        snippets = {}
+        with closing(self._connect()) as conn, conn:
+            self._sync_index(conn)
+            rows = conn.execute(sql, params + [limit]).fetchall()
+            # FTS5's snippet() would be built for every match before the LIMIT; the text of
+            # the returned hits is fetched by rowid instead and cut in Python
+            for row in rows if match else ():
+                text = conn.execute(
+                    f"SELECT ai_report FROM {REPORTS_FTS_TABLE} WHERE rowid = ?", (row["rowid"],)
+                ).fetchone()
+                snippets[row["id"]] = _snippet(text[0], query) if text else None
+
+        return [
+            dict(
+                _list_entry(row),
+                verdict=row["verdict"],
+                snippet=snippets.get(row["id"]),
+                # bm25 is lower-is-better; flipped so a higher score means a better match
+                score=-row["score"] if row["score"] is not None else None,
+            )
+            for row in rows
+        ]
+
+    def _read_payload(self, filename):
         filepath = os.path.join(self.history_dir, filename)
         if os.path.exists(filepath):
             with open(filepath, 'r', encoding='utf-8') as f:
                 return json.load(f)
         return None
+
+    @telemetry.traced("history.load")
+    def load_analysis(self, filename):
+        """
+        Loads a specific analysis by filename.
+        Metadata and the AI report are read right away; 'data' is a LazyData whose DataFrames
+        (Arrow files or the older inline JSON records) are restored on first access.
+        """
+        payload = self._read_payload(filename)
+        if payload and isinstance(payload.get("data"), dict):
+            payload["data"] = LazyData(payload["data"], self._restore_frames)
+        return payload
+
+    @telemetry.traced("history.find_report")
+    def find_report(self, ticker, model_name, prompt_hash, max_age_seconds):
+        """
+        Returns (id, ai_report) of the newest saved report for this ticker that was generated
+        by the same model and prompt within max_age_seconds, or None.
+        """
+        oldest = (datetime.now() - timedelta(seconds=max_age_seconds)).strftime("%Y%m%d_%H%M%S")
+        with closing(self._connect()) as conn, conn:
+            self._sync_index(conn)
+            rows = conn.execute(
+                """
+                SELECT id FROM analyses
+                WHERE ticker = ? AND model_name = ? AND prompt_hash = ? AND timestamp >= ?
+                ORDER BY timestamp DESC, id DESC
+                """,
+                (ticker, model_name, prompt_hash, oldest)
+            ).fetchall()
+
+        for row in rows:
+            loaded = self._read_payload(row["id"])
+            if loaded and loaded.get("ai_report"):
+                return row["id"], loaded["ai_report"]
+        return None
@@ -0,0 +1,167 @@
+"""
+Technical indicators computed from stored price history.
+
+Everything works on a wide price frame (rows = dates, one column per ticker), so one
+ticker and a 500-ticker panel go through the same vectorized pandas/NumPy operations,
+with no Python loop over rows or tickers.
+"""
+import hashlib
+
+import numpy as np
+import pandas as pd
+
+from cache import TTLCache, MISSING
+
+TRADING_DAYS = 252
+VOLATILITY_WINDOW = 21
+MOVING_AVERAGES = (50, 200)
+RSI_PERIOD = 14
+
+# Results are keyed by the data they were computed from, so the TTL only bounds memory use
+INDICATORS_TTL = 24 * 3600
+default_cache = TTLCache(max_entries=64)
+
+
+def price_panel(history, column=None):
+    """
+    Wide frame of prices (dates x tickers) from:
+    - one ticker's OHLCV frame (Ticker.history / PriceStore), returned as a single column,
+    - the long (Ticker, Date) frame of DataEngine.get_bulk_data,
+    - an already wide frame or a Series, returned as is.
+    Uses 'Adj Close' when present (dividends and splits don't show up as returns), else 'Close'.
+    The index is made tz-naive so tickers and the benchmark from different sources line up.
+    """
+    if isinstance(history, pd.Series):
+        prices = history.to_frame()
+    elif column is None and not {"Adj Close", "Close"} & set(history.columns):
+        prices = history
+    else:
+        column = column or ("Adj Close" if "Adj Close" in history.columns else "Close")
+        if isinstance(history.index, pd.MultiIndex):
+            prices = history[column].unstack(0)
+        else:
+            prices = history[[column]]
+            prices.columns = [history.attrs.get("price_slice", {}).get("ticker", column)]
+
+    prices = prices.astype(float)
+    if getattr(prices.index, "tz", None) is not None:
+        prices = prices.copy()
+        prices.index = prices.index.tz_localize(None)
+    return prices.sort_index()
+
+
+def returns(prices):
+    return prices.pct_change(fill_method=None)
+
+
+def rolling_volatility(prices, window=VOLATILITY_WINDOW):
+    """
+    Annualized standard deviation of daily returns over a rolling window.
+    """
+    return returns(prices).rolling(window, min_periods=window).std() * np.sqrt(TRADING_DAYS)
+
+
+def moving_average(prices, window):
+    return prices.rolling(window, min_periods=window).mean()
+
+
+def rsi(prices, period=RSI_PERIOD):
+    """
+    Relative Strength Index with Wilder's smoothing (an EMA with alpha = 1 / period).
+    """
+    delta = prices.diff()
+    gain = delta.clip(lower=0).ewm(alpha=1 / period, adjust=False, min_periods=period).mean()
+    loss = (-delta.clip(upper=0)).ewm(alpha=1 / period, adjust=False, min_periods=period).mean()
+    with np.errstate(divide="ignore", invalid="ignore"):
+        # No losses at all gives rs = inf and RSI = 100
+        return 100 - 100 / (1 + gain / loss)
+
+
+def drawdown(prices):
+    """
+    Distance from the running peak, e.g. -0.25 = 25 % below the highest price so far.
+    """
+    return prices / prices.cummax() - 1
+
+
+def beta(prices, benchmark):
+    """
+    Beta of every column vs the benchmark price series, from daily returns on the dates
+    both have. Computed for all columns at once as cov(r, m) / var(m) on masked arrays.
+    """
+    stock = returns(prices)
+    market = returns(price_panel(benchmark)).iloc[:, 0].reindex(stock.index)
+
+    r = stock.to_numpy()
+    m = np.broadcast_to(market.to_numpy()[:, None], r.shape)
+    mask = ~np.isnan(r) & ~np.isnan(m)
+    n = mask.sum(axis=0)
+
+    r = np.where(mask, r, 0.0)
+    m = np.where(mask, m, 0.0)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        r_mean = r.sum(axis=0) / n
+        m_mean = m.sum(axis=0) / n
+        cov = (np.where(mask, (r - r_mean) * (m - m_mean), 0.0)).sum(axis=0)
+        var = (np.where(mask, (m - m_mean) ** 2, 0.0)).sum(axis=0)
+        values = np.where(n > 2, cov / var, np.nan)
+    return pd.Series(values, index=prices.columns)
+
+
+def data_version(prices):
+    """
+    Fingerprint of a price frame's contents, used as the cache key.
+    """
+    digest = hashlib.sha1(pd.util.hash_pandas_object(prices, index=True).to_numpy().tobytes())
+    digest.update(repr(list(prices.columns)).encode("utf-8"))
+    return digest.hexdigest()
+
+
+def _summary(prices, benchmark):
+    filled = prices.ffill()
+    last = filled.iloc[-1]
+
+    def _ago(days):
+        # Price 'days' trading days before the last bar of each column
+        return filled.iloc[-1 - days] if len(filled) > days else pd.Series(np.nan, index=prices.columns)
+
+    summary = pd.DataFrame({
+        "last_price": last,
+        "return_1m": last / _ago(21) - 1,
+        "return_3m": last / _ago(63) - 1,
+        "return_1y": last / prices.bfill().iloc[0] - 1,
+        "volatility": rolling_volatility(prices).ffill().iloc[-1],
+        "rsi": rsi(prices).ffill().iloc[-1],
+        "max_drawdown": drawdown(prices).min(),
+    })
+    for window in MOVING_AVERAGES:
+        ma = moving_average(prices, window).ffill().iloc[-1]
+        summary[f"ma_{window}"] = ma
+        summary[f"vs_ma_{window}"] = last / ma - 1
+    summary["beta"] = beta(prices, benchmark) if benchmark is not None and not benchmark.empty else np.nan
+    summary.index.name = "ticker"
+    return summary
+
+
+def compute_indicators(history, benchmark=None, cache=None):
+    """
+    Latest indicator values for every ticker in 'history' (anything price_panel accepts),
+    one row per ticker: returns (1m, 3m, whole range), annualized 21-day volatility, RSI 14,
+    max drawdown, 50/200-day moving averages and the price's distance from them, and beta
+    vs 'benchmark' (price history of an index, optional).
+    Results are cached by the contents of the inputs, so reruns over unchanged data are free.
+    """
+    cache = cache if cache is not None else default_cache
+    prices = price_panel(history)
+    bench = price_panel(benchmark) if benchmark is not None and not benchmark.empty else None
+    if prices.empty:
+        return pd.DataFrame()
+
+    key = ("indicators", data_version(prices), data_version(bench) if bench is not None else None)
+    cached = cache.get(key)
+    if cached is not MISSING:
+        return cached
+
+    summary = _summary(prices, bench)
+    cache.set(key, summary, INDICATORS_TTL)
+    return summary
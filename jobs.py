@@ -0,0 +1,318 @@
+"""
+Background analysis jobs.
+
+The analyze button used to run the whole pipeline (data, Gemini, save) on the Streamlit
+script thread, so a refresh or any click during the 20-60 s run threw the work away.
+Analyses now run on a process-wide worker pool instead: the UI submits a job, keeps only
+its id (in the page URL, so it survives a browser refresh) and polls its status.
+
+Job state is kept in memory and mirrored to history/.jobs/<job_id>.json (written via a
+temp file + rename): queued -> running (with the partial report as it streams in) ->
+done (with the History id of the saved analysis) or failed (with the error). The file
+lets another app process sharing the history directory, or this one after a restart,
+still answer for the job. Every queue touches a heartbeat file (.jobs/<owner>.alive) every
+HEARTBEAT_INTERVAL seconds; an unfinished job whose owner's heartbeat is older than
+HEARTBEAT_TIMEOUT, or that belongs to an earlier run of this process, is reported as
+interrupted.
+
+Watchlist batches (BatchRunner) are jobs too (submit_batch): one runs at a time on its own
+thread, reporting per-ticker progress; the batch's state file keeps it resumable.
+
+AUTO_ANALYST_JOB_WORKERS sets how many analyses run at the same time (default 2);
+all sessions share the pool.
+"""
+import json
+import os
+import re
+import socket
+import threading
+import time
+import uuid
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from batch import BatchRunner
+from pipeline import run_analysis
+
+logger = logging.getLogger(__name__)
+
+JOBS_DIRNAME = ".jobs"
+JOB_WORKERS = int(os.getenv("AUTO_ANALYST_JOB_WORKERS", "2"))
+
+# Seconds between writes of a running job's partial report to its file
+PROGRESS_INTERVAL = 1.0
+# Seconds between touches of the owner's heartbeat file; a queue whose heartbeat is older
+# than HEARTBEAT_TIMEOUT is gone and its unfinished jobs are reported as interrupted
+HEARTBEAT_INTERVAL = 2.0
+HEARTBEAT_TIMEOUT = 10.0
+# Finished jobs are dropped from memory after this long (get() then reads their file)
+STALE_AFTER = 15 * 60
+# Finished job files are removed after a day
+JOB_RETENTION = 24 * 3600
+
+ACTIVE_STATUSES = ("queued", "running")
+
+
+def _batch_progress(state, ticker=None, outcome=None):
+    return {
+        "done": len(state["done"]),
+        "failed": len(state["failed"]),
+        "total": len(state["tickers"]),
+        "last": ticker,
+        "last_ok": outcome is not None and "id" in outcome,
+    }
+
+
+class JobQueue:
+    def __init__(self, data_engine, ai_engine, history_engine, workers=JOB_WORKERS):
+        self.data_engine = data_engine
+        self.ai_engine = ai_engine
+        self.history_engine = history_engine
+        self.workers = workers
+        self.jobs_dir = os.path.join(history_engine.history_dir, JOBS_DIRNAME)
+        if not os.path.exists(self.jobs_dir):
+            os.makedirs(self.jobs_dir)
+        # The random part tells this run apart from an earlier process that had the same pid
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="analysis-job")
+        # A batch has its own data and Gemini pools (see BatchRunner); this thread only drives it
+        self.batch_runner = BatchRunner(data_engine, ai_engine, history_engine)
+        self._batch_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="batch-job")
+        # Jobs submitted by this process, by id; the single source of truth while they live here
+        self._jobs = {}
+        self._lock = threading.Lock()
+        self._remove_expired()
+        self._stopped = threading.Event()
+        self._beat()
+        threading.Thread(target=self._heartbeat, name="job-heartbeat", daemon=True).start()
+
+    # --- State -----------------------------------------------------------
+
+    def _job_path(self, job_id):
+        return os.path.join(self.jobs_dir, f"{job_id}.json")
+
+    def _write_job(self, job):
+        """
+        Mirrors a job to its file via a temp file + rename, so readers never see a partial write.
+        """
+        path = self._job_path(job["job_id"])
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(job, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+
+    def _heartbeat_path(self, owner):
+        return os.path.join(self.jobs_dir, re.sub(r"[^\w.-]", "_", owner) + ".alive")
+
+    def _beat(self):
+        path = self._heartbeat_path(self.owner)
+        try:
+            with open(path, 'a', encoding='utf-8'):
+                pass
+            os.utime(path)
+        except OSError as e:
+            logger.warning(f"Could not update the job heartbeat {path}: {e}")
+
+    def _heartbeat(self):
+        while not self._stopped.wait(HEARTBEAT_INTERVAL):
+            self._beat()
+
+    def _owner_alive(self, owner):
+        """Whether the queue that owns a job still runs (in any process sharing the directory)."""
+        if owner == self.owner:
+            # Our unfinished jobs are always in memory; one that isn't is from an earlier run
+            return False
+        try:
+            return time.time() - os.stat(self._heartbeat_path(owner)).st_mtime < HEARTBEAT_TIMEOUT
+        except OSError:
+            return False
+
+    def _update(self, job_id, write=True, **changes):
+        with self._lock:
+            job = self._jobs[job_id]
+            job.update(changes, updated=time.time())
+            snapshot = dict(job)
+        if write:
+            self._write_job(snapshot)
+        return snapshot
+
+    def _remove_expired(self):
+        now = time.time()
+        for entry in os.scandir(self.jobs_dir):
+            try:
+                if now - entry.stat().st_mtime > JOB_RETENTION:
+                    os.remove(entry.path)
+            except OSError as e:
+                logger.warning(f"Could not remove old job file {entry.name}: {e}")
+
+    # --- API -------------------------------------------------------------
+
+    def _add_job(self, fields, same):
+        """
+        Registers a new job with 'fields' and returns (state, created). If a queued or running
+        job of this process matches same(job), that one is returned instead.
+        """
+        with self._lock:
+            # Finished jobs are dropped from memory after a while; get() then reads their file
+            expired = [
+                i for i, j in self._jobs.items()
+                if j["status"] not in ACTIVE_STATUSES and time.time() - j["updated"] > STALE_AFTER
+            ]
+            for job_id in expired:
+                del self._jobs[job_id]
+            for job in self._jobs.values():
+                if job["status"] in ACTIVE_STATUSES and same(job):
+                    return dict(job), False
+            job_id = f"{datetime.now().strftime('%Y%m%d_%H%M%S')}_{uuid.uuid4().hex[:8]}"
+            job = dict(
+                fields,
+                job_id=job_id,
+                status="queued",
+                owner=self.owner,
+                created=time.time(),
+                updated=time.time(),
+                error=None,
+            )
+            self._jobs[job_id] = job
+            snapshot = dict(job)
+        self._write_job(snapshot)
+        return snapshot, True
+
+    def submit(self, ticker, force_refresh=False):
+        """
+        Queues an analysis of 'ticker' and returns the job state.
+        An identical job that is still queued or running in this process is returned
+        instead of starting a second one.
+        """
+        ticker = ticker.upper()
+        job, created = self._add_job(
+            {
+                "kind": "analysis",
+                "ticker": ticker,
+                "force_refresh": force_refresh,
+                "report": "",
+                "waiting": None,
+                "result_id": None,
+                "report_source": None,
+            },
+            lambda j: j["kind"] == "analysis" and j["ticker"] == ticker and j["force_refresh"] == force_refresh
+        )
+        if created:
+            self._executor.submit(self._run, job["job_id"])
+        return job
+
+    def submit_batch(self, batch_id):
+        """
+        Queues a run (or resume) of a saved watchlist batch (see BatchRunner) and returns the
+        job state. Batches run one at a time next to the analysis workers; "progress" holds
+        done/failed/total counts and the last finished ticker, "batch" the final batch state.
+        """
+        state = self.batch_runner.load_state(batch_id)
+        if state is None:
+            raise ValueError(f"Batch {batch_id} neexistuje.")
+        job, created = self._add_job(
+            {
+                "kind": "batch",
+                "batch_id": batch_id,
+                "ticker": None,
+                "progress": _batch_progress(state),
+                "batch": None,
+            },
+            lambda j: j["kind"] == "batch" and j["batch_id"] == batch_id
+        )
+        if created:
+            self._batch_executor.submit(self._run_batch, job["job_id"])
+        return job
+
+    def get(self, job_id):
+        """
+        Returns the current state of a job, or None if it is unknown.
+        Jobs of other processes are read from their file.
+        """
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is not None:
+                return dict(job)
+
+        path = self._job_path(job_id)
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                job = json.load(f)
+        except FileNotFoundError:
+            return None
+        if job["status"] in ACTIVE_STATUSES and not self._owner_alive(job["owner"]):
+            # The process that ran it crashed or was restarted
+            if job.get("kind") == "batch":
+                job.update(status="failed", error="Dávka bola prerušená (reštart servera). Dá sa v nej pokračovať.")
+            else:
+                job.update(status="failed", error="Analýza bola prerušená (reštart servera).")
+        return job
+
+    def active_jobs(self):
+        """Queued and running jobs of this process, oldest first."""
+        with self._lock:
+            jobs = [dict(j) for j in self._jobs.values() if j["status"] in ACTIVE_STATUSES]
+        return sorted(jobs, key=lambda j: j["created"])
+
+    def shutdown(self, wait=True):
+        self._executor.shutdown(wait=wait, cancel_futures=not wait)
+        self._batch_executor.shutdown(wait=wait, cancel_futures=not wait)
+        self._stopped.set()
+        try:
+            os.remove(self._heartbeat_path(self.owner))
+        except FileNotFoundError:
+            pass
+
+    # --- Execution -------------------------------------------------------
+
+    def _run(self, job_id):
+        job = self._update(job_id, status="running")
+        parts = []
+        last_write = [time.monotonic()]
+
+        def progress(**changes):
+            # Visible in memory right away, on disk at most once per PROGRESS_INTERVAL
+            now = time.monotonic()
+            write = now - last_write[0] >= PROGRESS_INTERVAL
+            if write:
+                last_write[0] = now
+            self._update(job_id, write=write, **changes)
+
+        def on_chunk(chunk):
+            parts.append(chunk)
+            progress(report="".join(parts), waiting=None)
+
+        def on_wait(position, waited):
+            progress(waiting={"position": position, "waited": waited})
+
+        try:
+            result = run_analysis(
+                job["ticker"], self.data_engine, self.ai_engine, self.history_engine,
+                force_refresh=job["force_refresh"], on_chunk=on_chunk, on_wait=on_wait
+            )
+        except Exception as e:
+            logger.exception(f"Analysis job {job_id} ({job['ticker']}) failed")
+            result = {"error": str(e)}
+
+        if "error" in result:
+            self._update(job_id, status="failed", error=result["error"], waiting=None)
+        else:
+            self._update(
+                job_id, status="done", result_id=result["id"], report_source=result["report_source"],
+                report=result["ai_report"], waiting=None
+            )
+
+    def _run_batch(self, job_id):
+        job = self._update(job_id, status="running")
+
+        def on_progress(state, ticker, outcome):
+            self._update(job_id, progress=_batch_progress(state, ticker, outcome))
+
+        try:
+            state = self.batch_runner.run(job["batch_id"], on_progress=on_progress)
+        except Exception as e:
+            logger.exception(f"Batch job {job_id} ({job['batch_id']}) failed")
+            self._update(job_id, status="failed", error=str(e))
+            return
+        self._update(job_id, status="done", batch=state)
@@ -0,0 +1,129 @@
+"""
+Peer comparison: the fundamentals of N tickers side by side.
+
+The 'Hard Data' dicts of the peer set (DataEngine.get_bulk_data) are turned into one
+columnar table (rows = tickers, one numeric column per metric) and everything else is
+computed on whole columns: percentile ranks within the peer set, sector medians and the
+display strings. Results are cached per peer set and data version, so reruns with
+unchanged data skip straight to rendering.
+"""
+import numpy as np
+import pandas as pd
+
+from cache import TTLCache, MISSING
+from indicators import data_version
+
+# column -> (label, format, direction): direction True = higher is better, False = lower is
+# better, None = neither (shown, but not ranked)
+PEER_METRICS = {
+    "market_cap": ("Market Cap", "money", True),
+    "total_revenue": ("Revenue", "money", True),
+    "gross_margin": ("Gross Margin", "percent", True),
+    "operating_margin": ("Operating Margin", "percent", True),
+    "pe_ratio": ("P/E Ratio", "ratio", False),
+    "forward_pe": ("Forward P/E", "ratio", False),
+    "beta": ("Beta", "ratio", None),
+    "eps_gaap": ("GAAP EPS", "ratio", True),
+    "eps_non_gaap": ("Non-GAAP (Fwd)", "ratio", True),
+    "rpo_value": ("RPO (Deferred)", "money", True),
+}
+UNKNOWN_SECTOR = "N/A"
+
+PEERS_TTL = 24 * 3600
+default_cache = TTLCache(max_entries=32)
+
+
+def metrics_table(tickers):
+    """
+    Numeric metrics table from {symbol: data} (tickers with an "error" are left out):
+    index = ticker, columns = name, sector and PEER_METRICS. Values that aren't numbers
+    ("N/A", None) become NaN.
+    """
+    rows = {symbol: data for symbol, data in tickers.items() if data and "error" not in data}
+    columns = ["name", "sector"] + list(PEER_METRICS)
+    table = pd.DataFrame([[data.get(c) for c in columns] for data in rows.values()],
+                         index=pd.Index(list(rows), name="Ticker"), columns=columns)
+    numeric = list(PEER_METRICS)
+    table[numeric] = table[numeric].apply(pd.to_numeric, errors="coerce").astype(float)
+    table["sector"] = table["sector"].fillna(UNKNOWN_SECTOR)
+    table["name"] = table["name"].fillna(pd.Series(table.index, index=table.index))
+    return table
+
+
+def percentile_ranks(table):
+    """
+    Percentile (0-100) of every metric with a direction within the peer set, oriented so that
+    100 is the best value (the lowest P/E, the highest margin). Metrics that are neither better
+    high nor low (beta) are left out. Missing values stay NaN.
+    """
+    ranked = [c for c, (_, _, direction) in PEER_METRICS.items() if direction is not None]
+    values = table[ranked]
+    ranks = values.rank(pct=True)
+    lower_is_better = [c for c, (_, _, direction) in PEER_METRICS.items() if direction is False]
+    ranks[lower_is_better] = values[lower_is_better].rank(pct=True, ascending=False)
+    return ranks * 100
+
+
+def sector_medians(table):
+    """Median of every metric per sector, plus the whole peer set as "Všetky"."""
+    values = table[list(PEER_METRICS)]
+    medians = values.groupby(table["sector"]).median()
+    medians.loc["Všetky"] = values.median()
+    medians.index.name = "Sektor"
+    return medians
+
+
+def _format_money(values):
+    magnitude = np.abs(values)
+    divisor = np.select([magnitude >= 1e12, magnitude >= 1e9, magnitude >= 1e6], [1e12, 1e9, 1e6], 1.0)
+    suffix = np.select([magnitude >= 1e12, magnitude >= 1e9, magnitude >= 1e6], [" T", " B", " M"], "")
+    return np.char.add(np.char.mod("$%.2f", values / divisor), suffix)
+
+
+_FORMATTERS = {
+    "money": _format_money,
+    "percent": lambda values: np.char.mod("%.1f%%", values * 100),
+    "ratio": lambda values: np.char.mod("%.2f", values),
+}
+
+
+def format_table(values):
+    """
+    Display strings for a frame of PEER_METRICS columns (metrics table or medians),
+    formatted a column at a time; NaN shows as "N/A". Columns are renamed to their labels.
+    """
+    formatted = {}
+    for column, (label, kind, _) in PEER_METRICS.items():
+        column_values = values[column].to_numpy(dtype=float)
+        text = _FORMATTERS[kind](np.nan_to_num(column_values))
+        formatted[label] = np.where(np.isnan(column_values), "N/A", text)
+    return pd.DataFrame(formatted, index=values.index)
+
+
+def compare_peers(tickers, cache=None):
+    """
+    Peer comparison for {symbol: data} as returned by DataEngine.get_bulk_data()["tickers"]:
+    {"table": numeric metrics, "ranks": percentiles, "medians": sector medians,
+     "display": formatted table with name and sector, "medians_display": formatted medians,
+     "errors": {symbol: error} for tickers without data}.
+    """
+    cache = cache if cache is not None else default_cache
+    errors = {symbol: data.get("error") for symbol, data in tickers.items() if not data or "error" in data}
+    table = metrics_table(tickers)
+
+    key = ("peers", tuple(table.index), data_version(table))
+    cached = cache.get(key)
+    if cached is not MISSING:
+        return dict(cached, errors=errors)
+
+    medians = sector_medians(table)
+    display = pd.concat([table[["name", "sector"]].set_axis(["Názov", "Sektor"], axis=1), format_table(table)], axis=1)
+    result = {
+        "table": table,
+        "ranks": percentile_ranks(table),
+        "medians": medians,
+        "display": display,
+        "medians_display": format_table(medians),
+    }
+    cache.set(key, result, PEERS_TTL)
+    return dict(result, errors=errors)
@@ -0,0 +1,95 @@
+import threading
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+import telemetry
+from ai_engine import is_error_report
+
+logger = logging.getLogger(__name__)
+
+# The hard data fetch runs on its own thread while the AI report is streamed on the
+# caller's thread (in the app, a background job worker; see jobs.py).
+_data_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix="analysis-data")
+
+
+def run_analysis(ticker_symbol, data_engine, ai_engine, history_engine, force_refresh=False, on_chunk=None,
+                 on_wait=None):
+    """
+    Runs one full analysis: hard data and AI report are fetched at the same time
+    and joined before saving, so latency is max(data, AI) instead of their sum.
+    If the data fetch reports a ticker error, the AI call is cancelled and the
+    error is returned.
+    A fresh report from History is reused unless force_refresh is set (see AIEngine.get_report).
+    on_chunk(text) is called with every piece of the report as it streams in.
+    on_wait(position, waited_seconds) is called while queued for Gemini quota.
+    Stage timings, Gemini retries and token usage are collected in a telemetry trace that is
+    saved with the analysis and returned under "perf".
+    Returns {"ticker", "data", "ai_report", "id", "report_source", "perf"} or {"error": ...}.
+    """
+    with telemetry.start_trace("analysis", ticker=ticker_symbol.upper()) as trace:
+        result = _run_analysis(ticker_symbol, data_engine, ai_engine, history_engine, force_refresh, on_chunk, on_wait)
+    if trace is not None and "error" not in result:
+        result["perf"] = trace.to_dict()
+    return result
+
+
+def _run_analysis(ticker_symbol, data_engine, ai_engine, history_engine, force_refresh, on_chunk, on_wait):
+    cancel_event = threading.Event()
+
+    def fetch_data():
+        try:
+            hard_data = data_engine.get_ticker_data(ticker_symbol)
+        except Exception as e:
+            hard_data = {"error": str(e)}
+        if "error" in hard_data:
+            cancel_event.set()
+        return hard_data
+
+    # 1. Start the data fetch in the background
+    data_future = telemetry.submit(_data_executor, fetch_data)
+
+    # 2. Stream the AI report on this thread
+    outcome = {}
+    parts = []
+    stream = ai_engine.get_report_stream(
+        ticker_symbol, history_engine, force_refresh=force_refresh,
+        cancel_event=cancel_event, outcome=outcome, on_wait=on_wait
+    )
+    try:
+        for chunk in stream:
+            if cancel_event.is_set():
+                break
+            parts.append(chunk)
+            if on_chunk:
+                on_chunk(chunk)
+    finally:
+        stream.close()
+
+    # 3. Join the data fetch
+    with telemetry.span("pipeline.join_data"):
+        hard_data = data_future.result()
+    if "error" in hard_data:
+        logger.info(f"Cancelled AI report for {ticker_symbol}: {hard_data['error']}")
+        return {"error": hard_data["error"]}
+
+    ai_report = "".join(parts)
+
+    # 4. Save to History. Failed reports are kept but never offered for reuse, and neither is
+    # the copy of a reused report: find_report keeps finding the original, so the freshness
+    # window runs from when the report was actually generated
+    failed = outcome.get("error") or is_error_report(ai_report)
+    report_meta = None if failed or outcome.get("source") else ai_engine.report_meta()
+    # The stored trace ends here; the save itself shows up in the logs and aggregates
+    trace = telemetry.current_trace()
+    saved_id = history_engine.save_analysis(
+        ticker_symbol, hard_data, ai_report, report_meta=report_meta,
+        perf=trace.to_dict() if trace is not None else None
+    )
+
+    return {
+        "ticker": ticker_symbol,
+        "data": hard_data,
+        "ai_report": ai_report,
+        "id": saved_id,
+        "report_source": outcome.get("source")
+    }
@@ -0,0 +1,359 @@
+import json
+import os
+import time
+import logging
+
+import telemetry
+from arrow_store import FrameCache, KeyedLocks, ProcessDefault, temp_path, write_frame
+
+logger = logging.getLogger(__name__)
+
+# Periods accepted by yf.Ticker.history, as offsets from today (None = everything available)
+PERIOD_OFFSETS = {
+    "1d": {"days": 1},
+    "5d": {"days": 5},
+    "1mo": {"months": 1},
+    "3mo": {"months": 3},
+    "6mo": {"months": 6},
+    "1y": {"years": 1},
+    "2y": {"years": 2},
+    "5y": {"years": 5},
+    "10y": {"years": 10},
+    "max": None,
+}
+
+# How long the newest stored bar is trusted before the tail is fetched again, in seconds
+REFRESH_AFTER = 15 * 60
+
+# Price files kept decoded in memory (see arrow_store.FrameCache)
+MAX_CACHED_FRAMES = 64
+
+
+class PriceStore:
+    """
+    Local OHLCV store: one Arrow file per (ticker, interval) plus a small JSON sidecar.
+
+    Bars are stored unadjusted (auto_adjust=False, with an 'Adj Close' column), so existing
+    rows never change and new bars can simply be appended. Only bars after the last stored
+    date are downloaded; a longer range is downloaded once and then serves all shorter ones.
+    If a fetched tail contains a dividend or split, the adjusted closes of older rows are stale,
+    so everything stored is downloaded again; rows the download doesn't return are kept.
+
+    Analyses refer to a slice of the store (see slice_ref / read_slice) instead of keeping a copy.
+    """
+
+    def __init__(self, store_dir="data/prices", refresh_after=REFRESH_AFTER):
+        self.store_dir = store_dir
+        self.refresh_after = refresh_after
+        self._locks = KeyedLocks()
+        # Repeated reads of an unchanged file skip the disk
+        self._frames = FrameCache(MAX_CACHED_FRAMES)
+
+    def _key_lock(self, ticker, interval):
+        return self._locks.get((ticker, interval))
+
+    def _paths(self, ticker, interval):
+        stem = os.path.join(self.store_dir, f"{ticker.upper()}_{interval}")
+        return stem + ".arrow", stem + ".json"
+
+    def _read_meta(self, ticker, interval):
+        _, meta_path = self._paths(ticker, interval)
+        try:
+            with open(meta_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def _read_frame(self, ticker, interval):
+        data_path, _ = self._paths(ticker, interval)
+        return self._frames.read(data_path)
+
+    def _write(self, ticker, interval, frame, meta):
+        data_path, meta_path = self._paths(ticker, interval)
+        write_frame(frame, data_path)
+        # The sidecar too goes through a temp file (unique per process and thread) and a rename
+        tmp_path = temp_path(meta_path)
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(meta, f, indent=4)
+        os.replace(tmp_path, meta_path)
+
+    def _period_start(self, period, tz):
+        import pandas as pd
+
+        if period == "ytd":
+            return pd.Timestamp.now(tz=tz).normalize().replace(month=1, day=1)
+        if period not in PERIOD_OFFSETS:
+            raise ValueError(f"Unsupported period: {period}")
+        offset = PERIOD_OFFSETS[period]
+        if offset is None:
+            return None
+        return pd.Timestamp.now(tz=tz).normalize() - pd.DateOffset(**offset)
+
+    def _covers(self, meta, period):
+        # True if the stored range already reaches back far enough for 'period'
+        if meta.get("covered_from") is None:
+            return meta.get("covered_period") == "max"
+        if period == "max":
+            return False
+        import pandas as pd
+
+        covered_from = pd.Timestamp(meta["covered_from"])
+        return covered_from <= self._period_start(period, covered_from.tz)
+
+    def _plan(self, symbol, period, interval):
+        """
+        Decides what 'symbol' needs: ("full", ...) when the stored range doesn't cover the period,
+        ("tail", ...) when the newest bar is older than refresh_after, otherwise ("fresh", ...).
+        """
+        meta = self._read_meta(symbol, interval)
+        stored = self._read_frame(symbol, interval) if meta else None
+        if stored is None or stored.empty or not self._covers(meta, period):
+            return "full", meta, stored
+        if time.time() - meta["fetched_at"] > self.refresh_after:
+            return "tail", meta, stored
+        return "fresh", meta, stored
+
+    def _store_full(self, symbol, interval, period, stored, fresh):
+        # Caller holds the key lock
+        frame = self._merge(stored, fresh)
+        start = self._period_start(period, frame.index.tz if not frame.empty else None)
+        meta = {
+            "covered_period": period,
+            # The requested start, not the first bar: weekends and holidays must not
+            # make tomorrow's request look uncovered
+            "covered_from": str(start) if start is not None else None,
+            "fetched_at": time.time()
+        }
+        if not frame.empty:
+            self._write(symbol, interval, frame, meta)
+        return frame
+
+    def _store_tail(self, symbol, interval, meta, stored, tail):
+        # Caller holds the key lock
+        frame = self._merge(stored, tail)
+        if not frame.empty:
+            self._write(symbol, interval, frame, dict(meta, fetched_at=time.time()))
+        return frame
+
+    def _slice(self, symbol, interval, frame, period):
+        import pandas as pd
+
+        if frame is None or frame.empty:
+            return pd.DataFrame()
+        start = self._period_start(period, frame.index.tz)
+        result = frame if start is None else frame[frame.index >= start]
+        result = result.copy()
+        result.attrs["price_slice"] = self.slice_ref(symbol, interval, result)
+        return result
+
+    def get_history(self, ticker_symbol, period="1y", interval="1d", ticker=None):
+        """
+        Returns OHLCV bars for the period, downloading only what the store is missing.
+        'ticker' may be an existing yf.Ticker to reuse. The returned frame carries
+        attrs["price_slice"] with the reference an analysis can store instead of the data.
+        """
+        symbol = ticker_symbol.upper()
+        with self._key_lock(symbol, interval):
+            action, meta, stored = self._plan(symbol, period, interval)
+
+            if action == "full":
+                # Nothing usable stored for this range: download the full period once
+                fresh = self._download(symbol, ticker, interval, period=period)
+                frame = self._store_full(symbol, interval, period, stored, fresh)
+            elif action == "tail":
+                # Append: re-download from the last stored bar (it may have been incomplete)
+                tail = self._download(symbol, ticker, interval, start=stored.index[-1])
+                if self._has_corporate_action(tail, stored.index[-1]):
+                    # Reload everything stored, not just the covered period: saved analyses
+                    # may point at bars older than it
+                    logger.info(f"Corporate action for {symbol}, reloading since {stored.index[0]}")
+                    reloaded = self._download(symbol, ticker, interval, start=stored.index[0])
+                    frame = self._store_full(symbol, interval, meta["covered_period"], stored, reloaded)
+                else:
+                    frame = self._store_tail(symbol, interval, meta, stored, tail)
+            else:
+                frame = stored
+
+        return self._slice(symbol, interval, frame, period)
+
+    def get_histories(self, ticker_symbols, period="1y", interval="1d", chunk_size=100):
+        """
+        Bulk variant of get_history for many symbols.
+        Symbols are grouped by what they need (full period, or the tail since a common last bar)
+        and each group is fetched with one multi-symbol yf.download call per chunk_size symbols,
+        so refreshing hundreds of tickers takes a handful of round-trips.
+        Returns (frames, errors): {symbol: DataFrame} and {symbol: message} for symbols
+        that got no data; one bad symbol never fails the others.
+        """
+        symbols = list(dict.fromkeys(s.upper() for s in ticker_symbols))
+        plans = {symbol: self._plan(symbol, period, interval) for symbol in symbols}
+        frames = {}
+        errors = {}
+
+        # Full downloads share one request per chunk; tails are grouped by their start bar
+        full = [s for s in symbols if plans[s][0] == "full"]
+        tails = {}
+        for symbol in symbols:
+            action, meta, stored = plans[symbol]
+            if action == "tail":
+                tails.setdefault(stored.index[-1], []).append(symbol)
+            elif action == "fresh":
+                frames[symbol] = self._slice(symbol, interval, stored, period)
+
+        for symbol, fresh in self._download_many(full, interval, errors, chunk_size, period=period).items():
+            with self._key_lock(symbol, interval):
+                _, _, stored = self._plan(symbol, period, interval)
+                frame = self._store_full(symbol, interval, period, stored, fresh)
+            frames[symbol] = self._slice(symbol, interval, frame, period)
+
+        reload = {}
+        for start, group in tails.items():
+            downloaded = self._download_many(group, interval, errors, chunk_size, start=start)
+            for symbol in group:
+                _, meta, stored = plans[symbol]
+                tail = downloaded.get(symbol)
+                if tail is not None:
+                    tail = self._align_tz(tail, stored.index.tz)
+                if tail is None:
+                    # The tail failed, but the stored bars are still good
+                    errors.pop(symbol, None)
+                    frames[symbol] = self._slice(symbol, interval, stored, period)
+                elif self._has_corporate_action(tail, stored.index[-1]):
+                    reload.setdefault(stored.index[0], []).append(symbol)
+                else:
+                    with self._key_lock(symbol, interval):
+                        frame = self._store_tail(symbol, interval, meta, stored, tail)
+                    frames[symbol] = self._slice(symbol, interval, frame, period)
+
+        # Like get_history, everything stored is reloaded, grouped by the first stored bar
+        for start, group in reload.items():
+            logger.info(f"Corporate actions for {', '.join(group)}, reloading since {start}")
+            downloaded = self._download_many(group, interval, errors, chunk_size, start=start)
+            for symbol in group:
+                _, meta, stored = plans[symbol]
+                if symbol in downloaded:
+                    with self._key_lock(symbol, interval):
+                        frame = self._store_full(symbol, interval, meta["covered_period"], stored,
+                                                 downloaded[symbol])
+                else:
+                    errors.pop(symbol, None)
+                    frame = stored
+                frames[symbol] = self._slice(symbol, interval, frame, period)
+
+        return frames, errors
+
+    @telemetry.traced("prices.download")
+    def _download(self, symbol, ticker, interval, period=None, start=None):
+        if ticker is None:
+            import yfinance as yf
+            ticker = yf.Ticker(symbol)
+        if start is not None:
+            return ticker.history(start=start, interval=interval, auto_adjust=False)
+        return ticker.history(period=period, interval=interval, auto_adjust=False)
+
+    @telemetry.traced("prices.bulk_download")
+    def _download_many(self, symbols, interval, errors, chunk_size, period=None, start=None):
+        """
+        One yf.download call per chunk of symbols. Returns {symbol: DataFrame} for the symbols
+        that got bars and records the others in 'errors'.
+        """
+        import yfinance as yf
+
+        frames = {}
+        for i in range(0, len(symbols), chunk_size):
+            chunk = symbols[i:i + chunk_size]
+            try:
+                data = yf.download(
+                    chunk, period=None if start is not None else period, start=start, interval=interval,
+                    group_by="ticker", auto_adjust=False, actions=True, threads=True, progress=False
+                )
+            except Exception as e:
+                logger.warning(f"Bulk download of {len(chunk)} symbols failed: {e}")
+                for symbol in chunk:
+                    errors[symbol] = str(e)
+                continue
+
+            available = set(data.columns.get_level_values(0)) if data is not None and not data.empty else set()
+            for symbol in chunk:
+                frame = data[symbol].dropna(how="all") if symbol in available else None
+                if frame is None or frame.empty:
+                    errors[symbol] = "no price data"
+                    continue
+                frame.columns.name = None
+                frame.index.name = "Date"
+                frames[symbol] = frame
+        return frames
+
+    @staticmethod
+    def _align_tz(frame, tz):
+        # yf.download returns tz-naive daily bars while Ticker.history is tz-aware;
+        # bring new bars to the timezone of the stored ones so they can be merged
+        index = frame.index
+        if getattr(index, "tz", None) is None and tz is not None:
+            frame.index = index.tz_localize(tz)
+        elif getattr(index, "tz", None) is not None and tz is None:
+            frame.index = index.tz_localize(None)
+        elif tz is not None:
+            frame.index = index.tz_convert(tz)
+        return frame
+
+    def _merge(self, stored, fresh):
+        import pandas as pd
+
+        frames = [f for f in (stored, fresh) if f is not None and not f.empty]
+        if len(frames) == 2:
+            frames[1] = self._align_tz(frames[1].copy(), getattr(frames[0].index, "tz", None))
+        if not frames:
+            return pd.DataFrame()
+        frame = pd.concat(frames)
+        # Fresh bars win over stored ones for the same timestamp (e.g. yesterday's incomplete bar)
+        frame = frame[~frame.index.duplicated(keep="last")].sort_index()
+        frame.index.name = frame.index.name or "Date"
+        return frame
+
+    def _has_corporate_action(self, tail, last_stored):
+        if tail is None or tail.empty:
+            return False
+        new_rows = tail[tail.index > last_stored]
+        for column in ("Dividends", "Stock Splits"):
+            if column in new_rows.columns and (new_rows[column].fillna(0) != 0).any():
+                return True
+        return False
+
+    def slice_ref(self, ticker_symbol, interval, frame):
+        """
+        Reference to the rows of 'frame' inside the store.
+        """
+        return {
+            "ticker": ticker_symbol.upper(),
+            "interval": interval,
+            "start": str(frame.index[0]) if not frame.empty else None,
+            "end": str(frame.index[-1]) if not frame.empty else None
+        }
+
+    def read_slice(self, ref):
+        """
+        Resolves a reference from slice_ref back into a DataFrame (empty if the store has no data).
+        """
+        import pandas as pd
+
+        frame = self._read_frame(ref["ticker"], ref["interval"])
+        if frame is None or frame.empty or ref.get("start") is None:
+            return pd.DataFrame()
+        start = pd.Timestamp(ref["start"])
+        end = pd.Timestamp(ref["end"])
+        result = frame[(frame.index >= start) & (frame.index <= end)].copy()
+        result.attrs["price_slice"] = dict(ref)
+        return result
+
+
+_default_store = ProcessDefault(
+    lambda: PriceStore(os.getenv("PRICE_STORE_DIR", os.path.join("data", "prices")))
+)
+
+
+def default_price_store():
+    """
+    Process-wide store in PRICE_STORE_DIR (default data/prices).
+    """
+    return _default_store.get()
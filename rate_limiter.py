@@ -0,0 +1,195 @@
+import random
+import re
+import threading
+import time
+from collections import deque
+
+# Matches retry hints in Gemini 429 errors, e.g. "'retryDelay': '17s'" or "Please retry in 17.5s"
+RETRY_HINT_PATTERN = re.compile(r"(?:retryDelay['\"]?\s*[:=]\s*['\"]?|retry in\s+)(\d+(?:\.\d+)?)s", re.IGNORECASE)
+
+
+def retry_after_hint(error):
+    """
+    Extracts the server-suggested wait (seconds) from a rate-limit error, or None.
+    Looks at a Retry-After response header first, then at the error text.
+    """
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None)
+    if headers:
+        value = headers.get("retry-after")
+        if value:
+            try:
+                return float(value)
+            except ValueError:
+                pass
+
+    match = RETRY_HINT_PATTERN.search(str(error))
+    if match:
+        return float(match.group(1))
+    return None
+
+
+def backoff_delay(attempt, base=10.0, cap=120.0):
+    """
+    Exponential backoff with jitter: half of the window is fixed, the other half random,
+    so sessions that hit the limit together don't retry together.
+    """
+    window = min(cap, base * (2 ** attempt))
+    return window / 2 + random.uniform(0, window / 2)
+
+
+class RateLimiter:
+    """
+    Token-bucket limiter shared by every session in the process.
+    Two buckets refill continuously: requests per minute and tokens per minute.
+    Callers queue in FIFO order and only the head of the queue may take from the buckets,
+    so nobody is starved by later arrivals. A 429 pauses the whole queue via penalize().
+    """
+
+    def __init__(self, requests_per_minute, tokens_per_minute=None):
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self._cond = threading.Condition()
+        self._queue = deque()
+        self._request_budget = float(requests_per_minute)
+        self._token_budget = float(tokens_per_minute) if tokens_per_minute else None
+        self._refilled_at = time.monotonic()
+        self._paused_until = 0.0
+        self._acquired = 0
+        self._total_wait = 0.0
+        self._max_wait = 0.0
+        self._last_wait = 0.0
+
+    def _refill(self, now):
+        # Caller holds the lock
+        elapsed = now - self._refilled_at
+        self._refilled_at = now
+        self._request_budget = min(
+            float(self.requests_per_minute),
+            self._request_budget + elapsed * self.requests_per_minute / 60.0
+        )
+        if self._token_budget is not None:
+            self._token_budget = min(
+                float(self.tokens_per_minute),
+                self._token_budget + elapsed * self.tokens_per_minute / 60.0
+            )
+
+    def _time_until_ready(self, tokens, now):
+        # Caller holds the lock; 0 when the head of the queue may proceed
+        wait = max(0.0, self._paused_until - now)
+        if self._request_budget < 1:
+            wait = max(wait, (1 - self._request_budget) * 60.0 / self.requests_per_minute)
+        if self._token_budget is not None:
+            # A single request larger than the whole bucket only waits for a full bucket
+            needed = min(tokens, self.tokens_per_minute)
+            if self._token_budget < needed:
+                wait = max(wait, (needed - self._token_budget) * 60.0 / self.tokens_per_minute)
+        return wait
+
+    def acquire(self, tokens=0, timeout=None, cancel_event=None, on_wait=None):
+        """
+        Waits for a request slot plus 'tokens' from the token bucket.
+        on_wait(position, waited_seconds) is called on the caller's thread about once per second
+        while queued (position 1 = next in line).
+        Returns the time waited in seconds, or None if cancel_event was set or timeout expired.
+        """
+        if cancel_event is not None and cancel_event.is_set():
+            return None
+
+        ticket = object()
+        started = time.monotonic()
+        with self._cond:
+            self._queue.append(ticket)
+            try:
+                while True:
+                    now = time.monotonic()
+                    self._refill(now)
+                    wait = self._time_until_ready(tokens, now) if self._queue[0] is ticket else 1.0
+                    if self._queue[0] is ticket and wait <= 0:
+                        break
+
+                    waited = now - started
+                    if cancel_event is not None and cancel_event.is_set():
+                        return None
+                    if timeout is not None and waited >= timeout:
+                        return None
+                    if on_wait is not None:
+                        position = self._queue.index(ticket) + 1
+                        self._cond.release()
+                        try:
+                            on_wait(position, waited)
+                        finally:
+                            self._cond.acquire()
+                    # Wake up periodically to notice cancellation and report progress
+                    self._cond.wait(min(wait, 1.0))
+
+                self._request_budget -= 1
+                if self._token_budget is not None:
+                    self._token_budget -= tokens
+
+                waited = time.monotonic() - started
+                self._acquired += 1
+                self._total_wait += waited
+                self._max_wait = max(self._max_wait, waited)
+                self._last_wait = waited
+                return waited
+            finally:
+                self._queue.remove(ticket)
+                self._cond.notify_all()
+
+    def record_usage(self, estimated_tokens, actual_tokens):
+        """
+        Corrects the token bucket once the real usage of a request is known.
+        The bucket may go negative, which makes later callers wait accordingly.
+        """
+        if self._token_budget is None or actual_tokens is None:
+            return
+        with self._cond:
+            self._token_budget -= actual_tokens - estimated_tokens
+            self._cond.notify_all()
+
+    def penalize(self, delay):
+        """
+        Pauses the whole queue for 'delay' seconds (after a 429 from upstream).
+        """
+        with self._cond:
+            self._paused_until = max(self._paused_until, time.monotonic() + delay)
+            self._cond.notify_all()
+
+    def stats(self):
+        with self._cond:
+            now = time.monotonic()
+            return {
+                "queue_depth": len(self._queue),
+                "acquired": self._acquired,
+                "avg_wait": self._total_wait / self._acquired if self._acquired else 0.0,
+                "max_wait": self._max_wait,
+                "last_wait": self._last_wait,
+                "paused_for": max(0.0, self._paused_until - now),
+                "requests_per_minute": self.requests_per_minute,
+                "tokens_per_minute": self.tokens_per_minute,
+            }
+
+
+_shared_limiter = None
+_shared_lock = threading.Lock()
+
+
+def get_shared_limiter(requests_per_minute, tokens_per_minute=None):
+    """
+    Returns the process-wide limiter, creating it on first use.
+    Later calls with a different quota reconfigure the existing instance.
+    """
+    global _shared_limiter
+    with _shared_lock:
+        if _shared_limiter is None:
+            _shared_limiter = RateLimiter(requests_per_minute, tokens_per_minute)
+        elif (_shared_limiter.requests_per_minute, _shared_limiter.tokens_per_minute) != (requests_per_minute, tokens_per_minute):
+            with _shared_limiter._cond:
+                _shared_limiter.requests_per_minute = requests_per_minute
+                _shared_limiter.tokens_per_minute = tokens_per_minute
+                if tokens_per_minute and _shared_limiter._token_budget is None:
+                    _shared_limiter._token_budget = float(tokens_per_minute)
+                elif not tokens_per_minute:
+                    _shared_limiter._token_budget = None
+        return _shared_limiter
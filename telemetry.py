@@ -0,0 +1,256 @@
+"""
+Lightweight per-run timing.
+
+A trace is started for one analysis (pipeline.run_analysis) and collects:
+- spans: named durations, e.g. "data.info", "ai.stream", "history.save"
+- counters: e.g. "ai.retries", "ai.total_tokens", "data.cache_hits"
+
+The trace lives in a context variable, so engine code just calls span()/count() without
+passing it around; work handed to a thread pool must go through submit() to stay attached.
+Finished traces are stored with the analysis, logged as one JSON line, and folded into
+process-wide aggregates that prometheus_text() exposes (optionally over HTTP, see
+start_metrics_server).
+
+AUTO_ANALYST_TIMING=0 disables everything: span() and count() then return after a
+single context-variable lookup.
+"""
+import contextvars
+import functools
+import json
+import os
+import threading
+import time
+import logging
+from contextlib import contextmanager
+
+logger = logging.getLogger("auto_analyst.perf")
+
+ENABLED = os.getenv("AUTO_ANALYST_TIMING", "1") == "1"
+
+_current = contextvars.ContextVar("perf_trace", default=None)
+
+
+class Trace:
+    def __init__(self, name, **labels):
+        self.name = name
+        self.labels = labels
+        self.started = time.time()
+        self._started = time.perf_counter()
+        self.duration = None
+        self.spans = []
+        self.counters = {}
+        self._lock = threading.Lock()
+
+    def add_span(self, name, seconds, **attrs):
+        span = {"name": name, "start": time.perf_counter() - self._started - seconds, "seconds": seconds}
+        if attrs:
+            span.update(attrs)
+        with self._lock:
+            self.spans.append(span)
+
+    def incr(self, name, value=1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def finish(self):
+        self.duration = time.perf_counter() - self._started
+
+    def to_dict(self):
+        with self._lock:
+            return {
+                "name": self.name,
+                "labels": dict(self.labels),
+                "started": self.started,
+                "seconds": self.duration if self.duration is not None else time.perf_counter() - self._started,
+                "spans": sorted(self.spans, key=lambda s: s["start"]),
+                "counters": dict(self.counters),
+            }
+
+
+def current_trace():
+    return _current.get()
+
+
+@contextmanager
+def start_trace(name, **labels):
+    """
+    Makes a new trace current for the block. Yields None when timing is disabled.
+    On exit the trace is logged and added to the aggregates.
+    """
+    if not ENABLED:
+        yield None
+        return
+    trace = Trace(name, **labels)
+    token = _current.set(trace)
+    try:
+        yield trace
+    finally:
+        _current.reset(token)
+        trace.finish()
+        record(trace)
+
+
+@contextmanager
+def span(name, **attrs):
+    """
+    Times the block as a span of the current trace (no-op without one).
+    """
+    trace = _current.get()
+    if trace is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        trace.add_span(name, time.perf_counter() - started, **attrs)
+
+
+def traced(name):
+    """
+    Decorator: times every call of the function as span 'name'.
+    """
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if _current.get() is None:
+                return fn(*args, **kwargs)
+            with span(name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def timed(name, fn, *args, **kwargs):
+    """
+    Calls fn(*args, **kwargs) as span 'name'.
+    """
+    with span(name):
+        return fn(*args, **kwargs)
+
+
+def add_span(name, seconds, **attrs):
+    """
+    Records a duration measured elsewhere (e.g. the rate limiter's wait).
+    """
+    trace = _current.get()
+    if trace is not None:
+        trace.add_span(name, seconds, **attrs)
+
+
+def count(name, value=1):
+    trace = _current.get()
+    if trace is not None and value:
+        trace.incr(name, value)
+
+
+def submit(executor, fn, *args, **kwargs):
+    """
+    executor.submit that keeps the current trace attached on the worker thread.
+    """
+    if _current.get() is None:
+        return executor.submit(fn, *args, **kwargs)
+    return executor.submit(contextvars.copy_context().run, fn, *args, **kwargs)
+
+
+# --- Aggregates and export -------------------------------------------------
+
+_aggregates_lock = threading.Lock()
+# span name -> {"count", "sum", "max"}
+_span_totals = {}
+_counter_totals = {}
+_trace_totals = {}
+
+
+def record(trace):
+    """
+    Logs a finished trace as one JSON line and adds it to the process-wide aggregates.
+    """
+    data = trace.to_dict()
+    logger.info(json.dumps(data, default=str))
+    with _aggregates_lock:
+        totals = _trace_totals.setdefault(data["name"], {"count": 0, "sum": 0.0, "max": 0.0})
+        totals["count"] += 1
+        totals["sum"] += data["seconds"]
+        totals["max"] = max(totals["max"], data["seconds"])
+        for s in data["spans"]:
+            totals = _span_totals.setdefault(s["name"], {"count": 0, "sum": 0.0, "max": 0.0})
+            totals["count"] += 1
+            totals["sum"] += s["seconds"]
+            totals["max"] = max(totals["max"], s["seconds"])
+        for name, value in data["counters"].items():
+            _counter_totals[name] = _counter_totals.get(name, 0) + value
+
+
+def aggregates():
+    """
+    Copies of the process-wide totals: {"traces", "spans", "counters"}.
+    """
+    with _aggregates_lock:
+        return {
+            "traces": {k: dict(v) for k, v in _trace_totals.items()},
+            "spans": {k: dict(v) for k, v in _span_totals.items()},
+            "counters": dict(_counter_totals),
+        }
+
+
+def _metric_name(name):
+    return "auto_analyst_" + "".join(c if c.isalnum() else "_" for c in name)
+
+
+def prometheus_text():
+    """
+    The aggregates in Prometheus text exposition format.
+    """
+    totals = aggregates()
+    lines = []
+    for kind, series in (("run", totals["traces"]), ("stage", totals["spans"])):
+        metric = f"auto_analyst_{kind}_seconds"
+        lines.append(f"# TYPE {metric}_sum counter")
+        lines.append(f"# TYPE {metric}_count counter")
+        lines.append(f"# TYPE {metric}_max gauge")
+        for name, values in sorted(series.items()):
+            label = f'{{{kind}="{name}"}}'
+            lines.append(f"{metric}_sum{label} {values['sum']:.6f}")
+            lines.append(f"{metric}_count{label} {values['count']}")
+            lines.append(f"{metric}_max{label} {values['max']:.6f}")
+    for name, value in sorted(totals["counters"].items()):
+        metric = _metric_name(name) + "_total"
+        lines.append(f"# TYPE {metric} counter")
+        lines.append(f"{metric} {value}")
+    return "\n".join(lines) + "\n"
+
+
+_server = None
+_server_lock = threading.Lock()
+
+
+def start_metrics_server(port):
+    """
+    Serves prometheus_text() at http://0.0.0.0:<port>/metrics on a daemon thread.
+    Safe to call repeatedly; only the first call starts a server.
+    """
+    global _server
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.rstrip("/") != "/metrics":
+                self.send_error(404)
+                return
+            body = prometheus_text().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    with _server_lock:
+        if _server is None:
+            _server = ThreadingHTTPServer(("0.0.0.0", int(port)), Handler)
+            threading.Thread(target=_server.serve_forever, name="perf-metrics", daemon=True).start()
+            logger.info(f"Metrics endpoint on port {port}/metrics")
+        return _server
@@ -0,0 +1,46 @@
+import pytest
+
+from ai_engine import SYSTEM_INSTRUCTION, AIEngine
+from fakes import FakeGeminiClient
+from rate_limiter import RateLimiter
+
+
+@pytest.fixture
+def client(monkeypatch):
+    client = FakeGeminiClient(first_token_latency=0, chunk_latency=0)
+    requests = []
+    stream = client.models.generate_content_stream
+
+    def recorded(model, contents, config=None):
+        requests.append((model, contents, config))
+        return stream(model, contents, config)
+
+    monkeypatch.setattr(client.models, "generate_content_stream", recorded)
+    client.recorded = requests
+    return client
+
+
+@pytest.fixture
+def engine(monkeypatch, client):
+    monkeypatch.setenv("GOOGLE_API_KEY", "test")
+    engine = AIEngine()
+    engine.client = client
+    engine.rate_limiter = RateLimiter(100000)
+    return engine
+
+
+def test_only_the_ticker_prompt_changes_between_requests(engine, client):
+    assert engine.analyze_ticker("ACME") == client.report_text
+    assert engine.analyze_ticker("INIT") == client.report_text
+
+    (_, first, first_config), (_, second, second_config) = client.recorded
+    assert (first, second) == ("Vytvor analýzu spoločnosti ACME.", "Vytvor analýzu spoločnosti INIT.")
+    assert first_config.system_instruction == second_config.system_instruction == SYSTEM_INSTRUCTION
+    assert first_config.cached_content is None
+
+
+def test_rate_limited_request_is_retried(engine, client):
+    client.fail_first = 1
+
+    assert engine.analyze_ticker("ACME") == client.report_text
+    assert client.rate_limited == 1 and len(client.recorded) == 2
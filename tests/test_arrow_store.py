@@ -0,0 +1,33 @@
+import os
+
+import pandas as pd
+
+from arrow_store import FrameCache, ProcessDefault, write_frame
+
+
+def frame(values):
+    return pd.DataFrame({"value": values}, index=pd.Index(range(len(values)), name="key"))
+
+
+def test_frame_cache_rereads_a_rewritten_file(tmp_path):
+    path = str(tmp_path / "store" / "ACME.arrow")
+    cache = FrameCache(max_entries=1)
+    assert cache.read(path) is None
+
+    write_frame(frame([1.0, 2.0]), path)
+    first = cache.read(path)
+    assert first.index.name == "key" and cache.read(path) is first
+
+    write_frame(frame([3.0]), path)
+    os.utime(path, ns=(0, os.stat(path).st_mtime_ns + 1))
+    assert cache.read(path)["value"].tolist() == [3.0]
+    # Only the renamed file is left behind
+    assert os.listdir(tmp_path / "store") == ["ACME.arrow"]
+
+
+def test_process_default_is_created_once():
+    created = []
+    default = ProcessDefault(lambda: created.append(object()) or created[-1])
+
+    assert default.get() is default.get()
+    assert len(created) == 1
@@ -0,0 +1,57 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import yfinance
+
+from cache import TTLCache
+from data_engine import DataEngine
+from fundamentals import FundamentalsStore
+from price_store import PriceStore
+from test_fundamentals import StubTicker
+
+# Every yfinance call takes this long; the engine's pool runs 8 at a time
+LATENCY = 0.2
+
+
+class SlowTicker:
+    latency = {}
+
+    def __init__(self, symbol):
+        self.ticker = symbol
+        self._stub = StubTicker(symbol)
+
+    def __getattr__(self, name):
+        time.sleep(self.latency.get(name, LATENCY))
+        return getattr(self._stub, name)
+
+
+class HungHistoryTicker(SlowTicker):
+    latency = {"history": LATENCY * 10}
+
+
+def test_queued_calls_do_not_time_out(tmp_path, monkeypatch):
+    monkeypatch.setattr(yfinance, "Ticker", SlowTicker)
+    # Each call fits its timeout, but 4 tickers x 8 calls need 4 rounds of the pool
+    engine = DataEngine(cache=TTLCache(max_entries=0), price_store=PriceStore(str(tmp_path / "prices")),
+                        fundamentals_store=FundamentalsStore(str(tmp_path / "fundamentals")),
+                        timeouts={name: LATENCY * 2.5 for name in
+                                  ("info", "financials", "balance_sheet", "cashflow", "quarterly_financials",
+                                   "quarterly_balance_sheet", "quarterly_cashflow", "history")})
+
+    with ThreadPoolExecutor(max_workers=4) as callers:
+        results = list(callers.map(engine.get_ticker_data, ["AAA", "BBB", "CCC", "DDD"]))
+
+    assert [data["missing"] for data in results] == [[]] * 4
+
+
+def test_hung_call_still_times_out(tmp_path, monkeypatch):
+    monkeypatch.setattr(yfinance, "Ticker", HungHistoryTicker)
+    engine = DataEngine(cache=TTLCache(max_entries=0), price_store=PriceStore(str(tmp_path / "prices")),
+                        fundamentals_store=FundamentalsStore(str(tmp_path / "fundamentals")),
+                        timeouts={"history": LATENCY * 2})
+
+    started = time.monotonic()
+    data = engine.get_ticker_data("AAA")
+
+    assert data["missing"] == ["history"]
+    assert time.monotonic() - started < LATENCY * 4
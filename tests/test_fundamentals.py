@@ -0,0 +1,143 @@
+import pandas as pd
+import pytest
+import yfinance
+
+from cache import TTLCache
+from data_engine import DataEngine
+from fundamentals import FundamentalsStore
+from price_store import PriceStore
+
+QUARTERS = pd.to_datetime(["2025-09-30", "2025-06-30", "2025-03-31", "2024-12-31", "2024-09-30"])
+
+
+def statement(rows, periods):
+    """A frame shaped like a yfinance statement: line items x periods, newest period first."""
+    return pd.DataFrame(list(rows.values()), index=list(rows), columns=periods)
+
+
+class StubTicker:
+    """The parts of yf.Ticker that DataEngine uses, with five quarters of statements."""
+
+    def __init__(self, symbol):
+        self.ticker = symbol
+
+    @property
+    def info(self):
+        return {"symbol": self.ticker, "currentPrice": 101.0, "previousClose": 100.0}
+
+    @property
+    def financials(self):
+        return statement({"Total Revenue": [4e10, 3.6e10]}, pd.to_datetime(["2024-12-31", "2023-12-31"]))
+
+    @property
+    def balance_sheet(self):
+        return statement({"Deferred Revenue": [2e9, 1.8e9]}, pd.to_datetime(["2024-12-31", "2023-12-31"]))
+
+    @property
+    def cashflow(self):
+        return statement({"Free Cash Flow": [9e9, 8e9]}, pd.to_datetime(["2024-12-31", "2023-12-31"]))
+
+    @property
+    def quarterly_financials(self):
+        return statement({"Total Revenue": [1.1e10, 1.05e10, 1e10, 9.8e9, 9.5e9]}, QUARTERS)
+
+    @property
+    def quarterly_balance_sheet(self):
+        return statement({"Deferred Revenue": [2.4e9, 2.3e9, 2.1e9, 2e9, 1.9e9]}, QUARTERS)
+
+    @property
+    def quarterly_cashflow(self):
+        return statement({"Operating Cash Flow": [3e9, 2.9e9, 2.7e9, 2.8e9, 2.5e9],
+                          "Free Cash Flow": [2.5e9, 2.4e9, 2.2e9, 2.3e9, 2e9]}, QUARTERS)
+
+    def history(self, period=None, start=None, **kwargs):
+        index = pd.date_range(end=pd.Timestamp.today().normalize(), periods=5, freq="B", name="Date")
+        return pd.DataFrame({"Close": [100.0, 101.0, 102.0, 101.0, 101.0], "Dividends": 0.0, "Stock Splits": 0.0},
+                            index=index)
+
+
+@pytest.fixture
+def store(tmp_path):
+    return FundamentalsStore(str(tmp_path / "fundamentals"))
+
+
+def test_quarterly_periods_read_back(store):
+    ticker = StubTicker("ACME")
+    for name in ("quarterly_financials", "quarterly_balance_sheet", "quarterly_cashflow"):
+        store.get_statement("ACME", name, ticker=ticker)
+
+    quarterly = store.load("ACME", "quarterly")
+    assert list(quarterly.index) == sorted(QUARTERS)
+    assert quarterly["revenue"].tolist() == [9.5e9, 9.8e9, 1e10, 1.05e10, 1.1e10]
+    assert quarterly["deferred_revenue"].iloc[-1] == 2.4e9
+    assert quarterly["free_cash_flow"].iloc[0] == 2e9
+    # Quarter over quarter and year over year growth from the local files only
+    assert store.growth(["ACME"], "revenue", freq="quarterly")["ACME"] == pytest.approx(1.1e10 / 1.05e10 - 1)
+    assert store.growth(["ACME"], "revenue", freq="quarterly", lag=4)["ACME"] == pytest.approx(1.1e10 / 9.5e9 - 1)
+
+
+def test_ticker_data_fills_quarterly_statements(tmp_path, store, monkeypatch):
+    monkeypatch.setattr(yfinance, "Ticker", StubTicker)
+    engine = DataEngine(cache=TTLCache(max_entries=0), price_store=PriceStore(str(tmp_path / "prices")),
+                        fundamentals_store=store)
+
+    data = engine.get_ticker_data("ACME")
+
+    assert "error" not in data and data["missing"] == []
+    assert data["rpo_value"] == 2e9
+    assert len(store.load("ACME", "annual")) == 2
+    quarterly = store.load("ACME", "quarterly")
+    assert len(quarterly) == len(QUARTERS)
+    assert quarterly["operating_cash_flow"].iloc[-1] == 3e9
+
+
+def test_panel_keeps_periods_aligned_when_a_value_is_missing(store):
+    years = pd.to_datetime(["2024-12-31", "2023-12-31", "2022-12-31"])
+    store.ingest("FULL", "financials", statement({"Total Revenue": [120.0, 110.0, 100.0]}, years))
+    # GAPS reported no revenue for 2023, only net income
+    store.ingest("GAPS", "financials", statement({"Total Revenue": [60.0, None, 50.0],
+                                                  "Net Income": [6.0, 5.5, 5.0]}, years))
+
+    panel = store.panel(["FULL", "GAPS"], "revenue")
+    assert panel.index.tolist() == [-2, -1, 0]
+    assert panel["GAPS"].tolist()[0] == 50.0 and pd.isna(panel["GAPS"].loc[-1])
+    # The missing year makes the one-year change unknown instead of comparing 2024 with 2022
+    growth = store.growth(["FULL", "GAPS"], "revenue")
+    assert growth["FULL"] == pytest.approx(120 / 110 - 1)
+    assert pd.isna(growth["GAPS"])
+    assert store.growth(["FULL", "GAPS"], "revenue", lag=2)["GAPS"] == pytest.approx(60 / 50 - 1)
+
+
+def test_growth_with_a_partially_populated_store(store):
+    years = pd.to_datetime(["2024-12-31", "2023-12-31"])
+    for symbol in ("FULL", "PART"):
+        store.ingest(symbol, "financials", statement({"Total Revenue": [120.0, 100.0]}, years))
+    # PART's balance sheet download failed, so only its income statement is stored
+    store.ingest("FULL", "balance_sheet", statement({"Deferred Revenue": [30.0, 20.0]}, years))
+
+    assert store.load("PART")["deferred_revenue"].isna().all()
+    growth = store.growth(["FULL", "PART"], "deferred_revenue")
+    assert growth["FULL"] == pytest.approx(0.5)
+    assert pd.isna(growth["PART"])
+    assert store.growth(["FULL", "PART"], "revenue").tolist() == pytest.approx([0.2, 0.2])
+
+
+def test_refresh_keeps_periods_that_rolled_out_of_the_download(store):
+    store.ingest("ACME", "financials", statement({"Total Revenue": [110.0, 100.0]},
+                                                 pd.to_datetime(["2023-12-31", "2022-12-31"])))
+    # A year later yfinance no longer returns 2022, and restated 2023
+    store.ingest("ACME", "financials", statement({"Total Revenue": [130.0, 112.0]},
+                                                 pd.to_datetime(["2024-12-31", "2023-12-31"])))
+
+    revenue = store.load("ACME")["revenue"]
+    assert revenue.index.name == "period_end"
+    assert revenue.tolist() == [100.0, 112.0, 130.0]
+
+
+def test_empty_download_keeps_the_stored_periods(store):
+    years = pd.to_datetime(["2024-12-31", "2023-12-31"])
+    store.ingest("ACME", "financials", statement({"Total Revenue": [120.0, 100.0]}, years))
+
+    store.ingest("ACME", "financials", pd.DataFrame())
+
+    assert store.load("ACME")["revenue"].tolist() == [100.0, 120.0]
@@ -0,0 +1,24 @@
+from peers import compare_peers
+from cache import TTLCache
+
+
+def peer(name, **metrics):
+    return dict({"name": name, "sector": "Technology"}, **metrics)
+
+
+def test_ranks_orient_to_best_and_leave_beta_out():
+    tickers = {
+        "AAA": peer("A", gross_margin=0.6, pe_ratio=40.0, beta=1.8),
+        "BBB": peer("B", gross_margin=0.4, pe_ratio=20.0, beta=0.7),
+        "CCC": {"error": "not found"},
+    }
+    comparison = compare_peers(tickers, cache=TTLCache())
+
+    ranks = comparison["ranks"]
+    assert "beta" not in ranks.columns
+    assert ranks.loc["AAA", "gross_margin"] == 100 and ranks.loc["BBB", "gross_margin"] == 50
+    # Lower P/E is better
+    assert ranks.loc["BBB", "pe_ratio"] == 100
+    # Beta is still shown in the metrics table
+    assert comparison["display"].loc["AAA", "Beta"] == "1.80"
+    assert comparison["errors"] == {"CCC": "not found"}
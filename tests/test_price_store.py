@@ -0,0 +1,85 @@
+import time
+
+import pandas as pd
+import pytest
+import yfinance
+
+from price_store import PriceStore
+
+TZ = "America/New_York"
+
+
+def bars(index, dividend_on=None):
+    close = pd.Series(range(len(index)), index=index, dtype=float) + 100
+    frame = pd.DataFrame({"Close": close, "Adj Close": close, "Dividends": 0.0, "Stock Splits": 0.0})
+    if dividend_on is not None:
+        frame.loc[dividend_on, "Dividends"] = 0.5
+        # The dividend lowers every adjusted close before it
+        frame.loc[frame.index < dividend_on, "Adj Close"] -= 0.5
+    frame.index.name = "Date"
+    return frame
+
+
+class Upstream:
+    """Serves history like Yahoo: ~400 days of bars, the newest one paying a dividend."""
+
+    def __init__(self):
+        self.index = pd.bdate_range(end=pd.Timestamp.now(tz=TZ).normalize(), periods=400, tz=TZ, name="Date")
+        self.frame = bars(self.index, dividend_on=self.index[-1])
+        self.requests = []
+
+    def history(self, period=None, start=None, **kwargs):
+        self.requests.append(("period", period) if start is None else ("start", pd.Timestamp(start)))
+        if start is not None:
+            return self.frame[self.frame.index >= pd.Timestamp(start)]
+        cutoff = pd.Timestamp.now(tz=TZ).normalize() - pd.DateOffset(years=1)
+        return self.frame[self.frame.index >= cutoff]
+
+    def download(self, symbols, period=None, start=None, **kwargs):
+        frames = {}
+        for symbol in symbols:
+            frame = self.history(period=period, start=start).copy()
+            # yf.download returns tz-naive daily bars
+            frame.index = frame.index.tz_localize(None)
+            frames[symbol] = frame
+        return pd.concat(frames, axis=1)
+
+
+@pytest.fixture
+def upstream(monkeypatch):
+    upstream = Upstream()
+    monkeypatch.setattr(yfinance, "Ticker", lambda symbol: upstream)
+    monkeypatch.setattr(yfinance, "download", upstream.download)
+    return upstream
+
+
+@pytest.fixture
+def store(tmp_path, upstream):
+    """'ACME' stored up to the day before the dividend, reaching back further than its covered period."""
+    store = PriceStore(str(tmp_path))
+    stored = bars(upstream.index[:-1])
+    start = pd.Timestamp.now(tz=TZ).normalize() - pd.DateOffset(years=1)
+    store._write("ACME", "1d", stored, {"covered_period": "1y", "covered_from": str(start),
+                                        "fetched_at": time.time() - 3600})
+    return store
+
+
+def test_corporate_action_reload_keeps_older_bars(store, upstream):
+    ref = store.slice_ref("ACME", "1d", store._read_frame("ACME", "1d"))
+
+    store.get_history("ACME", period="1y")
+
+    # The whole stored range was downloaded again, so older adjusted closes are current
+    assert upstream.requests[-1] == ("start", upstream.index[0])
+    saved = store.read_slice(ref)
+    assert saved.index[0] == upstream.index[0]
+    assert saved["Adj Close"].tolist() == upstream.frame["Adj Close"].iloc[:-1].tolist()
+
+
+def test_bulk_corporate_action_reload_keeps_older_bars(store, upstream):
+    frames, errors = store.get_histories(["ACME"], period="1y")
+
+    assert errors == {}
+    stored = store._read_frame("ACME", "1d")
+    assert len(stored) == len(upstream.index)
+    assert stored["Adj Close"].tolist() == upstream.frame["Adj Close"].tolist()
@@ -1,200 +1,17 @@
+import os
+import functools
 import streamlit as st
 
-def apply_custom_styles():
-    st.markdown("""
-<style>
-    @import url('https://fonts.googleapis.com/css2?family=Inter:wght@400;600;800&display=swap');
-
-    html, body, [data-testid="stapp"] {
-        font-family: 'Inter', sans-serif;
-    }
-
-    /* Main Background with subtle gradient */
-    .stApp {
-        background: radial-gradient(circle at top right, #001a33, #000b1a);
-        color: #e6f1ff;
-    }
-
-    /* Sidebar - Premium Dark */
-    [data-testid="stSidebar"] {
-        background-color: #000d1a !important;
-        border-right: 1px solid rgba(24, 144, 255, 0.1);
-    }
-
-    /* Header Styling - Glassmorphism */
-    .app-header {
-        background: rgba(0, 21, 41, 0.7);
-        backdrop-filter: blur(12px);
-        padding: 2.5rem;
-        border-radius: 20px;
-        margin-bottom: 2.5rem;
-        border: 1px solid rgba(24, 144, 255, 0.2);
-        box-shadow: 0 10px 40px rgba(0,0,0,0.5);
-        text-align: center;
-    }
-    
-    .app-title {
-        background: linear-gradient(135deg, #ffffff 0%, #1890ff 100%);
-        -webkit-background-clip: text;
-        -webkit-text-fill-color: transparent;
-        font-size: 2.8rem;
-        font-weight: 800;
-        margin-bottom: 0px;
-        letter-spacing: -1px;
-    }
-    
-    .app-subtitle {
-        color: #1890ff;
-        font-size: 1.1rem;
-        font-weight: 600;
-        text-transform: uppercase;
-        margin-top: 10px;
-        letter-spacing: 3px;
-        opacity: 0.8;
-    }
-
-    /* Metric Cards - Premium Glass */
-    .metric-card {
-        background: rgba(0, 39, 102, 0.3);
-        backdrop-filter: blur(8px);
-        padding: 24px;
-        border-radius: 16px;
-        border: 1px solid rgba(24, 144, 255, 0.15);
-        text-align: center;
-        transition: all 0.4s cubic-bezier(0.175, 0.885, 0.32, 1.275);
-    }
-    .metric-card:hover {
-        transform: translateY(-8px);
-        background: rgba(0, 39, 102, 0.5);
-        border-color: #1890ff;
-        box-shadow: 0 12px 30px rgba(24, 144, 255, 0.15);
-    }
-    .metric-label {
-        color: #91d5ff;
-        font-size: 0.75rem;
-        margin-bottom: 10px;
-        text-transform: uppercase;
-        font-weight: 700;
-        letter-spacing: 1px;
-    }
-    .metric-value {
-        color: #ffffff;
-        font-size: 1.6rem;
-        font-weight: 800;
-        text-shadow: 0 2px 4px rgba(0,0,0,0.3);
-    }
+# Static stylesheet, read once per process and reused on every rerun
+STYLES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "assets", "styles.css")
 
-    /* Tabs - Modern Minimal */
-    .stTabs [data-baseweb="tab-list"] {
-        gap: 12px;
-        padding: 10px;
-        background: rgba(255,255,255,0.03);
-        border-radius: 12px;
-    }
-    .stTabs [data-baseweb="tab"] {
-        height: 50px;
-        background-color: transparent !important;
-        border: none !important;
-        color: #8c8c8c !important;
-        font-weight: 600;
-        transition: all 0.3s;
-    }
-    .stTabs [aria-selected="true"] {
-        color: #1890ff !important;
-        border-bottom: 3px solid #1890ff !important;
-    }
+@functools.lru_cache(maxsize=1)
+def _styles_html():
+    with open(STYLES_PATH, 'r', encoding='utf-8') as f:
+        return f"<style>\n{f.read()}</style>"
 
-    /* Custom Scrollbar */
-    ::-webkit-scrollbar {
-        width: 8px;
-    }
-    ::-webkit-scrollbar-track {
-        background: #000b1a;
-    }
-    ::-webkit-scrollbar-thumb {
-        background: #002766;
-        border-radius: 10px;
-    }
-    ::-webkit-scrollbar-thumb:hover {
-        background: #1890ff;
-    }
-
-    /* Highlight Card */
-    .highlight-card {
-        background: radial-gradient(circle at center, rgba(24, 144, 255, 0.4), rgba(0, 39, 102, 0.6));
-        backdrop-filter: blur(12px);
-        padding: 30px;
-        border-radius: 20px;
-        border: 2px solid #1890ff;
-        text-align: center;
-        box-shadow: 0 0 30px rgba(24, 144, 255, 0.3);
-        margin-bottom: 2rem;
-    }
-    .highlight-title {
-        color: #e6f1ff;
-        font-size: 1.1rem;
-        text-transform: uppercase;
-        font-weight: 700;
-        letter-spacing: 2px;
-        margin-bottom: 15px;
-    }
-    .highlight-value {
-        color: #ffffff;
-        font-size: 3.5rem;
-        font-weight: 800;
-        text-shadow: 0 0 20px rgba(24, 144, 255, 0.6);
-        line-height: 1.2;
-    }
-    .highlight-secondary {
-        margin-top: 10px;
-        font-size: 1.2rem;
-        color: #91d5ff;
-        background: rgba(0,0,0,0.3);
-        display: inline-block;
-        padding: 5px 15px;
-        border-radius: 20px;
-    }
-
-    /* Legend */
-    .legend-box {
-        background: rgba(0, 21, 41, 0.6);
-        border-radius: 16px;
-        padding: 25px 30px;
-        margin-top: 40px;
-        border: 1px solid rgba(24, 144, 255, 0.2);
-    }
-    .legend-title {
-        color: #1890ff;
-        font-weight: 700;
-        margin-bottom: 20px;
-        text-transform: uppercase;
-        font-size: 0.9rem;
-        letter-spacing: 2px;
-    }
-    .legend-grid {
-        display: grid;
-        grid-template-columns: repeat(2, 1fr);
-        gap: 16px;
-    }
-    .legend-item {
-        background: rgba(255, 255, 255, 0.03);
-        border-radius: 10px;
-        padding: 14px 16px;
-        border-left: 3px solid #1890ff;
-    }
-    .legend-term {
-        color: #91d5ff;
-        font-weight: 600;
-        font-size: 0.85rem;
-        margin-bottom: 4px;
-    }
-    .legend-desc {
-        color: #a0a0a0;
-        font-size: 0.8rem;
-        line-height: 1.4;
-    }
-</style>
-""", unsafe_allow_html=True)
+def apply_custom_styles():
+    st.markdown(_styles_html(), unsafe_allow_html=True)
 
 def render_header():
     st.markdown("""
@@ -270,7 +87,100 @@ def render_legend():
                     <div class="legend-term">Beta</div>
                     <div class="legend-desc">Meria volatilitu akcie oproti trhu. Beta 1 = ako trh, &gt;1 = volatilnejšia, &lt;1 = stabilnejšia.</div>
                 </div>
+                <div class="legend-item">
+                    <div class="legend-term">Volatilita (ann.)</div>
+                    <div class="legend-desc">Ročná smerodajná odchýlka denných výnosov za posledný mesiac. Vyššia = väčšie výkyvy ceny.</div>
+                </div>
+                <div class="legend-item">
+                    <div class="legend-term">Max Drawdown</div>
+                    <div class="legend-desc">Najväčší pokles ceny od predchádzajúceho maxima za sledované obdobie.</div>
+                </div>
+                <div class="legend-item">
+                    <div class="legend-term">RSI 14</div>
+                    <div class="legend-desc">Index relatívnej sily za 14 dní (0–100). Nad 70 = prekúpená, pod 30 = prepredaná akcia.</div>
+                </div>
+                <div class="legend-item">
+                    <div class="legend-term">Cena vs MA 50 / MA 200</div>
+                    <div class="legend-desc">O koľko je cena nad alebo pod 50- a 200-dňovým kĺzavým priemerom. Ukazuje krátkodobý a dlhodobý trend.</div>
+                </div>
             </div>
         </div>
     """, unsafe_allow_html=True)
 
+
+def render_perf_panel(perf, aggregates, prometheus_text):
+    """
+    Admin view of the telemetry: this analysis' stage timings and counters,
+    plus the process-wide aggregates and their exports.
+    """
+    import json
+    import pandas as pd
+
+    if perf:
+        st.markdown(f"**Táto analýza:** {perf['seconds']:.2f} s")
+        spans = pd.DataFrame(perf["spans"])
+        if not spans.empty:
+            spans = spans.rename(columns={"name": "Etapa", "start": "Začiatok (s)", "seconds": "Trvanie (s)"})
+            st.dataframe(spans, hide_index=True, use_container_width=True)
+        if perf["counters"]:
+            st.json(perf["counters"])
+        st.download_button(
+            "📥 Trace (JSON)", data=json.dumps(perf, indent=2, default=str),
+            file_name=f"{perf['labels'].get('ticker', 'analysis')}_perf.json", mime="application/json"
+        )
+    else:
+        st.info("Pre túto analýzu nie sú uložené merania.")
+
+    st.divider()
+    st.markdown("**Od štartu procesu:**")
+    rows = [
+        {"Etapa": name, "Počet": v["count"], "Priemer (s)": v["sum"] / v["count"], "Max (s)": v["max"]}
+        for name, v in sorted(aggregates["spans"].items())
+    ]
+    if rows:
+        st.dataframe(pd.DataFrame(rows), hide_index=True, use_container_width=True)
+    if aggregates["counters"]:
+        st.json(aggregates["counters"])
+    st.download_button("📥 Metriky (Prometheus)", data=prometheus_text, file_name="metrics.txt", mime="text/plain")
+
+
+def render_peer_comparison(comparison, growth=None):
+    """
+    Peer comparison view (see peers.compare_peers): formatted metrics, percentile ranks
+    within the peer set and sector medians. 'growth' ({label: Series of fractions by
+    ticker}) adds a table of multi-period trends.
+    """
+    import pandas as pd
+    from peers import PEER_METRICS
+
+    display = comparison["display"]
+    if display.empty:
+        st.warning("Pre žiadny z tickerov sa nepodarilo získať dáta.")
+    else:
+        st.dataframe(display, use_container_width=True)
+
+        st.markdown("**Percentil v skupine** (100 = najlepší v skupine; pri P/E najnižší)")
+        ranks = comparison["ranks"].rename(columns={c: label for c, (label, _, _) in PEER_METRICS.items()})
+        st.dataframe(
+            ranks, use_container_width=True,
+            column_config={
+                label: st.column_config.ProgressColumn(label, min_value=0, max_value=100, format="%.0f")
+                for label in ranks.columns
+            }
+        )
+
+        if growth:
+            st.markdown("**Trendy z výkazov**")
+            trends = pd.DataFrame(growth).reindex(display.index) * 100
+            st.dataframe(
+                trends, use_container_width=True,
+                column_config={label: st.column_config.NumberColumn(label, format="%+.1f%%") for label in trends.columns}
+            )
+
+        st.markdown("**Mediány podľa sektora**")
+        st.dataframe(comparison["medians_display"], use_container_width=True)
+
+    if comparison["errors"]:
+        with st.expander(f"❌ Bez dát ({len(comparison['errors'])})"):
+            for symbol, error in comparison["errors"].items():
+                st.write(f"**{symbol}**: {error}")